@@ -0,0 +1,182 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+MCMC benchmarks of the example models, in the format of
+`airspeed velocity <https://asv.readthedocs.io>`_. The wall times and the
+sampling efficiency are recorded by :meth:`MCMC.run(..., profile=True)
+<numpyro.infer.mcmc.MCMC.run>`. On versions of JAX without ahead-of-time
+compilation, the runs are timed directly instead and the device memory estimates
+are skipped.
+"""
+
+import time
+
+from jax import random
+from jax.tree_util import tree_flatten
+
+from numpyro.diagnostics import effective_sample_size
+from numpyro.infer import MCMC, NUTS
+
+from .models import MODELS, get_model
+
+
+def _run_nuts(name, **run_kwargs):
+    model, args, kwargs, num_warmup, num_samples = get_model(name)
+    mcmc = MCMC(
+        NUTS(model), num_warmup=num_warmup, num_samples=num_samples, progress_bar=False
+    )
+    mcmc.run(random.PRNGKey(0), *args, **kwargs, **run_kwargs)
+    return mcmc
+
+
+def _block(x):
+    for leaf in tree_flatten(x)[0]:
+        leaf.block_until_ready()
+
+
+def _profile_nuts(name):
+    try:
+        profile = _run_nuts(name, profile=True).get_profile()
+    except (NotImplementedError, AttributeError):
+        # profiling requires ahead-of-time compilation
+        return _time_nuts(name)
+    return {
+        "compile_time": profile.compile_time,
+        "warmup_time": profile.warmup_time,
+        "sample_time": profile.sample_time,
+        "postprocess_time": profile.postprocess_time,
+        "num_grads": profile.num_grads,
+        "min_ess_per_second": min(
+            float(v.min()) for v in profile.ess_per_second.values()
+        ),
+        "min_ess_per_grad": min(float(v.min()) for v in profile.ess_per_grad.values()),
+    }
+
+
+def _time_nuts(name):
+    # The same metrics as `_profile_nuts`, by timing the runs. The warmup time
+    # includes the compilation of the warmup phase; the compile time of the sampling
+    # phase is the difference between the first run and a second one from the same
+    # state, which reuses the compiled program.
+    model, args, kwargs, num_warmup, num_samples = get_model(name)
+    mcmc = MCMC(
+        NUTS(model), num_warmup=num_warmup, num_samples=num_samples, progress_bar=False
+    )
+    start = time.perf_counter()
+    mcmc.warmup(random.PRNGKey(0), *args, **kwargs)
+    _block(mcmc.post_warmup_state)
+    warmup_time = time.perf_counter() - start
+
+    state = mcmc.post_warmup_state
+    run_times = []
+    for _ in range(2):
+        mcmc.post_warmup_state = state
+        start = time.perf_counter()
+        mcmc.run(
+            random.PRNGKey(1),
+            *args,
+            extra_fields=("num_steps",),
+            lazy_postprocess=True,
+            **kwargs,
+        )
+        _block(mcmc.last_state)
+        run_times.append(time.perf_counter() - start)
+    compile_time, sample_time = run_times[0] - run_times[1], run_times[1]
+
+    start = time.perf_counter()
+    samples = mcmc.get_samples(group_by_chain=True)
+    _block(samples)
+    postprocess_time = time.perf_counter() - start
+
+    num_grads = int(mcmc.get_extra_fields()["num_steps"].sum())
+    min_ess = min(float(effective_sample_size(v).min()) for v in samples.values())
+    return {
+        "compile_time": compile_time,
+        "warmup_time": warmup_time,
+        "sample_time": sample_time,
+        "postprocess_time": postprocess_time,
+        "num_grads": num_grads,
+        "min_ess_per_second": min_ess / (sample_time + postprocess_time),
+        "min_ess_per_grad": min_ess / num_grads,
+    }
+
+
+class NUTSSuite:
+    params = list(MODELS)
+    param_names = ["model"]
+    timeout = 1800
+
+    def setup_cache(self):
+        # a single profiled run of each model, shared by the `track_*` benchmarks
+        return {name: _profile_nuts(name) for name in MODELS}
+
+    def track_compile_time(self, profiles, name):
+        return profiles[name]["compile_time"]
+
+    track_compile_time.unit = "seconds"
+
+    def track_warmup_time(self, profiles, name):
+        return profiles[name]["warmup_time"]
+
+    track_warmup_time.unit = "seconds"
+
+    def track_sample_time(self, profiles, name):
+        return profiles[name]["sample_time"]
+
+    track_sample_time.unit = "seconds"
+
+    def track_postprocess_time(self, profiles, name):
+        return profiles[name]["postprocess_time"]
+
+    track_postprocess_time.unit = "seconds"
+
+    def track_num_grads(self, profiles, name):
+        return profiles[name]["num_grads"]
+
+    track_num_grads.unit = "gradients"
+
+    def track_min_ess_per_second(self, profiles, name):
+        return profiles[name]["min_ess_per_second"]
+
+    track_min_ess_per_second.unit = "ESS/second"
+
+    def track_min_ess_per_grad(self, profiles, name):
+        return profiles[name]["min_ess_per_grad"]
+
+    track_min_ess_per_grad.unit = "ESS/gradient"
+
+    def peakmem_run(self, profiles, name):
+        _run_nuts(name).get_samples()
+
+
+class NUTSCompileSuite:
+    params = list(MODELS)
+    param_names = ["model"]
+    timeout = 600
+
+    def setup(self, name):
+        model, args, kwargs, num_warmup, num_samples = get_model(name)
+        mcmc = MCMC(
+            NUTS(model),
+            num_warmup=num_warmup,
+            num_samples=num_samples,
+            progress_bar=False,
+        )
+        # asv skips the benchmarks whose setup raises NotImplementedError, which
+        # `MCMC.compile` does if JAX does not support ahead-of-time compilation
+        try:
+            self.compiled = mcmc.compile(random.PRNGKey(0), *args, **kwargs)
+        except AttributeError:
+            raise NotImplementedError(
+                "Ahead-of-time compilation requires a newer version of JAX."
+            )
+        if self.compiled.memory_bytes is None:
+            raise NotImplementedError(
+                "The installed version of JAX does not report memory estimates."
+            )
+
+    def track_device_memory(self, name):
+        return self.compiled.memory_bytes
+
+    track_device_memory.unit = "bytes"
@@ -0,0 +1,107 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+SVI benchmarks of the example models, in the format of
+`airspeed velocity <https://asv.readthedocs.io>`_. On versions of JAX without
+ahead-of-time compilation, the optimization steps are timed directly instead and
+the device memory estimates are skipped.
+"""
+
+import time
+
+from jax import jit, lax, random
+
+from numpyro.infer import SVI, Trace_ELBO
+from numpyro.infer.autoguide import AutoNormal
+from numpyro.optim import Adam
+
+from .models import MODELS, get_model
+
+NUM_STEPS = 1000
+
+
+class SVISuite:
+    params = list(MODELS)
+    param_names = ["model"]
+    timeout = 600
+
+    def setup(self, name):
+        model, args, kwargs, _, _ = get_model(name)
+        # keyword arguments determine the structure of the models
+        self.svi = SVI(model, AutoNormal(model), Adam(1e-3), Trace_ELBO(), **kwargs)
+        self.args = args
+        try:
+            self.compiled = self.svi.compile(random.PRNGKey(0), NUM_STEPS, *args)
+        except (NotImplementedError, AttributeError):
+            self.compiled = None
+
+    def _time_steps(self):
+        # returns the wall times of the first (compile and run) and of a second (run
+        # only) call of the jitted optimization loop
+        svi_state = self.svi.init(random.PRNGKey(0), *self.args)
+
+        @jit
+        def run_steps(svi_state):
+            return lax.scan(
+                lambda state, _: self.svi.update(state, *self.args),
+                svi_state,
+                None,
+                length=NUM_STEPS,
+            )
+
+        times = []
+        for _ in range(2):
+            start = time.perf_counter()
+            run_steps(svi_state)[1].block_until_ready()
+            times.append(time.perf_counter() - start)
+        return times
+
+    def track_compile_time(self, name):
+        if self.compiled is None:
+            first, second = self._time_steps()
+            return first - second
+        compiled = self.svi.compile(random.PRNGKey(0), NUM_STEPS, *self.args)
+        return compiled.lower_time + compiled.compile_time
+
+    track_compile_time.unit = "seconds"
+
+    def track_steps_per_second(self, name):
+        if self.compiled is None:
+            return NUM_STEPS / self._time_steps()[1]
+        start = time.perf_counter()
+        result = self.compiled.run(random.PRNGKey(1), *self.args)
+        result.losses.block_until_ready()
+        return NUM_STEPS / (time.perf_counter() - start)
+
+    track_steps_per_second.unit = "steps/second"
+
+    def peakmem_run(self, name):
+        self.svi.run(random.PRNGKey(1), NUM_STEPS, *self.args, progress_bar=False)
+
+
+class SVIMemorySuite:
+    params = list(MODELS)
+    param_names = ["model"]
+    timeout = 600
+
+    def setup(self, name):
+        model, args, kwargs, _, _ = get_model(name)
+        svi = SVI(model, AutoNormal(model), Adam(1e-3), Trace_ELBO(), **kwargs)
+        # asv skips the benchmarks whose setup raises NotImplementedError, which
+        # `SVI.compile` does if JAX does not support ahead-of-time compilation
+        try:
+            self.compiled = svi.compile(random.PRNGKey(0), NUM_STEPS, *args)
+        except AttributeError:
+            raise NotImplementedError(
+                "Ahead-of-time compilation requires a newer version of JAX."
+            )
+        if self.compiled.memory_bytes is None:
+            raise NotImplementedError(
+                "The installed version of JAX does not report memory estimates."
+            )
+
+    def track_device_memory(self, name):
+        return self.compiled.memory_bytes
+
+    track_device_memory.unit = "bytes"
@@ -0,0 +1,236 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Models of the bundled examples together with synthetic datasets which have the
+same sizes as the real ones, so that the benchmarks run offline.
+"""
+
+import numpy as np
+
+from jax import lax
+import jax.numpy as jnp
+from jax.scipy.special import logsumexp
+
+import numpyro
+import numpyro.distributions as dist
+
+
+# examples/baseball.py
+def baseball_model(at_bats, hits=None):
+    m = numpyro.sample("m", dist.Uniform(0, 1))
+    kappa = numpyro.sample("kappa", dist.Pareto(1, 1.5))
+    num_players = at_bats.shape[0]
+    with numpyro.plate("num_players", num_players):
+        phi_prior = dist.Beta(m * kappa, (1 - m) * kappa)
+        phi = numpyro.sample("phi", phi_prior)
+        return numpyro.sample("obs", dist.Binomial(at_bats, probs=phi), obs=hits)
+
+
+def baseball_data(rng):
+    # 18 players with 45 at bats each
+    at_bats = np.full(18, 45.0)
+    hits = rng.binomial(45, rng.beta(27, 73, size=18)).astype(np.float32)
+    return (jnp.array(at_bats), jnp.array(hits)), {}
+
+
+# examples/covtype.py
+def covtype_model(data, labels):
+    dim = data.shape[1]
+    coefs = numpyro.sample("coefs", dist.Normal(jnp.zeros(dim), jnp.ones(dim)))
+    with numpyro.plate("N", data.shape[0]):
+        logits = jnp.dot(data, coefs)
+        return numpyro.sample("obs", dist.Bernoulli(logits=logits), obs=labels)
+
+
+def covtype_data(rng):
+    # 581012 normalized features of dimension 54, and an intercept
+    features = rng.normal(size=(581012, 54)).astype(np.float32)
+    features = np.hstack([features, np.ones((features.shape[0], 1), np.float32)])
+    coefs = rng.normal(scale=0.5, size=55).astype(np.float32)
+    labels = rng.uniform(size=581012) < 1 / (1 + np.exp(-features @ coefs))
+    return (jnp.array(features), jnp.array(labels)), {}
+
+
+# examples/funnel.py
+def funnel_model(dim=10):
+    y = numpyro.sample("y", dist.Normal(0, 3))
+    numpyro.sample("x", dist.Normal(jnp.zeros(dim - 1), jnp.exp(y / 2)))
+
+
+def funnel_data(rng):
+    return (), {"dim": 10}
+
+
+# examples/hmm.py
+def _forward_log_prob(init_log_prob, words, transition_log_prob, emission_log_prob):
+    def scan_fn(log_prob, word):
+        log_prob = jnp.expand_dims(log_prob, axis=1) + transition_log_prob
+        return logsumexp(log_prob + emission_log_prob[:, word], axis=0), None
+
+    log_prob, _ = lax.scan(scan_fn, init_log_prob, words)
+    return log_prob
+
+
+def hmm_model(
+    transition_prior,
+    emission_prior,
+    supervised_categories,
+    supervised_words,
+    unsupervised_words,
+):
+    num_categories, num_words = transition_prior.shape[0], emission_prior.shape[0]
+    transition_prob = numpyro.sample(
+        "transition_prob",
+        dist.Dirichlet(
+            jnp.broadcast_to(transition_prior, (num_categories, num_categories))
+        ),
+    )
+    emission_prob = numpyro.sample(
+        "emission_prob",
+        dist.Dirichlet(jnp.broadcast_to(emission_prior, (num_categories, num_words))),
+    )
+    numpyro.sample(
+        "supervised_categories",
+        dist.Categorical(transition_prob[supervised_categories[:-1]]),
+        obs=supervised_categories[1:],
+    )
+    numpyro.sample(
+        "supervised_words",
+        dist.Categorical(emission_prob[supervised_categories]),
+        obs=supervised_words,
+    )
+    transition_log_prob = jnp.log(transition_prob)
+    emission_log_prob = jnp.log(emission_prob)
+    init_log_prob = emission_log_prob[:, unsupervised_words[0]]
+    log_prob = _forward_log_prob(
+        init_log_prob, unsupervised_words[1:], transition_log_prob, emission_log_prob
+    )
+    log_prob = logsumexp(log_prob, axis=0, keepdims=True)
+    numpyro.factor("forward_log_prob", log_prob)
+
+
+def hmm_data(rng):
+    # 3 categories, 10 words, 100 supervised and 500 unsupervised words
+    num_categories, num_words = 3, 10
+    transition_prob = rng.dirichlet(np.ones(num_categories), size=num_categories)
+    emission_prob = rng.dirichlet(np.full(num_words, 0.1), size=num_categories)
+    categories = [rng.choice(num_categories)]
+    for _ in range(599):
+        categories.append(rng.choice(num_categories, p=transition_prob[categories[-1]]))
+    categories = np.array(categories)
+    words = np.array([rng.choice(num_words, p=emission_prob[c]) for c in categories])
+    args = (
+        jnp.ones(num_categories),
+        jnp.full(num_words, 0.1),
+        jnp.array(categories[:100]),
+        jnp.array(words[:100]),
+        jnp.array(words[100:]),
+    )
+    return args, {}
+
+
+# examples/sparse_regression.py
+def _dot(X, Z):
+    return jnp.dot(X, Z[..., None])[..., 0]
+
+
+def _kernel(X, Z, eta1, eta2, c, jitter=1.0e-4):
+    eta1sq = jnp.square(eta1)
+    eta2sq = jnp.square(eta2)
+    k1 = 0.5 * eta2sq * jnp.square(1.0 + _dot(X, Z))
+    k2 = -0.5 * eta2sq * _dot(jnp.square(X), jnp.square(Z))
+    k3 = (eta1sq - eta2sq) * _dot(X, Z)
+    k4 = jnp.square(c) - 0.5 * eta2sq
+    if X.shape == Z.shape:
+        k4 += jitter * jnp.eye(X.shape[0])
+    return k1 + k2 + k3 + k4
+
+
+def sparse_regression_model(X, Y, hypers):
+    S, P, N = hypers["expected_sparsity"], X.shape[1], X.shape[0]
+
+    sigma = numpyro.sample("sigma", dist.HalfNormal(hypers["alpha3"]))
+    phi = sigma * (S / jnp.sqrt(N)) / (P - S)
+    eta1 = numpyro.sample("eta1", dist.HalfCauchy(phi))
+
+    msq = numpyro.sample("msq", dist.InverseGamma(hypers["alpha1"], hypers["beta1"]))
+    xisq = numpyro.sample("xisq", dist.InverseGamma(hypers["alpha2"], hypers["beta2"]))
+
+    eta2 = jnp.square(eta1) * jnp.sqrt(xisq) / msq
+
+    lam = numpyro.sample("lambda", dist.HalfCauchy(jnp.ones(P)))
+    kappa = jnp.sqrt(msq) * lam / jnp.sqrt(msq + jnp.square(eta1 * lam))
+
+    kX = kappa * X
+    k = _kernel(kX, kX, eta1, eta2, hypers["c"]) + sigma ** 2 * jnp.eye(N)
+    numpyro.sample(
+        "Y",
+        dist.MultivariateNormal(loc=jnp.zeros(X.shape[0]), covariance_matrix=k),
+        obs=Y,
+    )
+
+
+def sparse_regression_data(rng):
+    # 100 data points of dimension 20, of which 3 are active
+    N, P, S = 100, 20, 3
+    X = rng.normal(size=(N, P))
+    W = 0.5 + 2.5 * rng.uniform(size=S)
+    Y = X[:, :S] @ W + X[:, 0] * X[:, 1] - X[:, 1] * X[:, 2]
+    Y = Y + 0.05 * rng.normal(size=N)
+    Y = (Y - Y.mean()) / Y.std()
+    hypers = {
+        "expected_sparsity": max(1.0, P / 10),
+        "alpha1": 3.0,
+        "beta1": 1.0,
+        "alpha2": 3.0,
+        "beta2": 1.0,
+        "alpha3": 1.0,
+        "c": 1.0,
+    }
+    return (jnp.array(X), jnp.array(Y), hypers), {}
+
+
+# examples/stochastic_volatility.py
+def stochastic_volatility_model(returns):
+    step_size = numpyro.sample("sigma", dist.Exponential(50.0))
+    s = numpyro.sample(
+        "s", dist.GaussianRandomWalk(scale=step_size, num_steps=jnp.shape(returns)[0])
+    )
+    nu = numpyro.sample("nu", dist.Exponential(0.1))
+    return numpyro.sample(
+        "r", dist.StudentT(df=nu, loc=0.0, scale=jnp.exp(s)), obs=returns
+    )
+
+
+def stochastic_volatility_data(rng):
+    # 2427 daily returns, like the SP500 dataset
+    s = np.cumsum(0.02 * rng.normal(size=2427)) - 4.5
+    returns = np.exp(s) * rng.standard_t(10, size=2427)
+    return (jnp.array(returns),), {}
+
+
+# name -> (model, data_fn, num_warmup, num_samples)
+MODELS = {
+    "baseball": (baseball_model, baseball_data, 500, 500),
+    "covtype": (covtype_model, covtype_data, 100, 100),
+    "funnel": (funnel_model, funnel_data, 500, 500),
+    "hmm": (hmm_model, hmm_data, 500, 500),
+    "sparse_regression": (sparse_regression_model, sparse_regression_data, 500, 500),
+    "stochastic_volatility": (
+        stochastic_volatility_model,
+        stochastic_volatility_data,
+        500,
+        500,
+    ),
+}
+
+
+def get_model(name, seed=0):
+    """
+    Returns `(model, args, kwargs, num_warmup, num_samples)` of the benchmark model
+    `name`, where the data is generated with the numpy random `seed`.
+    """
+    model, data_fn, num_warmup, num_samples = MODELS[name]
+    args, kwargs = data_fn(np.random.RandomState(seed))
+    return model, args, kwargs, num_warmup, num_samples
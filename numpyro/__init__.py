@@ -19,7 +19,12 @@ from numpyro.primitives import (
     sample,
     subsample,
 )
-from numpyro.util import enable_x64, set_host_device_count, set_platform
+from numpyro.util import (
+    enable_compilation_cache,
+    enable_x64,
+    set_host_device_count,
+    set_platform,
+)
 from numpyro.version import __version__
 
 
@@ -37,6 +42,7 @@ __all__ = [
     "deterministic",
     "diagnostics",
     "distributions",
+    "enable_compilation_cache",
     "enable_x64",
     "enable_validation",
     "factor",
@@ -294,10 +294,13 @@ def print_summary(samples, prob=0.90, group_by_chain=True):
             "Param:{}".format(i): v for i, v in enumerate(tree_flatten(samples)[0])
         }
     summary_dict = summary(samples, prob, group_by_chain=True)
+    _print_summary_dict(summary_dict)
 
+
+def _print_summary_dict(summary_dict):
     row_names = {
-        k: k + "[" + ",".join(map(lambda x: str(x - 1), v.shape[2:])) + "]"
-        for k, v in samples.items()
+        k: k + "[" + ",".join(map(lambda x: str(x - 1), v["mean"].shape)) + "]"
+        for k, v in summary_dict.items()
     }
     max_len = max(max(map(lambda x: len(x), row_names.values())), 10)
     name_format = "{:>" + str(max_len) + "}"
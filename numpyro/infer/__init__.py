@@ -9,18 +9,24 @@ from numpyro.infer.elbo import (
     TraceGraph_ELBO,
     TraceMeanField_ELBO,
 )
-from numpyro.infer.hmc import HMC, NUTS
+from numpyro.infer.ghmc import GHMC, MEADS
+from numpyro.infer.hmc import DRHMC, HMC, NUTS, ChEESHMC
 from numpyro.infer.hmc_gibbs import HMCECS, DiscreteHMCGibbs, HMCGibbs
 from numpyro.infer.initialization import (
     init_to_feasible,
     init_to_median,
+    init_to_pathfinder,
     init_to_sample,
     init_to_uniform,
     init_to_value,
 )
 from numpyro.infer.mcmc import MCMC
 from numpyro.infer.mixed_hmc import MixedHMC
+from numpyro.infer.pathfinder import pathfinder
+from numpyro.infer.replica_exchange import ReplicaExchange
 from numpyro.infer.sa import SA
+from numpyro.infer.sink import HostSink, NpySink
+from numpyro.infer.smc import SMC
 from numpyro.infer.svi import SVI
 from numpyro.infer.util import Predictive, log_likelihood
 
@@ -30,23 +36,33 @@ __all__ = [
     "autoguide",
     "init_to_feasible",
     "init_to_median",
+    "init_to_pathfinder",
     "init_to_sample",
     "init_to_uniform",
     "init_to_value",
     "log_likelihood",
+    "pathfinder",
     "reparam",
     "BarkerMH",
+    "ChEESHMC",
     "DiscreteHMCGibbs",
+    "DRHMC",
     "ELBO",
+    "GHMC",
     "HMC",
     "HMCECS",
     "HMCGibbs",
+    "HostSink",
     "MCMC",
+    "MEADS",
     "MixedHMC",
+    "NpySink",
     "NUTS",
     "Predictive",
     "RenyiELBO",
+    "ReplicaExchange",
     "SA",
+    "SMC",
     "SVI",
     "Trace_ELBO",
     "TraceGraph_ELBO",
@@ -0,0 +1,465 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import namedtuple
+from functools import partial
+
+import jax
+from jax import lax, random, vmap
+from jax.flatten_util import ravel_pytree
+import jax.numpy as jnp
+
+from numpyro.infer.hmc import _CHAIN_AXIS_NAME
+from numpyro.infer.hmc_util import (
+    IntegratorState,
+    euclidean_kinetic_energy,
+    velocity_verlet,
+)
+from numpyro.infer.initialization import init_to_uniform
+from numpyro.infer.mcmc import MCMCKernel
+from numpyro.infer.util import ParamInfo, initialize_model
+from numpyro.util import cond, identity
+
+GHMCState = namedtuple(
+    "GHMCState",
+    [
+        "i",
+        "z",
+        "r",
+        "potential_energy",
+        "z_grad",
+        "slice",
+        "accept_prob",
+        "mean_accept_prob",
+        "diverging",
+        "adapt_state",
+        "rng_key",
+    ],
+)
+"""
+A :func:`~collections.namedtuple` consisting of the following fields:
+
+ - **i** - iteration.
+ - **z** - Python collection representing values (unconstrained samples from
+   the posterior) at latent sites.
+ - **r** - The persistent momentum variable, which is partially refreshed at
+   the beginning of each iteration.
+ - **potential_energy** - Potential energy computed at the given value of ``z``.
+ - **z_grad** - Gradient of potential energy w.r.t. latent sample sites.
+ - **slice** - The persistent slice variable in :math:`[-1, 1)` used by the
+   non-reversible Metropolis-Hastings acceptance test.
+ - **accept_prob** - Acceptance probability of the proposal. Note that ``z``
+   does not correspond to the proposal if it is rejected.
+ - **mean_accept_prob** - Mean acceptance probability until current iteration
+   during warmup adaptation or sampling (for diagnostics).
+ - **diverging** - A boolean value to indicate whether the current trajectory is diverging.
+ - **adapt_state** - A ``GHMCAdaptState`` namedtuple which contains the parameters
+   of the kernel:
+
+   + **step_size** - Step size to be used by the integrator in the next iteration.
+   + **damping** - The fraction of the momentum variance which is refreshed
+     in the next iteration.
+   + **inverse_mass_matrix** - The diagonal of the inverse mass matrix to be
+     used for the next iteration.
+
+ - **rng_key** - random number generator seed used for the iteration.
+"""
+
+GHMCAdaptState = namedtuple(
+    "GHMCAdaptState", ["step_size", "damping", "inverse_mass_matrix"]
+)
+
+
+def _max_eigenvalue(x, n):
+    # estimates the largest eigenvalue of `x.T @ x / n` from the `n` nonzero rows
+    # of `x` without forming the (dim x dim) matrix, see reference [1] of MEADS
+    s = jnp.matmul(x, x.T)
+    s_diag = jnp.diag(s)
+    lam = jnp.sum(s_diag) / n
+    lam_sq = (jnp.sum(s ** 2) - jnp.sum(s_diag ** 2)) / (n * (n - 1))
+    return lam_sq / lam
+
+
+class GHMC(MCMCKernel):
+    """
+    Generalized Hamiltonian Monte Carlo, which takes a single leapfrog step per
+    iteration and keeps the momentum across iterations, refreshing a fraction
+    `damping` of its variance at each iteration. The proposal is accepted using
+    the non-reversible Metropolis-Hastings test of reference [2] with a persistent
+    slice variable, and the momentum is negated on rejection. This kernel uses
+    fixed parameters; see :class:`MEADS` for a variant which adapts them.
+
+    Because the cost of an iteration is a single gradient evaluation, all chains
+    run in lockstep, which makes this kernel well suited to running many
+    vectorized chains (``chain_method="vectorized"``) on a single device.
+
+    **References:**
+
+    1. *Acceptance rates and generalized hybrid Monte Carlo*,
+       Alan M. Horowitz
+    2. *Non-reversibly updating a uniform [0,1] value for Metropolis accept/reject
+       decisions*, Radford M. Neal
+
+    :param model: Python callable containing Pyro :mod:`~numpyro.primitives`.
+        If model is provided, `potential_fn` will be inferred using the model.
+    :param potential_fn: Python callable that computes the potential energy
+        given input parameters. The input parameters to `potential_fn` can be
+        any python collection type, provided that `init_params` argument to
+        :meth:`init` has the same type.
+    :param float step_size: Step size of the leapfrog step. Defaults to 0.1.
+    :param float damping: The fraction in `(0, 1]` of the momentum variance which is
+        refreshed at each iteration, where 1 corresponds to Metropolis-adjusted
+        Langevin dynamics. Defaults to 0.1.
+    :param numpy.ndarray inverse_mass_matrix: The diagonal of the inverse mass matrix,
+        in the order of the flattened latent values. Defaults to the identity.
+    :param callable init_strategy: a per-site initialization function.
+        See :ref:`init_strategy` section for available functions.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        potential_fn=None,
+        step_size=0.1,
+        damping=0.1,
+        inverse_mass_matrix=None,
+        init_strategy=init_to_uniform,
+    ):
+        if not (model is None) ^ (potential_fn is None):
+            raise ValueError("Only one of `model` or `potential_fn` must be specified.")
+        self._model = model
+        self._potential_fn = potential_fn
+        self._potential_fn_gen = None
+        self._step_size = step_size
+        self._damping = damping
+        self._inverse_mass_matrix = inverse_mass_matrix
+        self._init_strategy = init_strategy
+        self._max_delta_energy = 1000.0
+        # Set on first call to init
+        self._postprocess_fn = None
+        self._vectorized = False
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def sample_field(self):
+        return "z"
+
+    @property
+    def default_fields(self):
+        return ("z", "diverging")
+
+    def get_diagnostics_str(self, state):
+        return "step size {:.2e}, damping {:.2e}. acc. prob={:.2f}".format(
+            state.adapt_state.step_size,
+            state.adapt_state.damping,
+            state.mean_accept_prob,
+        )
+
+    def _init_state(self, rng_key, model_args, model_kwargs, init_params):
+        if self._model is not None:
+            (
+                params_info,
+                self._potential_fn_gen,
+                self._postprocess_fn,
+                model_trace,
+            ) = initialize_model(
+                rng_key,
+                self._model,
+                dynamic_args=True,
+                init_strategy=self._init_strategy,
+                model_args=model_args,
+                model_kwargs=model_kwargs,
+            )
+            init_params = params_info[0]
+        elif isinstance(init_params, ParamInfo):
+            init_params = init_params[0]
+        return init_params
+
+    def _init_adapt_state(self, z, z_grad):
+        z_flat = ravel_pytree(z)[0]
+        inverse_mass_matrix = (
+            jnp.ones(jnp.shape(z_flat))
+            if self._inverse_mass_matrix is None
+            else jnp.asarray(self._inverse_mass_matrix)
+        )
+        return GHMCAdaptState(
+            lax.convert_element_type(self._step_size, jnp.result_type(float)),
+            lax.convert_element_type(self._damping, jnp.result_type(float)),
+            inverse_mass_matrix,
+        )
+
+    def _adapt(self, i, z, z_grad, adapt_state):
+        return adapt_state
+
+    def _get_potential_fn(self, model_args, model_kwargs):
+        # the potential of a model depends on the data, which may differ between
+        # calls of `sample`, e.g. when running again from `post_warmup_state`
+        if self._potential_fn_gen is None:
+            return self._potential_fn
+        model_kwargs = {} if model_kwargs is None else model_kwargs
+        return self._potential_fn_gen(*model_args, **model_kwargs)
+
+    def _init_one(self, init_params, rng_key, potential_fn):
+        rng_key, key_momentum, key_slice = random.split(rng_key, 3)
+        pe, z_grad = jax.value_and_grad(potential_fn)(init_params)
+        adapt_state = self._init_adapt_state(init_params, z_grad)
+        z_flat, unravel_fn = ravel_pytree(init_params)
+        r = unravel_fn(
+            random.normal(key_momentum, jnp.shape(z_flat))
+            / jnp.sqrt(adapt_state.inverse_mass_matrix)
+        )
+        return GHMCState(
+            jnp.array(0),
+            init_params,
+            r,
+            pe,
+            z_grad,
+            random.uniform(key_slice, minval=-1.0, maxval=1.0),
+            jnp.zeros(()),
+            jnp.zeros(()),
+            jnp.array(False),
+            adapt_state,
+            rng_key,
+        )
+
+    def init(self, rng_key, num_warmup, init_params, model_args, model_kwargs):
+        self._num_warmup = num_warmup
+        # non-vectorized
+        if rng_key.ndim == 1:
+            rng_key, rng_key_init_model = random.split(rng_key)
+        # vectorized
+        else:
+            rng_key, rng_key_init_model = jnp.swapaxes(
+                vmap(random.split)(rng_key), 0, 1
+            )
+        init_params = self._init_state(
+            rng_key_init_model, model_args, model_kwargs, init_params
+        )
+        if self._potential_fn and init_params is None:
+            raise ValueError(
+                "Valid value of `init_params` must be provided with" " `potential_fn`."
+            )
+
+        init_fn = partial(
+            self._init_one,
+            potential_fn=self._get_potential_fn(model_args, model_kwargs),
+        )
+        self._vectorized = rng_key.ndim > 1
+        if self._vectorized:
+            init_fn = vmap(init_fn, axis_name=_CHAIN_AXIS_NAME)
+        return jax.device_put(init_fn(init_params, rng_key))
+
+    def postprocess_fn(self, args, kwargs):
+        if self._postprocess_fn is None:
+            return identity
+        return self._postprocess_fn(*args, **kwargs)
+
+    def _sample_one(self, state, vv_update):
+        step_size, damping, inverse_mass_matrix = state.adapt_state
+        rng_key, key_momentum = random.split(state.rng_key)
+
+        # partially refresh the momentum, which keeps N(0, M) invariant
+        r_flat, unravel_fn = ravel_pytree(state.r)
+        noise = random.normal(key_momentum, jnp.shape(r_flat)) / jnp.sqrt(
+            inverse_mass_matrix
+        )
+        r = unravel_fn(jnp.sqrt(1 - damping) * r_flat + jnp.sqrt(damping) * noise)
+
+        vv_state = IntegratorState(state.z, r, state.potential_energy, state.z_grad)
+        vv_state_new = vv_update(step_size, inverse_mass_matrix, vv_state)
+        energy_old = vv_state.potential_energy + euclidean_kinetic_energy(
+            inverse_mass_matrix, vv_state.r
+        )
+        energy_new = vv_state_new.potential_energy + euclidean_kinetic_energy(
+            inverse_mass_matrix, vv_state_new.r
+        )
+        delta_energy = energy_new - energy_old
+        delta_energy = jnp.where(jnp.isnan(delta_energy), jnp.inf, delta_energy)
+        accept_prob = jnp.clip(jnp.exp(-delta_energy), a_max=1.0)
+        diverging = delta_energy > self._max_delta_energy
+
+        # non-reversible acceptance test: the slice variable drifts by `damping / 2`
+        # per iteration, so that rejections are clustered together
+        slice_var = (state.slice + 1.0 + 0.5 * damping) % 2.0 - 1.0
+        transition = jnp.log(jnp.abs(slice_var)) < -delta_energy
+        slice_var = jnp.where(transition, slice_var * jnp.exp(delta_energy), slice_var)
+        # the momentum is negated on rejection
+        vv_state_rejected = vv_state._replace(
+            r=jax.tree_util.tree_map(jnp.negative, vv_state.r)
+        )
+        vv_state = cond(transition, vv_state_new, identity, vv_state_rejected, identity)
+
+        # do not update adapt_state after warmup phase
+        adapt_state = cond(
+            state.i < self._num_warmup,
+            (state.i, vv_state.z, vv_state.z_grad, state.adapt_state),
+            lambda args: self._adapt(*args),
+            state.adapt_state,
+            identity,
+        )
+
+        itr = state.i + 1
+        n = jnp.where(state.i < self._num_warmup, itr, itr - self._num_warmup)
+        mean_accept_prob = (
+            state.mean_accept_prob + (accept_prob - state.mean_accept_prob) / n
+        )
+        return GHMCState(
+            itr,
+            vv_state.z,
+            vv_state.r,
+            vv_state.potential_energy,
+            vv_state.z_grad,
+            slice_var,
+            accept_prob,
+            mean_accept_prob,
+            diverging,
+            adapt_state,
+            rng_key,
+        )
+
+    def sample(self, state, model_args, model_kwargs):
+        """
+        Run GHMC from the given :data:`~numpyro.infer.ghmc.GHMCState` and return the
+        resulting :data:`~numpyro.infer.ghmc.GHMCState`.
+
+        :param GHMCState state: Represents the current state.
+        :param model_args: Arguments provided to the model.
+        :param model_kwargs: Keyword arguments provided to the model.
+        :return: Next `state` after running GHMC.
+        """
+        _, vv_update = velocity_verlet(
+            self._get_potential_fn(model_args, model_kwargs), euclidean_kinetic_energy
+        )
+        sample_fn = partial(self._sample_one, vv_update=vv_update)
+        if self._vectorized:
+            sample_fn = vmap(sample_fn, axis_name=_CHAIN_AXIS_NAME)
+        return sample_fn(state)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_postprocess_fn"] = None
+        state["_potential_fn_gen"] = None
+        return state
+
+
+class MEADS(GHMC):
+    """
+    Generalized HMC with the Maximum-Eigenvalue Adaptation of Damping and Step size
+    (MEADS) scheme of reference [1]. The vectorized chains are split into
+    `num_folds` folds; during warmup, the diagonal mass matrix, step size and
+    damping of the chains of each fold are estimated at every iteration from the
+    current states of the chains in the other folds:
+
+        + the inverse mass matrix is the variance of the positions,
+        + the step size is ``0.5 / sqrt(lambda_g)``, where ``lambda_g`` is the
+          largest eigenvalue of the second moment of the preconditioned gradients,
+        + the damping is ``1 - exp(-2 * step_size / sqrt(lambda_z))``, where
+          ``lambda_z`` is the largest eigenvalue of the correlation of the positions.
+
+    The largest eigenvalues are estimated from the chains without forming a
+    (dim x dim) matrix, so the cost of the adaptation grows linearly with the
+    dimension. As there is no tree building, this kernel is a good replacement for
+    :class:`~numpyro.infer.hmc.NUTS` on models where the tree depth varies
+    a lot between chains, which slows down vectorized NUTS chains.
+
+    .. note:: This kernel requires vectorized chains, e.g.
+        ``MCMC(MEADS(model), ..., num_chains=128, chain_method="vectorized")``,
+        with at least two chains outside of each fold.
+
+    **References:**
+
+    1. *Tuning-Free Generalized Hamiltonian Monte Carlo*,
+       Matthew D. Hoffman, Pavel Sountsov
+    2. *Non-reversibly updating a uniform [0,1] value for Metropolis accept/reject
+       decisions*, Radford M. Neal
+
+    :param model: Python callable containing Pyro :mod:`~numpyro.primitives`.
+        If model is provided, `potential_fn` will be inferred using the model.
+    :param potential_fn: Python callable that computes the potential energy
+        given input parameters. The input parameters to `potential_fn` can be
+        any python collection type, provided that `init_params` argument to
+        :meth:`init` has the same type.
+    :param int num_folds: The number of folds the chains are split into.
+        Defaults to 4.
+    :param float step_size_multiplier: The factor of the step size relative to the
+        stability limit of the leapfrog integrator. Defaults to 0.5.
+    :param callable init_strategy: a per-site initialization function.
+        See :ref:`init_strategy` section for available functions.
+
+    **Example**
+
+    .. doctest::
+
+        >>> import jax
+        >>> import numpyro
+        >>> import numpyro.distributions as dist
+        >>> from numpyro.infer import MCMC, MEADS
+
+        >>> def model():
+        ...     numpyro.sample("x", dist.Normal().expand([10]))
+        >>>
+        >>> mcmc = MCMC(MEADS(model), num_warmup=1000, num_samples=1000, num_chains=64,
+        ...             chain_method="vectorized", progress_bar=False)
+        >>> mcmc.run(jax.random.PRNGKey(0))
+        >>> mcmc.print_summary()  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        model=None,
+        potential_fn=None,
+        num_folds=4,
+        step_size_multiplier=0.5,
+        init_strategy=init_to_uniform,
+    ):
+        super().__init__(
+            model=model, potential_fn=potential_fn, init_strategy=init_strategy
+        )
+        if num_folds < 1:
+            raise ValueError("`num_folds` must be a positive integer.")
+        self._num_folds = num_folds
+        self._step_size_multiplier = step_size_multiplier
+
+    def _init_adapt_state(self, z, z_grad):
+        return self._adapt(jnp.array(0), z, z_grad, None)
+
+    def _adapt(self, i, z, z_grad, adapt_state):
+        # gather the states of all chains along the vectorized chain axis
+        z_all = lax.all_gather(ravel_pytree(z)[0], _CHAIN_AXIS_NAME)
+        z_grad_all = lax.all_gather(ravel_pytree(z_grad)[0], _CHAIN_AXIS_NAME)
+        num_chains = z_all.shape[0]
+        fold = lax.axis_index(_CHAIN_AXIS_NAME) % self._num_folds
+        mask = (jnp.arange(num_chains) % self._num_folds != fold)[:, None]
+        n = jnp.sum(mask)
+
+        mean = jnp.sum(jnp.where(mask, z_all, 0.0), axis=0) / n
+        z_centered = jnp.where(mask, z_all - mean, 0.0)
+        variance = jnp.sum(z_centered ** 2, axis=0) / (n - 1)
+        # regularize the estimate as in `warmup_adapter`
+        variance = (n / (n + 5.0)) * variance + 1e-3 * (5.0 / (n + 5.0))
+        std = jnp.sqrt(variance)
+
+        grad_scaled = jnp.where(mask, z_grad_all, 0.0) * std
+        step_size = self._step_size_multiplier / jnp.sqrt(
+            _max_eigenvalue(grad_scaled, n)
+        )
+        z_scaled = z_centered / std
+        damping = -jnp.expm1(-2 * step_size / jnp.sqrt(_max_eigenvalue(z_scaled, n)))
+        return GHMCAdaptState(step_size, damping, variance)
+
+    def init(self, rng_key, num_warmup, init_params, model_args, model_kwargs):
+        if rng_key.ndim == 1:
+            raise ValueError(
+                "MEADS adapts its parameters across chains, so it requires vectorized"
+                " chains, e.g. `chain_method='vectorized'` with `num_chains > 1`."
+            )
+        num_chains = rng_key.shape[0]
+        if num_chains - (num_chains + self._num_folds - 1) // self._num_folds < 2:
+            raise ValueError(
+                "MEADS requires at least two chains outside of each fold, got"
+                " {} chains with `num_folds={}`.".format(num_chains, self._num_folds)
+            )
+        return super().init(rng_key, num_warmup, init_params, model_args, model_kwargs)
@@ -3,23 +3,32 @@
 
 from collections import OrderedDict, namedtuple
 import math
+from operator import attrgetter
 import os
 
-from jax import device_put, lax, partial, random, vmap
+import numpy as np
+
+from jax import core, device_put, lax, partial, random, vmap
 from jax.flatten_util import ravel_pytree
 import jax.numpy as jnp
+from jax.tree_util import tree_flatten, tree_map
 
 from numpyro.infer.hmc_util import (
     IntegratorState,
+    LowRankMatrix,
+    _kinetic_grad,
+    _low_rank_sqrt_matvec,
+    build_adaptation_schedule,
     build_tree,
     euclidean_kinetic_energy,
+    find_dense_mass_blocks,
     find_reasonable_step_size,
     velocity_verlet,
     warmup_adapter,
 )
 from numpyro.infer.mcmc import MCMCKernel
 from numpyro.infer.util import ParamInfo, init_to_uniform, initialize_model
-from numpyro.util import cond, fori_loop, identity
+from numpyro.util import cond, fori_collect, fori_loop, identity
 
 HMCState = namedtuple(
     "HMCState",
@@ -51,7 +60,7 @@ A :func:`~collections.namedtuple` consisting of the following fields:
  - **r** - The current momentum variable. If this is None, a new momentum variable
    will be drawn at the beginning of each sampling step.
  - **trajectory_length** - The amount of time to run HMC dynamics in each sampling step.
-   This field is not used in NUTS.
+   This field is not used in NUTS. In ChEES-HMC, this is a :data:`ChEESAdaptState`.
  - **num_steps** - Number of steps in the Hamiltonian trajectory (for diagnostics).
    In NUTS sampler, the tree depth of a trajectory can be computed from this field
    with `tree_depth = np.log2(num_steps).astype(int) + 1`.
@@ -68,12 +77,47 @@ A :func:`~collections.namedtuple` consisting of the following fields:
      iteration.
    + **mass_matrix_sqrt** - The square root of mass matrix to be used for the next
      iteration. In case of dense mass, this is the Cholesky factorization of the
-     mass matrix.
+     mass matrix. In case of low-rank-plus-diagonal mass, this is the mass matrix
+     as a :data:`~numpyro.infer.hmc_util.LowRankMatrix`, whose square root is
+     applied implicitly.
 
  - **rng_key** - random number generator seed used for the iteration.
 """
 
 
+ChEESAdaptState = namedtuple(
+    "ChEESAdaptState",
+    [
+        "trajectory_length",
+        "log_trajectory_length",
+        "log_trajectory_length_avg",
+        "grad_sq_avg",
+    ],
+)
+"""
+A :func:`~collections.namedtuple` used in ChEES-HMC, consisting of the following
+fields:
+
+ - **trajectory_length** - The trajectory length, before jittering, to be used in
+   the next iteration.
+ - **log_trajectory_length** - The current iterate of the optimization of the log
+   trajectory length during warmup.
+ - **log_trajectory_length_avg** - The running average of the iterates, which is
+   used after warmup.
+ - **grad_sq_avg** - The moving average of the squared gradients of the ChEES
+   criterion (the second moment of Adam).
+"""
+
+# name of the vmap axis of vectorized chains
+_CHAIN_AXIS_NAME = "chains"
+# Adam settings to optimize the log trajectory length of ChEES-HMC, from reference [1]
+# of `ChEESHMC`
+_CHEES_LEARNING_RATE = 0.025
+_CHEES_BETA2 = 0.95
+# bounds the number of leapfrog steps of a ChEES-HMC trajectory
+_CHEES_MAX_NUM_STEPS = 1000
+
+
 def _get_num_steps(step_size, trajectory_length):
     num_steps = jnp.ceil(trajectory_length / step_size)
     # NB: casting to jnp.int64 does not take effect (returns jnp.int32 instead)
@@ -81,6 +125,41 @@ def _get_num_steps(step_size, trajectory_length):
     return num_steps.astype(jnp.result_type(int))
 
 
+def _split_inverse_mass_matrix(z, inverse_mass_matrix, dense_mass, batch_ndim=0):
+    # Splits the diagonal inverse mass matrix of all sites, i.e. a dict with the
+    # single key `tuple(sorted(z))`, into the diagonals of the blocks of
+    # `dense_mass` and of the remaining sites. `batch_ndim` is the number of
+    # leading chain dimensions of `z` and of the inverse mass matrix.
+    names = sorted(z)
+    diagonal = inverse_mass_matrix[tuple(names)]
+    sizes = [int(np.prod(jnp.shape(z[name])[batch_ndim:])) for name in names]
+    offsets = np.cumsum([0] + sizes)
+    site_diagonals = {
+        name: diagonal[..., offsets[k] : offsets[k + 1]] for k, name in enumerate(names)
+    }
+    blocks = list(dense_mass)
+    remaining_sites = tuple(name for name in names if name not in set().union(*blocks))
+    if remaining_sites:
+        blocks.append(remaining_sites)
+    return {
+        site_names: jnp.concatenate([site_diagonals[name] for name in site_names], -1)
+        for site_names in blocks
+    }
+
+
+def _halton(i):
+    # van der Corput sequence in base 2, i.e. the first dimension of the Halton
+    # sequence, at index `i + 1`
+    def body_fn(_, val):
+        n, x, f = val
+        f = f / 2
+        return n // 2, x + f * (n % 2), f
+
+    n = jnp.asarray(i + 1, dtype=jnp.result_type(int))
+    _, x, _ = fori_loop(0, 32, body_fn, (n, jnp.zeros(()), jnp.ones(())))
+    return x
+
+
 def momentum_generator(prototype_r, mass_matrix_sqrt, rng_key):
     if isinstance(mass_matrix_sqrt, dict):
         rng_keys = random.split(rng_key, len(mass_matrix_sqrt))
@@ -91,6 +170,11 @@ def momentum_generator(prototype_r, mass_matrix_sqrt, rng_key):
         return r
 
     _, unpack_fn = ravel_pytree(prototype_r)
+    if isinstance(mass_matrix_sqrt, LowRankMatrix):
+        # here `mass_matrix_sqrt` is the mass matrix, whose square root is implicit
+        eps = random.normal(rng_key, jnp.shape(mass_matrix_sqrt.scale))
+        r = _low_rank_sqrt_matvec(mass_matrix_sqrt, eps)
+        return unpack_fn(r)
     eps = random.normal(rng_key, jnp.shape(mass_matrix_sqrt)[:1])
     if mass_matrix_sqrt.ndim == 1:
         r = jnp.multiply(mass_matrix_sqrt, eps)
@@ -102,7 +186,13 @@ def momentum_generator(prototype_r, mass_matrix_sqrt, rng_key):
         raise ValueError("Mass matrix has incorrect number of dims.")
 
 
-def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
+def hmc(
+    potential_fn=None,
+    potential_fn_gen=None,
+    kinetic_fn=None,
+    algo="NUTS",
+    integrator=None,
+):
     r"""
     Hamiltonian Monte Carlo inference, using either fixed number of
     steps or the No U-Turn Sampler (NUTS) with adaptive path length.
@@ -128,8 +218,15 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
     :param kinetic_fn: Python callable that returns the kinetic energy given
         inverse mass matrix and momentum. If not provided, the default is
         euclidean kinetic energy.
-    :param str algo: Whether to run ``HMC`` with fixed number of steps or ``NUTS``
-        with adaptive path length. Default is ``NUTS``.
+    :param str algo: Whether to run ``HMC`` with fixed number of steps, ``NUTS``
+        with adaptive path length, or ``ChEES`` (ChEES-HMC, see :class:`ChEESHMC`)
+        with jittered trajectories whose length is adapted across vectorized chains,
+        or ``DR`` (delayed-rejection HMC, see :class:`DRHMC`) which retries a rejected
+        proposal with a smaller step size. Default is ``NUTS``.
+    :param integrator: Python callable with the same signature as
+        :func:`~numpyro.infer.hmc_util.velocity_verlet` which returns the
+        (`init_fn`, `update_fn`) pair of a symplectic integrator. If not provided,
+        the default is :func:`~numpyro.infer.hmc_util.velocity_verlet`.
     :return: a tuple of callables (`init_kernel`, `sample_kernel`), the first
         one to initialize the sampler, and the second one to generate samples
         given an existing one.
@@ -172,14 +269,18 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
     """
     if kinetic_fn is None:
         kinetic_fn = euclidean_kinetic_energy
+    if integrator is None:
+        integrator = velocity_verlet
     vv_update = None
     max_treedepth = None
     wa_update = None
     wa_steps = None
     forward_mode_ad = False
     max_delta_energy = 1000.0
-    if algo not in {"HMC", "NUTS"}:
-        raise ValueError("`algo` must be one of `HMC` or `NUTS`.")
+    chain_axis_name = None
+    reduction_factor = None
+    if algo not in {"HMC", "NUTS", "ChEES", "DR"}:
+        raise ValueError("`algo` must be one of `HMC`, `NUTS`, `ChEES` or `DR`.")
 
     def init_kernel(
         init_params,
@@ -193,9 +294,12 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
         target_accept_prob=0.8,
         trajectory_length=2 * math.pi,
         max_tree_depth=10,
+        step_size_reduction=2,
         find_heuristic_step_size=False,
         forward_mode_differentiation=False,
         regularize_mass_matrix=True,
+        adapt_axis_name=None,
+        low_rank_mass=None,
         model_args=(),
         model_kwargs=None,
         rng_key=random.PRNGKey(0),
@@ -252,11 +356,21 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             scheme of NUTS sampler. Defaults to 10. This argument also accepts a tuple of
             integers `(d1, d2)`, where `d1` is the max tree depth during warmup phase and
             `d2` is the max tree depth during post warmup phase.
+        :param int step_size_reduction: The factor by which the step size is reduced
+            (and the number of steps increased) for the second proposal of
+            delayed-rejection HMC. Defaults to 2.
         :param bool find_heuristic_step_size: whether to a heuristic function to adjust the
             step size at the beginning of each adaptation window. Defaults to False.
         :param bool regularize_mass_matrix: whether or not to regularize the estimated mass
             matrix for numerical stability during warmup phase. Defaults to True. This flag
             does not take effect if ``adapt_mass_matrix == False``.
+        :param str adapt_axis_name: If provided, the name of the :func:`jax.vmap` or
+            :func:`jax.pmap` axis over chains along which the warmup statistics are
+            pooled, so that the chains share the same adapted step size and mass
+            matrix (see :func:`~numpyro.infer.hmc_util.warmup_adapter`).
+        :param int low_rank_mass: If provided, the rank of the low-rank correction of
+            a low-rank-plus-diagonal mass matrix (see
+            :func:`~numpyro.infer.hmc_util.warmup_adapter`). Defaults to None.
         :param tuple model_args: Model arguments if `potential_fn_gen` is specified.
         :param dict model_kwargs: Model keyword arguments if `potential_fn_gen` is specified.
         :param jax.random.PRNGKey rng_key: random key to be used as the source of
@@ -269,6 +383,15 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
                 trajectory_length, jnp.result_type(float)
             )
         nonlocal wa_update, max_treedepth, vv_update, wa_steps, forward_mode_ad
+        nonlocal chain_axis_name, reduction_factor
+        if algo == "ChEES" and adapt_axis_name is None:
+            raise ValueError(
+                "ChEES-HMC adapts the trajectory length across chains, so it requires"
+                " vectorized chains, e.g. `chain_method='vectorized'` with"
+                " `num_chains > 1`."
+            )
+        chain_axis_name = adapt_axis_name
+        reduction_factor = step_size_reduction
         forward_mode_ad = forward_mode_differentiation
         wa_steps = num_warmup
         max_treedepth = (
@@ -293,7 +416,11 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
         find_reasonable_ss = None
         if find_heuristic_step_size:
             find_reasonable_ss = partial(
-                find_reasonable_step_size, pe_fn, kinetic_fn, momentum_generator
+                find_reasonable_step_size,
+                pe_fn,
+                kinetic_fn,
+                momentum_generator,
+                integrator=integrator,
             )
 
         wa_init, wa_update = warmup_adapter(
@@ -304,6 +431,8 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             target_accept_prob=target_accept_prob,
             find_reasonable_step_size=find_reasonable_ss,
             regularize_mass_matrix=regularize_mass_matrix,
+            axis_name=adapt_axis_name,
+            low_rank_mass=low_rank_mass,
         )
 
         rng_key_hmc, rng_key_wa, rng_key_momentum = random.split(rng_key, 3)
@@ -312,11 +441,21 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             z_info, rng_key_wa, step_size, inverse_mass_matrix=inverse_mass_matrix
         )
         r = momentum_generator(z, wa_state.mass_matrix_sqrt, rng_key_momentum)
-        vv_init, vv_update = velocity_verlet(pe_fn, kinetic_fn, forward_mode_ad)
+        vv_init, vv_update = integrator(pe_fn, kinetic_fn, forward_mode_ad)
         vv_state = vv_init(z, r, potential_energy=pe, z_grad=z_grad)
         energy = vv_state.potential_energy + kinetic_fn(
             wa_state.inverse_mass_matrix, vv_state.r
         )
+        if algo == "ChEES":
+            if trajectory_length is None:
+                trajectory_length = wa_state.step_size
+            log_trajectory_length = jnp.log(trajectory_length)
+            trajectory_length = ChEESAdaptState(
+                trajectory_length,
+                log_trajectory_length,
+                log_trajectory_length,
+                jnp.zeros(()),
+            )
         zero_int = jnp.array(0, dtype=jnp.result_type(int))
         hmc_state = HMCState(
             zero_int,
@@ -335,6 +474,73 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
         )
         return device_put(hmc_state)
 
+    def _leapfrog(step_size, num_steps, inverse_mass_matrix, vv_state):
+        vv_state = fori_loop(
+            0,
+            num_steps,
+            lambda i, val: vv_update(step_size, inverse_mass_matrix, val),
+            vv_state,
+        )
+        energy = vv_state.potential_energy + kinetic_fn(inverse_mass_matrix, vv_state.r)
+        return vv_state, energy
+
+    def _delayed_rejection(args):
+        # the second stage of delayed-rejection HMC, which retries the trajectory from
+        # the initial state with `reduction_factor` times smaller steps
+        (
+            step_size,
+            num_steps,
+            inverse_mass_matrix,
+            vv_state,
+            energy_old,
+            accept_prob,
+            diverging,
+            rng_key,
+        ) = args
+        vv_state_new, energy_new = _leapfrog(
+            step_size / reduction_factor,
+            num_steps * reduction_factor,
+            inverse_mass_matrix,
+            vv_state,
+        )
+        # to preserve detailed balance, the acceptance probability accounts for the
+        # first stage proposal which would have been rejected in the reverse move,
+        # i.e. the one from the new state with negated momentum
+        vv_state_ghost = vv_state_new._replace(r=tree_map(lambda r: -r, vv_state_new.r))
+        _, energy_ghost = _leapfrog(
+            step_size, num_steps, inverse_mass_matrix, vv_state_ghost
+        )
+        delta_energy = energy_new - energy_old
+        delta_energy = jnp.where(jnp.isnan(delta_energy), jnp.inf, delta_energy)
+        ghost_accept_prob = jnp.exp(jnp.minimum(energy_new - energy_ghost, 0.0))
+        ghost_accept_prob = jnp.where(jnp.isnan(energy_ghost), 0.0, ghost_accept_prob)
+        log_accept_ratio = (
+            -delta_energy + jnp.log1p(-ghost_accept_prob) - jnp.log1p(-accept_prob)
+        )
+        log_accept_ratio = jnp.where(
+            jnp.isnan(log_accept_ratio), -jnp.inf, log_accept_ratio
+        )
+        accept_prob_new = jnp.exp(jnp.minimum(log_accept_ratio, 0.0))
+        transition = random.bernoulli(rng_key, accept_prob_new)
+        vv_state, energy = cond(
+            transition,
+            (vv_state_new, energy_new),
+            identity,
+            (vv_state, energy_old),
+            identity,
+        )
+        # the number of steps includes the ones of the first stage and the ghost
+        # trajectory; the acceptance indicator of the first stage combined with the
+        # second stage acceptance probability is an unbiased estimate of the overall
+        # acceptance probability, which is used for step size adaptation
+        return (
+            vv_state,
+            energy,
+            num_steps * (reduction_factor + 2),
+            accept_prob_new,
+            diverging & (delta_energy > max_delta_energy),
+        )
+
     def _hmc_next(
         step_size,
         inverse_mass_matrix,
@@ -347,7 +553,7 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
         if potential_fn_gen:
             nonlocal vv_update, forward_mode_ad
             pe_fn = potential_fn_gen(*model_args, **model_kwargs)
-            _, vv_update = velocity_verlet(pe_fn, kinetic_fn, forward_mode_ad)
+            _, vv_update = integrator(pe_fn, kinetic_fn, forward_mode_ad)
 
         # no need to spend too many steps if the state z has 0 size (i.e. z is empty)
         if len(inverse_mass_matrix) == 0:
@@ -356,23 +562,37 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             num_steps = _get_num_steps(step_size, trajectory_length)
         # makes sure trajectory length is constant, rather than step_size * num_steps
         step_size = trajectory_length / num_steps
-        vv_state_new = fori_loop(
-            0,
-            num_steps,
-            lambda i, val: vv_update(step_size, inverse_mass_matrix, val),
-            vv_state,
+        vv_state_new, energy_new = _leapfrog(
+            step_size, num_steps, inverse_mass_matrix, vv_state
         )
         energy_old = vv_state.potential_energy + kinetic_fn(
             inverse_mass_matrix, vv_state.r
         )
-        energy_new = vv_state_new.potential_energy + kinetic_fn(
-            inverse_mass_matrix, vv_state_new.r
-        )
         delta_energy = energy_new - energy_old
         delta_energy = jnp.where(jnp.isnan(delta_energy), jnp.inf, delta_energy)
         accept_prob = jnp.clip(jnp.exp(-delta_energy), a_max=1.0)
         diverging = delta_energy > max_delta_energy
+        if algo == "DR":
+            rng_key, rng_key_delayed = random.split(rng_key)
         transition = random.bernoulli(rng_key, accept_prob)
+        if algo == "DR":
+            return cond(
+                transition,
+                (vv_state_new, energy_new, num_steps),
+                lambda args: args + (jnp.ones(()), jnp.array(False)),
+                (
+                    step_size,
+                    num_steps,
+                    inverse_mass_matrix,
+                    vv_state,
+                    energy_old,
+                    accept_prob,
+                    diverging,
+                    rng_key_delayed,
+                ),
+                _delayed_rejection,
+            )
+        vv_proposal = vv_state_new
         vv_state, energy = cond(
             transition,
             (vv_state_new, energy_new),
@@ -380,6 +600,8 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             (vv_state, energy_old),
             identity,
         )
+        if algo == "ChEES":
+            return vv_state, energy, num_steps, accept_prob, diverging, vv_proposal
         return vv_state, energy, num_steps, accept_prob, diverging
 
     def _nuts_next(
@@ -394,7 +616,7 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
         if potential_fn_gen:
             nonlocal vv_update, forward_mode_ad
             pe_fn = potential_fn_gen(*model_args, **model_kwargs)
-            _, vv_update = velocity_verlet(pe_fn, kinetic_fn, forward_mode_ad)
+            _, vv_update = integrator(pe_fn, kinetic_fn, forward_mode_ad)
 
         binary_tree = build_tree(
             vv_update,
@@ -422,6 +644,52 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             binary_tree.diverging,
         )
 
+    def _chees_update(t, accept_prob, z, vv_proposal, inverse_mass_matrix, args):
+        # one Adam step (without momentum) of gradient ascent on the ChEES criterion
+        # w.r.t. the log trajectory length, where the gradient is estimated from all
+        # chains along `chain_axis_name`
+        trajectory_length, state = args
+        z_flat = ravel_pytree(z)[0]
+        z_new = ravel_pytree(vv_proposal.z)[0]
+        velocity = ravel_pytree(
+            _kinetic_grad(kinetic_fn, inverse_mass_matrix, vv_proposal.r)
+        )[0]
+        z_centered = z_flat - lax.pmean(z_flat, chain_axis_name)
+        z_new_centered = z_new - lax.pmean(z_new, chain_axis_name)
+        grad = (
+            trajectory_length
+            * (jnp.sum(z_new_centered ** 2) - jnp.sum(z_centered ** 2))
+            * jnp.dot(z_new_centered, velocity)
+        )
+        # weight the estimates by the acceptance probabilities
+        is_finite = jnp.isfinite(grad)
+        weight = jnp.where(is_finite, accept_prob, 0.0)
+        grad = lax.psum(weight * jnp.where(is_finite, grad, 0.0), chain_axis_name)
+        grad = grad / jnp.maximum(lax.psum(weight, chain_axis_name), 1e-8)
+
+        itr = t + 1
+        grad_sq_avg = _CHEES_BETA2 * state.grad_sq_avg + (1 - _CHEES_BETA2) * grad ** 2
+        grad_sq_avg_hat = grad_sq_avg / (1 - _CHEES_BETA2 ** itr)
+        log_trajectory_length = state.log_trajectory_length + (
+            _CHEES_LEARNING_RATE * grad / (jnp.sqrt(grad_sq_avg_hat) + 1e-8)
+        )
+        weight_t = itr ** (-0.75)
+        log_trajectory_length_avg = (
+            1 - weight_t
+        ) * state.log_trajectory_length_avg + weight_t * log_trajectory_length
+        # at the end of warmup phase, use the average of log trajectory length
+        trajectory_length = jnp.exp(
+            jnp.where(
+                t == (wa_steps - 1), log_trajectory_length_avg, log_trajectory_length
+            )
+        )
+        return ChEESAdaptState(
+            trajectory_length,
+            log_trajectory_length,
+            log_trajectory_length_avg,
+            grad_sq_avg,
+        )
+
     _next = _nuts_next if algo == "NUTS" else _hmc_next
 
     def sample_kernel(hmc_state, model_args=(), model_kwargs=None):
@@ -450,13 +718,21 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
         vv_state = IntegratorState(
             hmc_state.z, r, hmc_state.potential_energy, hmc_state.z_grad
         )
-        if algo == "HMC":
+        if algo in ("HMC", "DR"):
             hmc_length_args = (hmc_state.trajectory_length,)
+        elif algo == "ChEES":
+            # the trajectories of all chains have the same (jittered) length, so the
+            # vectorized chains run the same number of leapfrog steps
+            trajectory_length = jnp.minimum(
+                hmc_state.trajectory_length.trajectory_length,
+                _CHEES_MAX_NUM_STEPS * hmc_state.adapt_state.step_size,
+            )
+            hmc_length_args = (_halton(hmc_state.i) * trajectory_length,)
         else:
             hmc_length_args = (
                 jnp.where(hmc_state.i < wa_steps, max_treedepth[0], max_treedepth[1]),
             )
-        vv_state, energy, num_steps, accept_prob, diverging = _next(
+        vv_state, energy, num_steps, accept_prob, diverging, *vv_proposal = _next(
             hmc_state.adapt_state.step_size,
             hmc_state.adapt_state.inverse_mass_matrix,
             vv_state,
@@ -465,6 +741,23 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             rng_key_transition,
             *hmc_length_args,
         )
+        trajectory_length = hmc_state.trajectory_length
+        if algo == "ChEES":
+            # not update trajectory length after warmup phase
+            trajectory_length = cond(
+                hmc_state.i < wa_steps,
+                (hmc_length_args[0], trajectory_length),
+                partial(
+                    _chees_update,
+                    hmc_state.i,
+                    accept_prob,
+                    hmc_state.z,
+                    vv_proposal[0],
+                    hmc_state.adapt_state.inverse_mass_matrix,
+                ),
+                trajectory_length,
+                identity,
+            )
         # not update adapt_state after warmup phase
         adapt_state = cond(
             hmc_state.i < wa_steps,
@@ -488,7 +781,7 @@ def hmc(potential_fn=None, potential_fn_gen=None, kinetic_fn=None, algo="NUTS"):
             vv_state.potential_energy,
             energy,
             r,
-            hmc_state.trajectory_length,
+            trajectory_length,
             num_steps,
             accept_prob,
             mean_accept_prob,
@@ -561,8 +854,21 @@ class HMC(MCMCKernel):
               use a dense mass matrix for the joint (x, y, z)
             + dense_mass=[("x",), ("y",), ("z")]: use dense mass matrices for
               each of x, y, and z (i.e. block-diagonal with 3 blocks)
-
-    :type dense_mass: bool or list
+            + dense_mass="auto": run the warmup steps of the first two slow
+              adaptation windows with a diagonal mass matrix during `init`, detect
+              the blocks of strongly correlated sites from their samples (see
+              :func:`~numpyro.infer.hmc_util.find_dense_mass_blocks`), then
+              continue the warmup phase with dense mass matrices for these blocks,
+              as with ``dense_mass=[blocks]``. The steps run during `init` count
+              towards `num_warmup`, so the corresponding warmup draws of
+              :class:`~numpyro.infer.mcmc.MCMC` repeat the last state of these
+              steps. The blocks are detected once and shared by all chains and
+              later runs of this kernel. This requires the latent values to be a
+              dict, e.g. when `model` is provided, and chains which are not
+              initialized under a transformation (i.e. not with
+              ``chain_method="parallel"``).
+
+    :type dense_mass: bool or list or str
     :param float target_accept_prob: Target acceptance probability for step size
         adaptation using Dual Averaging. Increasing this value will lead to a smaller
         step size, hence the sampling will be slower but more robust. Defaults to 0.8.
@@ -583,6 +889,30 @@ class HMC(MCMCKernel):
     :param bool regularize_mass_matrix: whether or not to regularize the estimated mass
         matrix for numerical stability during warmup phase. Defaults to True. This flag
         does not take effect if ``adapt_mass_matrix == False``.
+    :param bool adapt_across_chains: whether to pool the warmup statistics of
+        vectorized chains (`chain_method="vectorized"` or `"parallel_vectorized"` in
+        :class:`~numpyro.infer.mcmc.MCMC`). If True, the step size is adapted from the
+        mean acceptance probability of the chains and the mass matrix is estimated
+        from the samples of all chains, which allows shorter warmup phases when many
+        chains are run. With `"parallel_vectorized"`, the chains of each device are
+        pooled. Defaults to False.
+    :param int low_rank_mass: If provided, use a diagonal mass matrix plus a
+        correction of rank `low_rank_mass`, which is estimated from the warmup samples
+        and the gradients of the potential energy at those samples (see
+        :func:`~numpyro.infer.hmc_util.low_rank_covariance`). This captures the
+        dominant correlations of the posterior with `O(d k)` memory and time per
+        iteration for `d` latent dimensions and rank `k`, so it is an alternative to
+        ``dense_mass=True`` for high-dimensional models. Requires ``dense_mass=False``.
+        Defaults to None.
+    :param integrator: Python callable with the same signature as
+        :func:`~numpyro.infer.hmc_util.velocity_verlet` which returns the
+        (`init_fn`, `update_fn`) pair of the symplectic integrator used to simulate
+        the Hamiltonian dynamics, e.g. the multi-stage integrators
+        :func:`~numpyro.infer.hmc_util.two_stage_bcss` or
+        :func:`~numpyro.infer.hmc_util.three_stage_bcss`, which take several
+        gradient evaluations per step but usually allow larger step sizes. Note that
+        `step_size` is then the size of a whole multi-stage step. Defaults to
+        :func:`~numpyro.infer.hmc_util.velocity_verlet`.
     """
 
     def __init__(
@@ -601,6 +931,9 @@ class HMC(MCMCKernel):
         find_heuristic_step_size=False,
         forward_mode_differentiation=False,
         regularize_mass_matrix=True,
+        adapt_across_chains=False,
+        low_rank_mass=None,
+        integrator=None,
     ):
         if not (model is None) ^ (potential_fn is None):
             raise ValueError("Only one of `model` or `potential_fn` must be specified.")
@@ -622,10 +955,19 @@ class HMC(MCMCKernel):
         )
         self._algo = "HMC"
         self._max_tree_depth = 10
+        self._step_size_reduction = 2
         self._init_strategy = init_strategy
         self._find_heuristic_step_size = find_heuristic_step_size
         self._forward_mode_differentiation = forward_mode_differentiation
         self._regularize_mass_matrix = regularize_mass_matrix
+        self._adapt_across_chains = adapt_across_chains
+        self._low_rank_mass = low_rank_mass
+        self._integrator = integrator
+        # the blocks detected by `dense_mass="auto"`, which are shared by all chains
+        self._dense_mass_blocks = None
+        # the number of warmup steps run by the pilot phase of `dense_mass="auto"`
+        self._num_pilot_steps = 0
+        self._skip_pilot = False
         # Set on first call to init
         self._init_fn = None
         self._potential_fn_gen = None
@@ -648,6 +990,7 @@ class HMC(MCMCKernel):
                     potential_fn_gen=potential_fn,
                     kinetic_fn=self._kinetic_fn,
                     algo=self._algo,
+                    integrator=self._integrator,
                 )
             self._potential_fn_gen = potential_fn
             self._postprocess_fn = postprocess_fn
@@ -656,6 +999,7 @@ class HMC(MCMCKernel):
                 potential_fn=self._potential_fn,
                 kinetic_fn=self._kinetic_fn,
                 algo=self._algo,
+                integrator=self._integrator,
             )
 
         return init_params
@@ -696,9 +1040,36 @@ class HMC(MCMCKernel):
                 "Valid value of `init_params` must be provided with" " `potential_fn`."
             )
 
+        vectorized = rng_key.ndim > 1
+        adapt_axis_name = (
+            _CHAIN_AXIS_NAME if vectorized and self._adapt_across_chains else None
+        )
         # change dense_mass to a structural form
         dense_mass = self._dense_mass
         inverse_mass_matrix = self._inverse_mass_matrix
+        step_size = self._step_size
+        pilot_state = None
+        if isinstance(dense_mass, str):
+            if dense_mass != "auto":
+                raise ValueError("`dense_mass` must be a bool, a list or 'auto'.")
+            pilot_state = self._run_pilot(
+                rng_key, num_warmup, init_params, model_args, model_kwargs
+            )
+            dense_mass = self._dense_mass_blocks
+        if pilot_state is not None:
+            # continue from the last state of the pilot phase, with its step size and
+            # its diagonal mass matrix
+            init_params = ParamInfo(
+                pilot_state.z, pilot_state.potential_energy, pilot_state.z_grad
+            )
+            step_size = pilot_state.adapt_state.step_size
+            inverse_mass_matrix = _split_inverse_mass_matrix(
+                pilot_state.z,
+                pilot_state.adapt_state.inverse_mass_matrix,
+                dense_mass,
+                batch_ndim=jnp.ndim(pilot_state.i),
+            )
+            rng_key = pilot_state.rng_key
         if self._model is not None:
             z = init_params[0] if isinstance(init_params, ParamInfo) else init_params
             if isinstance(dense_mass, bool):
@@ -708,10 +1079,10 @@ class HMC(MCMCKernel):
                 dense_mass = [tuple(sorted(z))] if dense_mass else []
             assert isinstance(dense_mass, list)
 
-        hmc_init_fn = lambda init_params, rng_key: self._init_fn(  # noqa: E731
+        hmc_init_fn = lambda init_params, rng_key, step_size, inverse_mass_matrix: self._init_fn(  # noqa: E731
             init_params,
             num_warmup=num_warmup,
-            step_size=self._step_size,
+            step_size=step_size,
             inverse_mass_matrix=inverse_mass_matrix,
             adapt_step_size=self._adapt_step_size,
             adapt_mass_matrix=self._adapt_mass_matrix,
@@ -719,24 +1090,151 @@ class HMC(MCMCKernel):
             target_accept_prob=self._target_accept_prob,
             trajectory_length=self._trajectory_length,
             max_tree_depth=self._max_tree_depth,
+            step_size_reduction=self._step_size_reduction,
             find_heuristic_step_size=self._find_heuristic_step_size,
             forward_mode_differentiation=self._forward_mode_differentiation,
             regularize_mass_matrix=self._regularize_mass_matrix,
+            adapt_axis_name=adapt_axis_name,
+            low_rank_mass=self._low_rank_mass,
             model_args=model_args,
             model_kwargs=model_kwargs,
             rng_key=rng_key,
         )
-        if rng_key.ndim == 1:
-            init_state = hmc_init_fn(init_params, rng_key)
+        if not vectorized:
+            init_state = hmc_init_fn(
+                init_params, rng_key, step_size, inverse_mass_matrix
+            )
         else:
             # XXX it is safe to run hmc_init_fn under vmap despite that hmc_init_fn changes some
             # nonlocal variables: momentum_generator, wa_update, trajectory_len, max_treedepth,
             # wa_steps because those variables do not depend on traced args: init_params, rng_key.
-            init_state = vmap(hmc_init_fn)(init_params, rng_key)
-            sample_fn = vmap(self._sample_fn, in_axes=(0, None, None))
+            # The step size and mass matrix found by the pilot phase differ across chains.
+            in_axes = (0, 0) + ((None, None) if pilot_state is None else (0, 0))
+            init_state = vmap(hmc_init_fn, in_axes=in_axes, axis_name=adapt_axis_name)(
+                init_params, rng_key, step_size, inverse_mass_matrix
+            )
+            sample_fn = vmap(
+                self._sample_fn, in_axes=(0, None, None), axis_name=adapt_axis_name
+            )
             self._sample_fn = sample_fn
+        if self._num_pilot_steps > 0:
+            # continue the adaptation after the slow windows run by the pilot phase
+            init_state = init_state._replace(
+                adapt_state=init_state.adapt_state._replace(
+                    window_idx=jnp.full_like(init_state.adapt_state.window_idx, 3)
+                )
+            )
         return init_state
 
+    def _run_pilot(self, rng_key, num_warmup, init_params, model_args, model_kwargs):
+        # Runs the pilot phase of `dense_mass="auto"`, i.e. the warmup steps of the
+        # first two slow adaptation windows with a diagonal mass matrix, and detects
+        # the blocks of correlated sites from its samples, unless they are known from
+        # a previous chain or from a checkpoint. Returns the last state of the pilot
+        # phase, or None if there is no pilot phase.
+        z = init_params[0] if isinstance(init_params, ParamInfo) else init_params
+        if not isinstance(z, dict):
+            raise ValueError(
+                "`dense_mass='auto'` requires the latent values to be a dict."
+            )
+        schedule = build_adaptation_schedule(num_warmup)
+        # the first slow windows are needed to estimate the correlations
+        self._num_pilot_steps = schedule[2].end + 1 if len(schedule) > 3 else 0
+        if self._num_pilot_steps == 0 and self._dense_mass_blocks is None:
+            self._dense_mass_blocks = []
+        if self._num_pilot_steps == 0 or self._skip_pilot:
+            # on resume, the pilot phase is not needed as the checkpointed state
+            # replaces the initial state
+            self._skip_pilot = False
+            return None
+
+        if any(
+            isinstance(x, core.Tracer) for x in tree_flatten((rng_key, init_params))[0]
+        ):
+            raise ValueError(
+                "`dense_mass='auto'` detects the blocks of correlated sites on the host"
+                " during `init`, which is not possible when the kernel is initialized"
+                " under a transformation, e.g. with `chain_method='parallel'`,"
+                " `profile=True` or `ReplicaExchange`. Please use"
+                " `chain_method='sequential'` or `chain_method='vectorized'`, or pass"
+                " the blocks as `dense_mass`."
+            )
+        vectorized = rng_key.ndim > 1
+        adapt_axis_name = (
+            _CHAIN_AXIS_NAME if vectorized and self._adapt_across_chains else None
+        )
+        pilot_init_fn, pilot_sample_fn = hmc(
+            potential_fn=self._potential_fn,
+            potential_fn_gen=self._potential_fn_gen,
+            kinetic_fn=self._kinetic_fn,
+            algo=self._algo,
+            integrator=self._integrator,
+        )
+        # the pilot phase follows the adaptation schedule of the whole warmup phase
+        init_fn = partial(
+            pilot_init_fn,
+            num_warmup=num_warmup,
+            step_size=self._step_size,
+            adapt_step_size=self._adapt_step_size,
+            adapt_mass_matrix=self._adapt_mass_matrix,
+            dense_mass=[],
+            target_accept_prob=self._target_accept_prob,
+            trajectory_length=self._trajectory_length,
+            max_tree_depth=self._max_tree_depth,
+            step_size_reduction=self._step_size_reduction,
+            find_heuristic_step_size=self._find_heuristic_step_size,
+            forward_mode_differentiation=self._forward_mode_differentiation,
+            regularize_mass_matrix=self._regularize_mass_matrix,
+            adapt_axis_name=adapt_axis_name,
+            model_args=model_args,
+            model_kwargs=model_kwargs,
+        )
+        if not vectorized:
+            state = init_fn(init_params, rng_key=rng_key)
+        else:
+            state = vmap(
+                lambda init_params, rng_key: init_fn(init_params, rng_key=rng_key),
+                axis_name=adapt_axis_name,
+            )(init_params, rng_key)
+            pilot_sample_fn = vmap(
+                pilot_sample_fn, in_axes=(0, None, None), axis_name=adapt_axis_name
+            )
+        # collect the samples after the initial fast adaptation window
+        zs, state = fori_collect(
+            schedule[1].start,
+            self._num_pilot_steps,
+            lambda state: pilot_sample_fn(state, model_args, model_kwargs),
+            state,
+            transform=attrgetter("z"),
+            progbar=False,
+            return_last_val=True,
+        )
+
+        # all chains share the blocks, so that their states have the same structure
+        if self._dense_mass_blocks is None:
+            samples = {}
+            for name, z in zs.items():
+                # remove the differences between the locations of chains
+                z = np.asarray(z)
+                z = z - z.mean(0)
+                samples[name] = z.reshape((-1,) + z.shape[2:]) if vectorized else z
+            self._dense_mass_blocks = find_dense_mass_blocks(samples)
+        return state
+
+    def _restore_structure(self, state):
+        # Called by `MCMC.resume` before `init`: the blocks of `dense_mass="auto"` are
+        # the dense blocks of the mass matrix of the checkpointed state.
+        if self._dense_mass != "auto":
+            return
+        inverse_mass_matrix = state.adapt_state.inverse_mass_matrix
+        batch_ndim = jnp.ndim(state.i)
+        self._dense_mass_blocks = [
+            site_names
+            for site_names, inverse_mm in inverse_mass_matrix.items()
+            if jnp.ndim(inverse_mm) - batch_ndim == 2
+        ]
+        self._skip_pilot = True
+
     def postprocess_fn(self, args, kwargs):
         if self._postprocess_fn is None:
             return identity
@@ -752,6 +1250,16 @@ class HMC(MCMCKernel):
         :param model_kwargs: Keyword arguments provided to the model.
         :return: Next `state` after running HMC.
         """
+        if self._num_pilot_steps > 0:
+            # the first warmup steps have been run by the pilot phase during `init`
+            i = state.i if jnp.ndim(state.i) == 0 else state.i[0]
+            return cond(
+                i < self._num_pilot_steps,
+                state,
+                lambda state: state._replace(i=state.i + 1),
+                state,
+                lambda state: self._sample_fn(state, model_args, model_kwargs),
+            )
         return self._sample_fn(state, model_args, model_kwargs)
 
     def __getstate__(self):
@@ -822,8 +1330,21 @@ class NUTS(HMC):
               use a dense mass matrix for the joint (x, y, z)
             + dense_mass=[("x",), ("y",), ("z")]: use dense mass matrices for
               each of x, y, and z (i.e. block-diagonal with 3 blocks)
-
-    :type dense_mass: bool or list
+            + dense_mass="auto": run the warmup steps of the first two slow
+              adaptation windows with a diagonal mass matrix during `init`, detect
+              the blocks of strongly correlated sites from their samples (see
+              :func:`~numpyro.infer.hmc_util.find_dense_mass_blocks`), then
+              continue the warmup phase with dense mass matrices for these blocks,
+              as with ``dense_mass=[blocks]``. The steps run during `init` count
+              towards `num_warmup`, so the corresponding warmup draws of
+              :class:`~numpyro.infer.mcmc.MCMC` repeat the last state of these
+              steps. The blocks are detected once and shared by all chains and
+              later runs of this kernel. This requires the latent values to be a
+              dict, e.g. when `model` is provided, and chains which are not
+              initialized under a transformation (i.e. not with
+              ``chain_method="parallel"``).
+
+    :type dense_mass: bool or list or str
     :param float target_accept_prob: Target acceptance probability for step size
         adaptation using Dual Averaging. Increasing this value will lead to a smaller
         step size, hence the sampling will be slower but more robust. Defaults to 0.8.
@@ -845,6 +1366,17 @@ class NUTS(HMC):
         only supports forward-mode differentiation. See
         `JAX's The Autodiff Cookbook <https://jax.readthedocs.io/en/latest/notebooks/autodiff_cookbook.html>`_
         for more information.
+    :param bool regularize_mass_matrix: whether or not to regularize the estimated mass
+        matrix for numerical stability during warmup phase. Defaults to True. This flag
+        does not take effect if ``adapt_mass_matrix == False``.
+    :param bool adapt_across_chains: whether to pool the warmup statistics of
+        vectorized chains. See :class:`HMC` for details. Defaults to False.
+    :param int low_rank_mass: If provided, use a diagonal mass matrix plus a
+        correction of rank `low_rank_mass`. See :class:`HMC` for details.
+        Defaults to None.
+    :param integrator: the symplectic integrator used to simulate the Hamiltonian
+        dynamics. See :class:`HMC` for details. Defaults to
+        :func:`~numpyro.infer.hmc_util.velocity_verlet`.
     """
 
     def __init__(
@@ -864,6 +1396,9 @@ class NUTS(HMC):
         find_heuristic_step_size=False,
         forward_mode_differentiation=False,
         regularize_mass_matrix=True,
+        adapt_across_chains=False,
+        low_rank_mass=None,
+        integrator=None,
     ):
         super(NUTS, self).__init__(
             potential_fn=potential_fn,
@@ -880,6 +1415,230 @@ class NUTS(HMC):
             find_heuristic_step_size=find_heuristic_step_size,
             forward_mode_differentiation=forward_mode_differentiation,
             regularize_mass_matrix=regularize_mass_matrix,
+            adapt_across_chains=adapt_across_chains,
+            low_rank_mass=low_rank_mass,
+            integrator=integrator,
         )
         self._max_tree_depth = max_tree_depth
         self._algo = "NUTS"
+
+
+class ChEESHMC(HMC):
+    """
+    ChEES-HMC: Hamiltonian Monte Carlo with jittered trajectories whose length is
+    adapted during warmup by maximizing the Change in the Estimator of the Expected
+    Square (ChEES) criterion across chains. Because all chains share the same step
+    size, mass matrix and (jittered) number of leapfrog steps, this kernel is suited
+    to running many vectorized chains on accelerators, where the trees of
+    :class:`NUTS` force the chains to wait for the deepest one.
+
+    .. note:: The trajectory length, step size and mass matrix are adapted jointly
+        from the statistics of all chains, so this kernel requires vectorized chains,
+        e.g. ``MCMC(ChEESHMC(model), ..., num_chains=64, chain_method="vectorized")``.
+
+    **References:**
+
+    1. *An Adaptive-MCMC Scheme for Setting Trajectory Lengths in Hamiltonian Monte
+       Carlo*, Matthew D. Hoffman, Alexey Radul, and Pavel Sountsov
+
+    :param model: Python callable containing Pyro :mod:`~numpyro.primitives`.
+        If model is provided, `potential_fn` will be inferred using the model.
+    :param potential_fn: Python callable that computes the potential energy
+        given input parameters. The input parameters to `potential_fn` can be
+        any python collection type, provided that `init_params` argument to
+        :meth:`init` has the same type.
+    :param kinetic_fn: Python callable that returns the kinetic energy given
+        inverse mass matrix and momentum. If not provided, the default is
+        euclidean kinetic energy.
+    :param float step_size: Determines the size of a single step taken by the
+        verlet integrator while computing the trajectory using Hamiltonian
+        dynamics. If not specified, it will be set to 1.
+    :param inverse_mass_matrix: Initial value for inverse mass matrix.
+        This may be adapted during warmup if adapt_mass_matrix = True.
+        If no value is specified, then it is initialized to the identity matrix.
+        See :class:`HMC` for details.
+    :type inverse_mass_matrix: numpy.ndarray or dict
+    :param bool adapt_step_size: A flag to decide if we want to adapt step_size
+        during warm-up phase using Dual Averaging scheme.
+    :param bool adapt_mass_matrix: A flag to decide if we want to adapt mass
+        matrix during warm-up phase using Welford scheme.
+    :param dense_mass: This flag controls whether mass matrix is dense (i.e. full-rank)
+        or diagonal (defaults to ``dense_mass=False``). See :class:`HMC` for details.
+    :type dense_mass: bool or list
+    :param float target_accept_prob: Target acceptance probability for step size
+        adaptation using Dual Averaging. Defaults to 0.8.
+    :param float trajectory_length: Initial trajectory length, which is adapted
+        during warmup. Defaults to the initial step size.
+    :param callable init_strategy: a per-site initialization function.
+        See :ref:`init_strategy` section for available functions.
+    :param bool find_heuristic_step_size: whether or not to use a heuristic function
+        to adjust the step size at the beginning of each adaptation window. Defaults
+        to False.
+    :param bool forward_mode_differentiation: whether to use forward-mode differentiation
+        or reverse-mode differentiation. Defaults to False.
+    :param bool regularize_mass_matrix: whether or not to regularize the estimated mass
+        matrix for numerical stability during warmup phase. Defaults to True.
+    :param integrator: the symplectic integrator used to simulate the Hamiltonian
+        dynamics. See :class:`HMC` for details. Defaults to
+        :func:`~numpyro.infer.hmc_util.velocity_verlet`.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        potential_fn=None,
+        kinetic_fn=None,
+        step_size=1.0,
+        inverse_mass_matrix=None,
+        adapt_step_size=True,
+        adapt_mass_matrix=True,
+        dense_mass=False,
+        target_accept_prob=0.8,
+        trajectory_length=None,
+        init_strategy=init_to_uniform,
+        find_heuristic_step_size=False,
+        forward_mode_differentiation=False,
+        regularize_mass_matrix=True,
+        integrator=None,
+    ):
+        super(ChEESHMC, self).__init__(
+            potential_fn=potential_fn,
+            model=model,
+            kinetic_fn=kinetic_fn,
+            step_size=step_size,
+            inverse_mass_matrix=inverse_mass_matrix,
+            adapt_step_size=adapt_step_size,
+            adapt_mass_matrix=adapt_mass_matrix,
+            dense_mass=dense_mass,
+            target_accept_prob=target_accept_prob,
+            trajectory_length=trajectory_length,
+            init_strategy=init_strategy,
+            find_heuristic_step_size=find_heuristic_step_size,
+            forward_mode_differentiation=forward_mode_differentiation,
+            regularize_mass_matrix=regularize_mass_matrix,
+            adapt_across_chains=True,
+            integrator=integrator,
+        )
+        self._algo = "ChEES"
+
+
+class DRHMC(HMC):
+    """
+    Delayed-rejection Hamiltonian Monte Carlo. When the proposal of a trajectory
+    with fixed length is rejected (e.g. because it diverges), a second trajectory
+    of the same length is simulated from the initial state using
+    `step_size_reduction` times smaller steps. The acceptance probability of the
+    second proposal accounts for the rejected first one, which preserves detailed
+    balance.
+
+    On multiscale posteriors such as funnels, this allows the step size to stay
+    large in the regions where the posterior is easy, while the smaller steps are
+    only taken where the first proposal is rejected. The step size is adapted using
+    the overall acceptance rate of the two stages, so it is usually larger than the
+    one of :class:`HMC` with the same `target_accept_prob`.
+
+    .. note:: The reported `accept_prob` is 1 if the first proposal is accepted and
+        the acceptance probability of the second proposal otherwise. The reported
+        `num_steps` includes the steps of both stages and those of the reversed
+        first-stage trajectory from the second proposal, which is needed to compute
+        its acceptance probability.
+
+    **References:**
+
+    1. *Delayed rejection Hamiltonian Monte Carlo for sampling multiscale
+       distributions*, Chirag Modi, Alex Barnett, Bob Carpenter
+    2. *On the use of delayed rejection in Metropolis-Hastings algorithms*,
+       Antonietta Mira
+
+    :param model: Python callable containing Pyro :mod:`~numpyro.primitives`.
+        If model is provided, `potential_fn` will be inferred using the model.
+    :param potential_fn: Python callable that computes the potential energy
+        given input parameters. The input parameters to `potential_fn` can be
+        any python collection type, provided that `init_params` argument to
+        :meth:`init` has the same type.
+    :param kinetic_fn: Python callable that returns the kinetic energy given
+        inverse mass matrix and momentum. If not provided, the default is
+        euclidean kinetic energy.
+    :param float step_size: Determines the size of a single step taken by the
+        verlet integrator in the first stage. If not specified, it will be set to 1.
+    :param inverse_mass_matrix: Initial value for inverse mass matrix.
+        This may be adapted during warmup if adapt_mass_matrix = True.
+        If no value is specified, then it is initialized to the identity matrix.
+        See :class:`HMC` for details.
+    :type inverse_mass_matrix: numpy.ndarray or dict
+    :param bool adapt_step_size: A flag to decide if we want to adapt step_size
+        during warm-up phase using Dual Averaging scheme.
+    :param bool adapt_mass_matrix: A flag to decide if we want to adapt mass
+        matrix during warm-up phase using Welford scheme.
+    :param dense_mass: This flag controls whether mass matrix is dense (i.e. full-rank)
+        or diagonal (defaults to ``dense_mass=False``). See :class:`HMC` for details.
+    :type dense_mass: bool or list or str
+    :param float target_accept_prob: Target overall acceptance probability for step
+        size adaptation using Dual Averaging. Defaults to 0.8.
+    :param float trajectory_length: Length of a MCMC trajectory for HMC. Default
+        value is :math:`2\\pi`.
+    :param callable init_strategy: a per-site initialization function.
+        See :ref:`init_strategy` section for available functions.
+    :param bool find_heuristic_step_size: whether or not to use a heuristic function
+        to adjust the step size at the beginning of each adaptation window. Defaults
+        to False.
+    :param bool forward_mode_differentiation: whether to use forward-mode differentiation
+        or reverse-mode differentiation. Defaults to False.
+    :param bool regularize_mass_matrix: whether or not to regularize the estimated mass
+        matrix for numerical stability during warmup phase. Defaults to True.
+    :param bool adapt_across_chains: whether to pool the warmup statistics of
+        vectorized chains. See :class:`HMC` for details. Defaults to False.
+    :param int low_rank_mass: If provided, use a diagonal mass matrix plus a
+        correction of rank `low_rank_mass`. See :class:`HMC` for details.
+        Defaults to None.
+    :param integrator: the symplectic integrator used to simulate the Hamiltonian
+        dynamics. See :class:`HMC` for details. Defaults to
+        :func:`~numpyro.infer.hmc_util.velocity_verlet`.
+    :param int step_size_reduction: The factor by which the step size is reduced,
+        and the number of steps increased, for the second proposal. Defaults to 2.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        potential_fn=None,
+        kinetic_fn=None,
+        step_size=1.0,
+        inverse_mass_matrix=None,
+        adapt_step_size=True,
+        adapt_mass_matrix=True,
+        dense_mass=False,
+        target_accept_prob=0.8,
+        trajectory_length=2 * math.pi,
+        init_strategy=init_to_uniform,
+        find_heuristic_step_size=False,
+        forward_mode_differentiation=False,
+        regularize_mass_matrix=True,
+        adapt_across_chains=False,
+        low_rank_mass=None,
+        integrator=None,
+        step_size_reduction=2,
+    ):
+        if not isinstance(step_size_reduction, int) or step_size_reduction < 2:
+            raise ValueError("`step_size_reduction` must be an integer larger than 1.")
+        super(DRHMC, self).__init__(
+            potential_fn=potential_fn,
+            model=model,
+            kinetic_fn=kinetic_fn,
+            step_size=step_size,
+            inverse_mass_matrix=inverse_mass_matrix,
+            adapt_step_size=adapt_step_size,
+            adapt_mass_matrix=adapt_mass_matrix,
+            dense_mass=dense_mass,
+            target_accept_prob=target_accept_prob,
+            trajectory_length=trajectory_length,
+            init_strategy=init_strategy,
+            find_heuristic_step_size=find_heuristic_step_size,
+            forward_mode_differentiation=forward_mode_differentiation,
+            regularize_mass_matrix=regularize_mass_matrix,
+            adapt_across_chains=adapt_across_chains,
+            low_rank_mass=low_rank_mass,
+            integrator=integrator,
+        )
+        self._step_size_reduction = step_size_reduction
+        self._algo = "DR"
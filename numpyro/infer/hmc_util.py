@@ -3,7 +3,9 @@
 
 from collections import OrderedDict, namedtuple
 
-from jax import grad, jacfwd, random, value_and_grad, vmap
+import numpy as np
+
+from jax import grad, jacfwd, lax, random, value_and_grad, vmap
 from jax.flatten_util import ravel_pytree
 import jax.numpy as jnp
 from jax.ops import index_update
@@ -34,6 +36,21 @@ IntegratorState = namedtuple(
 )
 IntegratorState.__new__.__defaults__ = (None,) * len(IntegratorState._fields)
 
+LowRankMatrix = namedtuple("LowRankMatrix", ["scale", "eigenvectors", "eigenvalues"])
+"""
+A :func:`~collections.namedtuple` representing the symmetric `(d x d)` matrix
+``S @ (I + U @ diag(eigenvalues - 1) @ U.T) @ S``, where ``S = diag(scale)`` and
+``U = eigenvectors`` is a `(d x k)` matrix with orthonormal columns, i.e. a diagonal
+matrix plus a rank `k` correction. It is used for low-rank-plus-diagonal mass
+matrices, whose products with vectors cost `O(d k)`:
+
+ - **scale** - The square root of the diagonal part, of shape `(d,)`.
+ - **eigenvectors** - The orthonormal directions of the low-rank correction, of
+   shape `(d, k)`.
+ - **eigenvalues** - The eigenvalues of the matrix scaled by ``S^{-1}`` along the
+   `eigenvectors`, of shape `(k,)`.
+"""
+
 TreeInfo = namedtuple(
     "TreeInfo",
     [
@@ -240,6 +257,189 @@ def welford_covariance(diagonal=True):
     return init_fn, update_fn, final_fn
 
 
+def _pool_welford_state(state, axis_name):
+    # combines the Welford states of the chains mapped along `axis_name`, each of
+    # which has seen the same number of samples, into the state of all samples
+    if isinstance(state, dict):
+        return {k: _pool_welford_state(v, axis_name) for k, v in state.items()}
+
+    mean, m2, n = state
+    pooled_mean = lax.pmean(mean, axis_name)
+    delta = mean - pooled_mean
+    if jnp.ndim(m2) == 1:
+        m2 = m2 + n * delta * delta
+    else:
+        m2 = m2 + n * jnp.outer(delta, delta)
+    return pooled_mean, lax.psum(m2, axis_name), lax.psum(n, axis_name)
+
+
+def _low_rank_matvec(matrix, x):
+    # computes `matrix @ x` for a LowRankMatrix `matrix`
+    scale, eigenvectors, eigenvalues = matrix
+    y = scale * x
+    y = y + jnp.dot(eigenvectors, (eigenvalues - 1) * jnp.dot(y, eigenvectors))
+    return scale * y
+
+
+def _low_rank_sqrt_matvec(matrix, x):
+    # computes `L @ x` for the square root `L` (i.e. `L @ L.T = matrix`) of
+    # a LowRankMatrix `matrix`
+    scale, eigenvectors, eigenvalues = matrix
+    y = jnp.dot(eigenvectors, (jnp.sqrt(eigenvalues) - 1) * jnp.dot(x, eigenvectors))
+    return scale * (x + y)
+
+
+def _low_rank_inverse(matrix):
+    scale, eigenvectors, eigenvalues = matrix
+    return LowRankMatrix(
+        jnp.reciprocal(scale), eigenvectors, jnp.reciprocal(eigenvalues)
+    )
+
+
+def _mass_matrix_shape(inverse_mass_matrix):
+    if isinstance(inverse_mass_matrix, LowRankMatrix):
+        return jnp.shape(inverse_mass_matrix.scale)
+    return jnp.shape(inverse_mass_matrix)
+
+
+def low_rank_covariance(rank, max_draws=None):
+    """
+    Estimates a diagonal plus low-rank covariance from samples and the gradients of
+    the potential energy at those samples. Useful for adapting the mass matrix of HMC
+    in high dimension, where a dense mass matrix is too expensive. It is required
+    that each sample is a 1-dimensional array.
+
+    The diagonal ``sqrt(Var[sample] / Var[grad])``, which is exact for Gaussian
+    targets with independent components, is estimated with Welford's method. The
+    low-rank correction consists of the `rank` leading eigenpairs of the covariance
+    of the most recent samples rescaled by the diagonal, which are computed with
+    a thin SVD. This costs `O(d * max_draws)` memory and `O(d * max_draws^2)` time
+    for samples of size `d`, rather than `O(d^2)` and `O(d^3)` for a dense covariance.
+
+    :param int rank: The rank of the low-rank correction.
+    :param int max_draws: The number of most recent samples used to estimate the
+        low-rank correction. Defaults to ``4 * rank``.
+    :return: a (`init_fn`, `update_fn`, `final_fn`) triple.
+    """
+    if max_draws is None:
+        max_draws = 4 * rank
+    if max_draws < rank:
+        raise ValueError("`max_draws` must not be smaller than `rank`.")
+
+    def init_fn(size):
+        """
+        :param int size: size of each sample. For a structured mass matrix,
+            this is a dict mapping from tuples of site names to the shape
+            of the mass matrix.
+        :return: initial state for the scheme.
+        """
+        if isinstance(size, dict):
+            state = {}
+            for site_names, size_block in size.items():
+                state[site_names] = init_fn(size_block)
+            return state
+
+        if not isinstance(size, int):
+            size = size[-1]
+        mean = jnp.zeros(size)
+        m2 = jnp.zeros(size)
+        draws = jnp.zeros((max_draws, size))
+        return mean, m2, mean, m2, 0, draws
+
+    def update_fn(sample, state, sample_grad):
+        """
+        :param sample: A new sample.
+        :param state: Current state of the scheme.
+        :param sample_grad: The gradient of the potential energy at `sample`.
+        :return: new state for the scheme.
+        """
+        if isinstance(state, dict):
+            assert isinstance(sample, dict)
+            new_state = {}
+            for site_names, state_block in state.items():
+                sample_block = tuple(sample[k] for k in site_names)
+                grad_block = tuple(sample_grad[k] for k in site_names)
+                new_state[site_names] = update_fn(sample_block, state_block, grad_block)
+            return new_state
+
+        sample, _ = ravel_pytree(sample)
+        sample_grad, _ = ravel_pytree(sample_grad)
+        mean, m2, grad_mean, grad_m2, n, draws = state
+        # keep the most recent samples in a ring buffer
+        draws = index_update(draws, n % max_draws, sample)
+        n = n + 1
+        delta_pre = sample - mean
+        mean = mean + delta_pre / n
+        m2 = m2 + delta_pre * (sample - mean)
+        delta_pre = sample_grad - grad_mean
+        grad_mean = grad_mean + delta_pre / n
+        grad_m2 = grad_m2 + delta_pre * (sample_grad - grad_mean)
+        return mean, m2, grad_mean, grad_m2, n, draws
+
+    def final_fn(state, regularize=False):
+        """
+        :param state: Current state of the scheme.
+        :param bool regularize: Whether to adjust the estimate for numerical stability.
+        :return: a triple of the estimated covariance, the precision, and the
+            covariance, each as a :data:`LowRankMatrix`.
+        """
+        if isinstance(state, dict):
+            cov, precision, cov_sqrt = {}, {}, {}
+            for site_names, state_block in state.items():
+                cov_block, precision_block, cov_sqrt_block = final_fn(
+                    state_block, regularize=regularize
+                )
+                cov[site_names] = cov_block
+                precision[site_names] = precision_block
+                cov_sqrt[site_names] = cov_sqrt_block
+            return cov, precision, cov_sqrt
+
+        mean, m2, grad_mean, grad_m2, n, draws = state
+        # XXX it is not necessary to check for the case n=1
+        var = m2 / (n - 1)
+        grad_var = grad_m2 / (n - 1)
+        cov_diag = jnp.where(grad_var > 0, jnp.sqrt(var / grad_var), var)
+        if regularize:
+            # Regularization from Stan
+            cov_diag = (n / (n + 5)) * cov_diag + 1e-3 * (5 / (n + 5))
+        scale = jnp.sqrt(cov_diag)
+
+        # the buffers of chains pooled by `_pool_low_rank_state` are concatenated,
+        # and the first min(n, max_draws) rows of each buffer are filled
+        num_rows = draws.shape[0]
+        num_filled = jnp.minimum(n * max_draws // num_rows, max_draws)
+        mask = (jnp.arange(num_rows) % max_draws < num_filled)[:, None]
+        m = jnp.sum(mask)
+        draws_mean = jnp.sum(jnp.where(mask, draws, 0.0), axis=0) / m
+        x = jnp.where(mask, (draws - draws_mean) / scale, 0.0)
+        _, s, vt = jnp.linalg.svd(x, full_matrices=False)
+        k = min(rank, scale.shape[-1])
+        eigenvalues = s[:k] ** 2 / (m - 1)
+        # the directions which are not spanned by the samples keep the diagonal
+        eigenvalues = jnp.where(jnp.arange(k) < m - 1, eigenvalues, 1.0)
+        if regularize:
+            # shrink the eigenvalues towards those of the diagonal part
+            eigenvalues = (m / (m + 5)) * eigenvalues + 5 / (m + 5)
+        cov = LowRankMatrix(scale, vt[:k].T, eigenvalues)
+        return cov, _low_rank_inverse(cov), cov
+
+    return init_fn, update_fn, final_fn
+
+
+def _pool_low_rank_state(state, axis_name):
+    # pools the Welford states of the chains mapped along `axis_name` as in
+    # `_pool_welford_state` and concatenates their buffers of recent samples
+    if isinstance(state, dict):
+        return {k: _pool_low_rank_state(v, axis_name) for k, v in state.items()}
+
+    mean, m2, grad_mean, grad_m2, n, draws = state
+    mean, m2, pooled_n = _pool_welford_state((mean, m2, n), axis_name)
+    grad_mean, grad_m2, _ = _pool_welford_state((grad_mean, grad_m2, n), axis_name)
+    draws = lax.all_gather(draws, axis_name)
+    draws = jnp.reshape(draws, (-1, jnp.shape(draws)[-1]))
+    return mean, m2, grad_mean, grad_m2, pooled_n, draws
+
+
 def _value_and_grad(f, x, forward_mode_differentiation=False):
     if forward_mode_differentiation:
         return f(x), jacfwd(f)(x)
@@ -306,6 +506,104 @@ def velocity_verlet(potential_fn, kinetic_fn, forward_mode_differentiation=False
     return init_fn, update_fn
 
 
+def _splitting_integrator(
+    potential_fn, kinetic_fn, kick_coefs, drift_coefs, forward_mode_differentiation
+):
+    # a symmetric splitting which alternates momentum updates ("kicks") and position
+    # updates ("drifts"), starting and ending with a kick; the gradient at the end of
+    # a step is reused at the beginning of the next one
+    def init_fn(z, r, potential_energy=None, z_grad=None):
+        if potential_energy is None or z_grad is None:
+            potential_energy, z_grad = _value_and_grad(
+                potential_fn, z, forward_mode_differentiation
+            )
+        return IntegratorState(z, r, potential_energy, z_grad)
+
+    def update_fn(step_size, inverse_mass_matrix, state):
+        z, r, potential_energy, z_grad = state
+        for i, b in enumerate(kick_coefs):
+            if i > 0:
+                potential_energy, z_grad = _value_and_grad(
+                    potential_fn, z, forward_mode_differentiation
+                )
+            r = tree_multimap(lambda r, z_grad: r - b * step_size * z_grad, r, z_grad)
+            if i < len(drift_coefs):
+                a = drift_coefs[i]
+                r_grad = _kinetic_grad(kinetic_fn, inverse_mass_matrix, r)
+                z = tree_multimap(
+                    lambda z, r_grad: z + a * step_size * r_grad, z, r_grad
+                )
+        return IntegratorState(z, r, potential_energy, z_grad)
+
+    return init_fn, update_fn
+
+
+def two_stage_bcss(potential_fn, kinetic_fn, forward_mode_differentiation=False):
+    r"""
+    Two-stage symplectic integrator for position `z` and momentum `r` whose
+    coefficient minimizes the expected energy error for Gaussian targets. Each step
+    takes two gradient evaluations. Compared with two steps of
+    :func:`velocity_verlet` with half the step size, it usually allows a larger
+    step size for the same acceptance probability in moderately high dimensions.
+
+    **References:**
+
+    1. *Numerical integrators for the Hybrid Monte Carlo method*,
+       Sergio Blanes, Fernando Casas, J. M. Sanz-Serna
+
+    :param potential_fn: Python callable that computes the potential energy
+        given input parameters. The input parameters to `potential_fn` can be
+        any python collection type.
+    :param kinetic_fn: Python callable that returns the kinetic energy given
+        inverse mass matrix and momentum.
+    :return: a pair of (`init_fn`, `update_fn`).
+    """
+    b = 0.211781
+    return _splitting_integrator(
+        potential_fn,
+        kinetic_fn,
+        (b, 1 - 2 * b, b),
+        (0.5, 0.5),
+        forward_mode_differentiation,
+    )
+
+
+def three_stage_bcss(potential_fn, kinetic_fn, forward_mode_differentiation=False):
+    r"""
+    Three-stage symplectic integrator for position `z` and momentum `r` whose
+    coefficients minimize the expected energy error for Gaussian targets. Each step
+    takes three gradient evaluations.
+
+    **References:**
+
+    1. *Numerical integrators for the Hybrid Monte Carlo method*,
+       Sergio Blanes, Fernando Casas, J. M. Sanz-Serna
+
+    :param potential_fn: Python callable that computes the potential energy
+        given input parameters. The input parameters to `potential_fn` can be
+        any python collection type.
+    :param kinetic_fn: Python callable that returns the kinetic energy given
+        inverse mass matrix and momentum.
+    :return: a pair of (`init_fn`, `update_fn`).
+    """
+    b, a = 0.11888010966548, 0.29619504261126
+    return _splitting_integrator(
+        potential_fn,
+        kinetic_fn,
+        (b, 0.5 - b, 0.5 - b, b),
+        (a, 1 - 2 * a, a),
+        forward_mode_differentiation,
+    )
+
+
+def _num_grads_per_step(integrator):
+    # number of potential gradient evaluations of each step of the integrator
+    # (`None` stands for the default `velocity_verlet`), or None if it is unknown
+    if integrator is None or integrator is velocity_verlet:
+        return 1
+    return {two_stage_bcss: 2, three_stage_bcss: 3}.get(integrator, None)
+
+
 def find_reasonable_step_size(
     potential_fn,
     kinetic_fn,
@@ -314,6 +612,7 @@ def find_reasonable_step_size(
     inverse_mass_matrix,
     z_info,
     rng_key,
+    integrator=velocity_verlet,
 ):
     """
     Finds a reasonable step size by tuning `init_step_size`. This function is used
@@ -331,6 +630,8 @@ def find_reasonable_step_size(
     :param inverse_mass_matrix: Inverse of mass matrix.
     :param IntegratorState z_info: The current integrator state.
     :param jax.random.PRNGKey rng_key: Random key to be used as the source of randomness.
+    :param integrator: The integrator, such as :func:`velocity_verlet`, used to
+        simulate the Hamiltonian dynamics.
     :return: a reasonable value for step size.
     :rtype: float
     """
@@ -339,7 +640,7 @@ def find_reasonable_step_size(
     # then we have to decrease step_size; otherwise, increase step_size.
     target_accept_prob = jnp.log(0.8)
 
-    _, vv_update = velocity_verlet(potential_fn, kinetic_fn)
+    _, vv_update = integrator(potential_fn, kinetic_fn)
     z, _, potential_energy, z_grad = z_info
     if potential_energy is None or z_grad is None:
         potential_energy, z_grad = value_and_grad(potential_fn)(z)
@@ -431,7 +732,7 @@ def build_adaptation_schedule(num_steps):
     return adaptation_schedule
 
 
-def _initialize_mass_matrix(z, inverse_mass_matrix, dense_mass):
+def _initialize_mass_matrix(z, inverse_mass_matrix, dense_mass, low_rank_mass=None):
     if isinstance(dense_mass, list):
         if inverse_mass_matrix is None:
             inverse_mass_matrix = {}
@@ -456,7 +757,7 @@ def _initialize_mass_matrix(z, inverse_mass_matrix, dense_mass):
                 continue
             z_block = tuple(z[k] for k in site_names)
             inverse_mm, mm_sqrt, mm_sqrt_inv = _initialize_mass_matrix(
-                z_block, inverse_mm, False
+                z_block, inverse_mm, False, low_rank_mass
             )
             inverse_mass_matrix[site_names] = inverse_mm
             mass_matrix_sqrt[site_names] = mm_sqrt
@@ -465,7 +766,7 @@ def _initialize_mass_matrix(z, inverse_mass_matrix, dense_mass):
         if len(remaining_sites) > 0:
             z_block = tuple(z[k] for k in remaining_sites)
             inverse_mm, mm_sqrt, mm_sqrt_inv = _initialize_mass_matrix(
-                z_block, None, False
+                z_block, None, False, low_rank_mass
             )
             inverse_mass_matrix[remaining_sites] = inverse_mm
             mass_matrix_sqrt[remaining_sites] = mm_sqrt
@@ -481,6 +782,29 @@ def _initialize_mass_matrix(z, inverse_mass_matrix, dense_mass):
         return inverse_mass_matrix, mass_matrix_sqrt, mass_matrix_sqrt_inv
 
     mass_matrix_size = jnp.size(ravel_pytree(z)[0])
+    if low_rank_mass is not None and not dense_mass:
+        if isinstance(inverse_mass_matrix, LowRankMatrix):
+            return (
+                inverse_mass_matrix,
+                _low_rank_inverse(inverse_mass_matrix),
+                inverse_mass_matrix,
+            )
+        if inverse_mass_matrix is None:
+            inverse_mass_matrix = jnp.ones(mass_matrix_size)
+        elif jnp.ndim(inverse_mass_matrix) == 2:
+            inverse_mass_matrix = jnp.diag(inverse_mass_matrix)
+        rank = min(low_rank_mass, mass_matrix_size)
+        inverse_mass_matrix = LowRankMatrix(
+            jnp.sqrt(inverse_mass_matrix),
+            jnp.zeros((mass_matrix_size, rank)),
+            jnp.ones(rank),
+        )
+        return (
+            inverse_mass_matrix,
+            _low_rank_inverse(inverse_mass_matrix),
+            inverse_mass_matrix,
+        )
+
     if inverse_mass_matrix is None:
         if dense_mass:
             inverse_mass_matrix = jnp.identity(mass_matrix_size)
@@ -518,6 +842,8 @@ def warmup_adapter(
     dense_mass=False,
     target_accept_prob=0.8,
     regularize_mass_matrix=True,
+    axis_name=None,
+    low_rank_mass=None,
 ):
     """
     A scheme to adapt tunable parameters, namely step size and mass matrix, during
@@ -535,15 +861,42 @@ def warmup_adapter(
     :param float target_accept_prob: Target acceptance probability for step size
         adaptation using Dual Averaging. Increasing this value will lead to a smaller
         step size, hence the sampling will be slower but more robust. Default to 0.8.
+    :param str axis_name: If provided, the name of the :func:`jax.vmap` or
+        :func:`jax.pmap` axis of a batch of chains which are adapted jointly: the
+        step size is adapted from the mean acceptance probability of the chains and
+        the mass matrix is estimated from the samples of all chains, so that all
+        chains share the same step size and mass matrix. Defaults to None, i.e. each
+        chain is adapted independently.
+    :param int low_rank_mass: If provided, the rank of the low-rank correction of
+        a low-rank-plus-diagonal mass matrix, which is estimated with
+        :func:`low_rank_covariance` from the samples and the gradients of the
+        potential energy. This requires a diagonal mass matrix, i.e.
+        ``dense_mass=False``. Defaults to None.
     :return: a pair of (`init_fn`, `update_fn`).
     """
     if find_reasonable_step_size is None:
         find_reasonable_step_size = identity
     ss_init, ss_update = dual_averaging()
-    mm_init, mm_update, mm_final = welford_covariance(diagonal=not dense_mass)
-    adaptation_schedule = jnp.array(build_adaptation_schedule(num_adapt_steps))
+    if low_rank_mass is None:
+        mm_init, mm_update, mm_final = welford_covariance(diagonal=not dense_mass)
+        pool_mm_state = _pool_welford_state
+    else:
+        if dense_mass:
+            raise ValueError(
+                "A low-rank-plus-diagonal mass matrix requires `dense_mass=False`."
+            )
+        mm_init, mm_update, mm_final = low_rank_covariance(low_rank_mass)
+        pool_mm_state = _pool_low_rank_state
+    # use a numpy array, so that no traced value is created (and captured by
+    # `update_fn`) when the adapter is built inside a transformation such as pmap
+    adaptation_schedule = np.array(build_adaptation_schedule(num_adapt_steps))
     num_windows = len(adaptation_schedule)
 
+    def _pool_step_size(step_size):
+        if axis_name is None:
+            return step_size
+        return jnp.exp(lax.pmean(jnp.log(step_size), axis_name))
+
     def init_fn(
         z_info, rng_key, step_size=1.0, inverse_mass_matrix=None, mass_matrix_size=None
     ):
@@ -562,18 +915,22 @@ def warmup_adapter(
             inverse_mass_matrix,
             mass_matrix_sqrt,
             mass_matrix_sqrt_inv,
-        ) = _initialize_mass_matrix(z_info[0], inverse_mass_matrix, dense_mass)
+        ) = _initialize_mass_matrix(
+            z_info[0], inverse_mass_matrix, dense_mass, low_rank_mass
+        )
 
         if adapt_step_size:
-            step_size = find_reasonable_step_size(
-                step_size, inverse_mass_matrix, z_info, rng_key_ss
+            step_size = _pool_step_size(
+                find_reasonable_step_size(
+                    step_size, inverse_mass_matrix, z_info, rng_key_ss
+                )
             )
         ss_state = ss_init(jnp.log(10 * step_size))
 
         if isinstance(inverse_mass_matrix, dict):
-            size = {k: v.shape for k, v in inverse_mass_matrix.items()}
+            size = {k: _mass_matrix_shape(v) for k, v in inverse_mass_matrix.items()}
         else:
-            size = inverse_mass_matrix.shape[-1]
+            size = _mass_matrix_shape(inverse_mass_matrix)[-1]
         mm_state = mm_init(size)
 
         window_idx = jnp.array(0, dtype=jnp.result_type(int))
@@ -601,18 +958,24 @@ def warmup_adapter(
         ) = state
 
         if adapt_mass_matrix:
+            if axis_name is not None:
+                mm_state = pool_mm_state(mm_state, axis_name)
             inverse_mass_matrix, mass_matrix_sqrt, mass_matrix_sqrt_inv = mm_final(
                 mm_state, regularize=regularize_mass_matrix
             )
             if isinstance(inverse_mass_matrix, dict):
-                size = {k: v.shape for k, v in inverse_mass_matrix.items()}
+                size = {
+                    k: _mass_matrix_shape(v) for k, v in inverse_mass_matrix.items()
+                }
             else:
-                size = inverse_mass_matrix.shape[-1]
+                size = _mass_matrix_shape(inverse_mass_matrix)[-1]
             mm_state = mm_init(size)
 
         if adapt_step_size:
-            step_size = find_reasonable_step_size(
-                step_size, inverse_mass_matrix, z_info, rng_key_ss
+            step_size = _pool_step_size(
+                find_reasonable_step_size(
+                    step_size, inverse_mass_matrix, z_info, rng_key_ss
+                )
             )
             # NB: when step_size is large, say 1e38, jnp.log(10 * step_size) will be inf
             # and jnp.log(10) + jnp.log(step_size) will be finite
@@ -654,6 +1017,8 @@ def warmup_adapter(
 
         # update step size state
         if adapt_step_size:
+            if axis_name is not None:
+                accept_prob = lax.pmean(accept_prob, axis_name)
             ss_state = ss_update(target_accept_prob - accept_prob, ss_state)
             # note: at the end of warmup phase, use average of log step_size
             log_step_size, log_step_size_avg, *_ = ss_state
@@ -669,16 +1034,19 @@ def warmup_adapter(
         # update mass matrix state
         is_middle_window = (0 < window_idx) & (window_idx < (num_windows - 1))
         if adapt_mass_matrix:
-            z = z_info[0]
+            mm_args = (z_info[0], mm_state)
+            if low_rank_mass is not None:
+                # the low-rank estimator also uses the gradient of potential energy
+                mm_args = mm_args + (z_info.z_grad,)
             mm_state = cond(
                 is_middle_window,
-                (z, mm_state),
+                mm_args,
                 lambda args: mm_update(*args),
                 mm_state,
                 identity,
             )
 
-        t_at_window_end = t == adaptation_schedule[window_idx, 1]
+        t_at_window_end = t == jnp.asarray(adaptation_schedule)[window_idx, 1]
         window_idx = jnp.where(t_at_window_end, window_idx + 1, window_idx)
         state = HMCAdaptState(
             step_size,
@@ -702,6 +1070,60 @@ def warmup_adapter(
     return init_fn, update_fn
 
 
+def find_dense_mass_blocks(samples, threshold=0.5):
+    """
+    Groups the latent sites whose samples are strongly correlated, e.g. to use
+    a block-diagonal dense mass matrix over these groups (see the `dense_mass`
+    argument of :class:`~numpyro.infer.hmc.HMC`), which captures most of the
+    benefit of a full dense mass matrix at a fraction of its cost. Two sites are
+    in the same group if they are linked by a chain of sites where the largest
+    absolute correlation between the elements of consecutive sites exceeds
+    `threshold`. A single site is returned as a block of its own if the elements
+    of that site are strongly correlated.
+
+    :param dict samples: a dictionary mapping site names to their samples, where
+        the leading dimension is the sample dimension.
+    :param float threshold: the absolute correlation above which two sites are
+        considered to be correlated. Defaults to 0.5.
+    :return: a list of tuples of site names, where sites which are not correlated
+        with any site are omitted.
+    :rtype: list
+    """
+    names = sorted(samples)
+    flat_samples = {}
+    for name in names:
+        x = np.reshape(np.asarray(samples[name]), (np.shape(samples[name])[0], -1))
+        std = x.std(0)
+        flat_samples[name] = (x - x.mean(0)) / np.where(std > 0, std, 1.0)
+    num_samples = flat_samples[names[0]].shape[0] if names else 0
+
+    parents = {name: name for name in names}
+
+    def find(name):
+        while parents[name] != name:
+            name = parents[name]
+        return name
+
+    correlated_sites = set()
+    for i, a in enumerate(names):
+        for b in names[i:]:
+            corr = np.matmul(flat_samples[a].T, flat_samples[b]) / num_samples
+            if a == b:
+                np.fill_diagonal(corr, 0.0)
+            if np.max(np.abs(corr), initial=0.0) > threshold:
+                parents[find(b)] = find(a)
+                correlated_sites.update((a, b))
+
+    blocks = OrderedDict()
+    for name in names:
+        blocks.setdefault(find(name), []).append(name)
+    return [
+        tuple(block)
+        for block in blocks.values()
+        if len(block) > 1 or block[0] in correlated_sites
+    ]
+
+
 def _momentum_angle(inverse_mass_matrix, r_left, r_right, r_sum):
     if isinstance(inverse_mass_matrix, dict):
         left_angle, right_angle = jnp.zeros(()), jnp.zeros(())
@@ -718,7 +1140,10 @@ def _momentum_angle(inverse_mass_matrix, r_left, r_right, r_sum):
     r_right, _ = ravel_pytree(r_right)
     r_sum, _ = ravel_pytree(r_sum)
 
-    if inverse_mass_matrix.ndim == 2:
+    if isinstance(inverse_mass_matrix, LowRankMatrix):
+        v_left = _low_rank_matvec(inverse_mass_matrix, r_left)
+        v_right = _low_rank_matvec(inverse_mass_matrix, r_right)
+    elif inverse_mass_matrix.ndim == 2:
         v_left = jnp.matmul(inverse_mass_matrix, r_left)
         v_right = jnp.matmul(inverse_mass_matrix, r_right)
     elif inverse_mass_matrix.ndim == 1:
@@ -1192,7 +1617,9 @@ def euclidean_kinetic_energy(inverse_mass_matrix, r):
 
     r, _ = ravel_pytree(r)
 
-    if inverse_mass_matrix.ndim == 2:
+    if isinstance(inverse_mass_matrix, LowRankMatrix):
+        v = _low_rank_matvec(inverse_mass_matrix, r)
+    elif inverse_mass_matrix.ndim == 2:
         v = jnp.matmul(inverse_mass_matrix, r)
     elif inverse_mass_matrix.ndim == 1:
         v = jnp.multiply(inverse_mass_matrix, r)
@@ -1212,7 +1639,9 @@ def _euclidean_kinetic_energy_grad(inverse_mass_matrix, r):
 
     r, unravel_fn = ravel_pytree(r)
 
-    if inverse_mass_matrix.ndim == 2:
+    if isinstance(inverse_mass_matrix, LowRankMatrix):
+        v = _low_rank_matvec(inverse_mass_matrix, r)
+    elif inverse_mass_matrix.ndim == 2:
         v = jnp.matmul(inverse_mass_matrix, r)
     elif inverse_mass_matrix.ndim == 1:
         v = jnp.multiply(inverse_mass_matrix, r)
@@ -97,3 +97,38 @@ def init_to_value(site=None, values={}):
             return values[site["name"]]
         else:  # defer to default strategy
             return init_to_uniform(site)
+
+
+def init_to_pathfinder(site=None, samples={}, draw_idx=None, rng_key=None):
+    """
+    Initialize to a draw in `samples`, typically the approximate posterior draws
+    returned by :func:`~numpyro.infer.pathfinder.pathfinder`. All sites take their
+    values from the same draw, so that the initial point is a joint draw. We defer
+    to :func:`init_to_uniform` strategy for sites which do not appear in `samples`.
+
+    .. note:: The draw is chosen once, when the strategy is created, so all the
+        chains of :class:`~numpyro.infer.mcmc.MCMC` start from the same point.
+
+    :param dict samples: dictionary of draws keyed by site name, where each value
+        has a leading dimension for the draws.
+    :param int draw_idx: the index of the draw. If not provided, the draw is chosen
+        uniformly at random using `rng_key`.
+    :param jax.random.PRNGKey rng_key: the random key used to choose the draw.
+        Defaults to ``jax.random.PRNGKey(0)``.
+    """
+    if site is None:
+        if draw_idx is None and samples:
+            rng_key = random.PRNGKey(0) if rng_key is None else rng_key
+            num_draws = jnp.shape(next(iter(samples.values())))[0]
+            draw_idx = random.randint(rng_key, (), 0, num_draws)
+        return partial(init_to_pathfinder, samples=samples, draw_idx=draw_idx)
+
+    if site["type"] == "sample" and not site["is_observed"]:
+        if site["name"] in samples:
+            sample_shape = site["kwargs"].get("sample_shape")
+            values = samples[site["name"]]
+            return jnp.broadcast_to(
+                values[draw_idx], sample_shape + jnp.shape(values)[1:]
+            )
+        else:  # defer to default strategy
+            return init_to_uniform(site)
@@ -2,19 +2,45 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
+import multiprocessing
 from operator import attrgetter
 import os
+import pickle
+import time
 import warnings
 
-from jax import jit, lax, local_device_count, pmap, random, vmap
+import numpy as np
+
+import jax
+from jax import device_get, eval_shape, jit, lax, local_device_count, pmap, random, vmap
 from jax.core import Tracer
 from jax.interpreters.xla import DeviceArray
 import jax.numpy as jnp
 from jax.tree_util import tree_flatten, tree_map, tree_multimap
 
-from numpyro.diagnostics import print_summary
-from numpyro.util import cached_by, fori_collect, identity
+import numpyro
+from numpyro.diagnostics import (
+    _print_summary_dict,
+    effective_sample_size,
+    print_summary,
+    split_gelman_rubin,
+)
+from numpyro.infer.hmc_util import _num_grads_per_step
+from numpyro.infer.online_stats import online_stats, online_summary
+from numpyro.infer.sink import HostSink
+from numpyro.infer.util import CompiledRun, MCMCProfile, _aot_compile
+from numpyro.util import (
+    cached_by,
+    cond,
+    enable_compilation_cache,
+    enable_x64,
+    fori_collect,
+    identity,
+    set_platform,
+    soft_vmap,
+)
 
 __all__ = [
     "MCMCKernel",
@@ -151,6 +177,72 @@ def _get_value_from_index(xs, i):
     return tree_map(lambda x: x[i], xs)
 
 
+def _copy_to_host_async(x):
+    # start the device-to-host transfer as soon as the value is computed
+    copy_fn = getattr(x, "copy_to_host_async", None)
+    if copy_fn is not None:
+        copy_fn()
+
+
+def _block_until_ready(x):
+    return tree_map(
+        lambda v: v.block_until_ready() if hasattr(v, "block_until_ready") else v, x
+    )
+
+
+def _to_site_dict(x):
+    if isinstance(x, dict):
+        return x
+    return {"Param:{}".format(i): v for i, v in enumerate(tree_flatten(x)[0])}
+
+
+def _to_shared_memory(x):
+    # moves the leaves of `x` to shared memory blocks, which are released by
+    # `_from_shared_memory` in the receiving process
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:  # Python < 3.8
+        return x, False
+    leaves, treedef = tree_flatten(device_get(x))
+    blocks = []
+    for leaf in leaves:
+        leaf = np.asarray(leaf)
+        shm = shared_memory.SharedMemory(create=True, size=max(leaf.nbytes, 1))
+        np.ndarray(leaf.shape, leaf.dtype, buffer=shm.buf)[...] = leaf
+        blocks.append((shm.name, leaf.shape, leaf.dtype.str))
+        shm.close()
+    return (blocks, treedef), True
+
+
+def _from_shared_memory(x, shared):
+    if not shared:
+        return x
+    from multiprocessing import shared_memory
+
+    blocks, treedef = x
+    leaves = []
+    for name, shape, dtype in blocks:
+        shm = shared_memory.SharedMemory(name=name)
+        leaves.append(np.ndarray(shape, dtype, buffer=shm.buf).copy())
+        shm.close()
+        shm.unlink()
+    return treedef.unflatten(leaves)
+
+
+def _run_chain_in_process(mcmc, map_args, args, kwargs, collect_fields, config):
+    # entry point of the worker processes of chain_method="processes"; `mcmc` is a
+    # single chain copy of the parent MCMC instance
+    enable_x64(config["x64"])
+    set_platform(config["platform"])
+    if config["compilation_cache_dir"] is not None:
+        enable_compilation_cache(config["compilation_cache_dir"])
+    rng_key, init_state, _ = map_args
+    if init_state is not None:
+        mcmc._init_sampler(init_state, rng_key, args, kwargs)
+    states, _, last_state = mcmc._run_chains(map_args, args, kwargs, collect_fields)
+    return _to_shared_memory(states), device_get(last_state)
+
+
 def _laxmap(f, xs):
     n = tree_flatten(xs)[0][0].shape[0]
 
@@ -162,6 +254,50 @@ def _laxmap(f, xs):
     return tree_multimap(lambda *args: jnp.stack(args), *ys)
 
 
+def _is_oom_error(e):
+    message = str(e)
+    return "RESOURCE_EXHAUSTED" in message or "out of memory" in message.lower()
+
+
+def _chunked_postprocess(vmap_fn, z, chunk_size):
+    # applies the batched function `vmap_fn` to chunks of `chunk_size` draws of `z`
+    # (grouped by chain) and moves each chunk to host memory, halving `chunk_size`
+    # whenever a chunk runs out of device memory
+    z = device_get(z)
+    batch_shape = np.shape(tree_flatten(z)[0][0])[:2]
+    num_draws = int(np.prod(batch_shape))
+    z = tree_map(lambda x: np.reshape(x, (num_draws,) + np.shape(x)[2:]), z)
+    chunks = []
+    start = 0
+    while start < num_draws:
+        chunk_size = min(chunk_size, num_draws)
+        # pad the last chunk so that `vmap_fn` is compiled once per chunk size
+        chunk = tree_map(
+            lambda x: np.concatenate(
+                [x[start : start + chunk_size]]
+                + [x[-1:]] * max(start + chunk_size - num_draws, 0)
+            ),
+            z,
+        )
+        try:
+            values = device_get(vmap_fn(chunk))
+        except RuntimeError as e:
+            if not _is_oom_error(e) or chunk_size == 1:
+                raise
+            chunk_size = chunk_size // 2
+            warnings.warn(
+                "Postprocessing ran out of memory, retrying with chunks of {}"
+                " draws.".format(chunk_size)
+            )
+            continue
+        chunks.append(tree_map(lambda x: x[: num_draws - start], values))
+        start += chunk_size
+    return tree_multimap(
+        lambda *xs: np.reshape(np.concatenate(xs), batch_shape + np.shape(xs[0])[1:]),
+        *chunks,
+    )
+
+
 def _sample_fn_jit_args(state, sampler):
     hmc_state, args, kwargs = state
     return sampler.sample(hmc_state, args, kwargs), args, kwargs
@@ -172,13 +308,25 @@ def _sample_fn_nojit_args(state, sampler, args, kwargs):
     return (sampler.sample(state[0], args, kwargs),)
 
 
-def _collect_fn(collect_fields):
-    @cached_by(_collect_fn, collect_fields)
+def _cast_floating(x, dtype):
+    return tree_map(
+        lambda v: lax.convert_element_type(v, dtype)
+        if jnp.issubdtype(jnp.result_type(v), jnp.floating)
+        else v,
+        x,
+    )
+
+
+def _collect_fn(collect_fields, storage_dtype=None):
+    @cached_by(_collect_fn, collect_fields, storage_dtype)
     def collect(x):
         if collect_fields:
-            return attrgetter(*collect_fields)(x[0])
+            fields = attrgetter(*collect_fields)(x[0])
         else:
-            return x[0]
+            fields = x[0]
+        if storage_dtype is not None:
+            fields = _cast_floating(fields, storage_dtype)
+        return fields
 
     return collect
 
@@ -189,7 +337,7 @@ def _hashable(x):
     if isinstance(x, Tracer):
         return x
     elif isinstance(x, DeviceArray):
-        return x.copy().tobytes()
+        return np.asarray(x).tobytes()
     elif isinstance(x, jnp.ndarray):
         return x.tobytes()
     return x
@@ -224,16 +372,49 @@ class MCMC(object):
         sample values returned from the sampler to constrained values that lie within the support
         of the sample sites. Additionally, this is used to return values at deterministic sites in
         the model.
-    :param str chain_method: One of 'parallel' (default), 'sequential', 'vectorized'. The method
+    :param str chain_method: One of 'parallel' (default), 'sequential', 'vectorized',
+        'parallel_vectorized', 'processes'. The method
         'parallel' is used to execute the drawing process in parallel on XLA devices (CPUs/GPUs/TPUs),
         If there are not enough devices for 'parallel', we fall back to 'sequential' method to draw
         chains sequentially. 'vectorized' method is an experimental feature which vectorizes the
         drawing method, hence allowing us to collect samples in parallel on a single device.
+        'parallel_vectorized' method combines both: chains are split evenly over as many devices
+        as possible (the largest divisor of `num_chains` which does not exceed
+        :func:`jax.local_device_count`), and the chains on each device are vectorized.
+        'processes' method runs each chain in a separate worker process (started with the
+        "spawn" method), which avoids sharing the threads of a single process between chains
+        on CPU hosts. Each worker compiles the sampler independently (or loads it from the
+        persistent compilation cache, if enabled) and sends its samples back through shared
+        memory. This requires the sampler, the model and its arguments to be picklable, e.g.
+        the model must be defined at the top level of a module.
     :param bool progress_bar: Whether to enable progress bar updates. Defaults to
         ``True``.
+    :param int progress_bar_interval: If provided, the sampling loop is run entirely
+        inside :func:`jax.lax.fori_loop` and the progress bars, including the
+        diagnostics string of the sampler, are updated through a host callback every
+        `progress_bar_interval` iterations. By default, the progress bar of a single
+        chain is updated from Python after each iteration, which is much slower for
+        small models.
     :param bool jit_model_args: If set to `True`, this will compile the potential energy
         computation as a function of model arguments. As such, calling `MCMC.run` again
         on a same sized but different dataset will not result in additional compilation cost.
+    :param storage_dtype: If provided, a floating point dtype (e.g. `jnp.float32`,
+        `jnp.bfloat16` or `jnp.float16`) in which the floating point values of the
+        collected fields are stored, e.g. to halve the memory used by the draws under
+        :func:`~numpyro.util.enable_x64`. The state of the sampler keeps its full
+        precision; the draws are cast when they are collected, and the constrained
+        values and deterministic sites are computed in the default floating point
+        precision before being cast to `storage_dtype`. Defaults to None, i.e. the
+        draws are stored in the dtype of the sampler state.
+    :param int postprocess_chunk_size: If provided, the postprocessing is deferred to
+        :meth:`get_samples` (see the `lazy_postprocess` argument of :meth:`run`), and
+        the constrained values and the deterministic sites requested by
+        :meth:`get_samples` are computed in chunks of `postprocess_chunk_size` draws.
+        Each chunk is moved to host memory before the next one is computed, so that
+        the device only holds the outputs of a single chunk. If a chunk runs out of
+        device memory, it is retried with half the chunk size. By default, deferred
+        postprocessing runs all draws in a single program on device, which falls back
+        to chunks on host if it runs out of memory.
     """
 
     def __init__(
@@ -247,7 +428,10 @@ class MCMC(object):
         postprocess_fn=None,
         chain_method="parallel",
         progress_bar=True,
+        progress_bar_interval=None,
         jit_model_args=False,
+        storage_dtype=None,
+        postprocess_chunk_size=None,
     ):
         self.sampler = sampler
         self._sample_field = sampler.sample_field
@@ -259,10 +443,17 @@ class MCMC(object):
             raise ValueError("thinning must be a positive integer")
         self.thinning = thinning
         self.postprocess_fn = postprocess_fn
-        if chain_method not in ["parallel", "vectorized", "sequential"]:
+        if chain_method not in [
+            "parallel",
+            "vectorized",
+            "sequential",
+            "parallel_vectorized",
+            "processes",
+        ]:
             raise ValueError(
                 "Only supporting the following methods to draw chains:"
-                ' "sequential", "parallel", or "vectorized"'
+                ' "sequential", "parallel", "vectorized", "parallel_vectorized"'
+                ' or "processes"'
             )
         if chain_method == "parallel" and local_device_count() < self.num_chains:
             chain_method = "sequential"
@@ -277,17 +468,45 @@ class MCMC(object):
             )
         self.chain_method = chain_method
         self.progress_bar = progress_bar
+        self.progress_bar_interval = progress_bar_interval
         if "CI" in os.environ or "PYTEST_XDIST_WORKER" in os.environ:
             self.progress_bar = False
         self._jit_model_args = jit_model_args
+        if storage_dtype is not None:
+            storage_dtype = jnp.dtype(storage_dtype)
+            if not jnp.issubdtype(storage_dtype, jnp.floating):
+                raise ValueError("storage_dtype must be a floating point dtype")
+        self.storage_dtype = storage_dtype
+        if postprocess_chunk_size is not None and postprocess_chunk_size < 1:
+            raise ValueError("postprocess_chunk_size must be a positive integer")
+        self.postprocess_chunk_size = postprocess_chunk_size
         self._states = None
         self._states_flat = None
+        # streaming statistics accumulated by the last run with `online_stats=True`
+        self._online_stats = None
+        self._online_stats_options = {}
+        self._collect_online_stats = False
+        # sites which are evaluated inside the sampling loop (see `run`)
+        self._collect_sites = None
+        # whether `_single_chain_mcmc` leaves the postprocessing to `get_samples`
+        self._defer_postprocess = False
+        # (args, kwargs) to postprocess the values of the sample field collected by
+        # the last run, or None if they are postprocessed already
+        self._pending_postprocess = None
+        # postprocessed sites, grouped by chain, computed by `get_samples`
+        self._postprocessed_sites = {}
+        # timings of the last run with `profile=True`
+        self._profile = None
+        # convergence criterion which is checked after each block by `run_until`
+        self._stop_fn = None
         # HMCState returned by last run
         self._last_state = None
         # HMCState returned by last warmup
         self._warmup_state = None
         # HMCState returned by hmc.init_kernel
         self._init_state_cache = {}
+        # progress of the last run in blocks, used for checkpointing
+        self._progress = None
         self._cache = {}
         self._collection_params = {}
         self._set_collection_params()
@@ -310,14 +529,17 @@ class MCMC(object):
         if fns is None:
 
             def laxmap_postprocess_fn(states, args, kwargs):
-                if self.postprocess_fn is None:
-                    body_fn = self.sampler.postprocess_fn(args, kwargs)
-                else:
-                    body_fn = self.postprocess_fn
-                if self.chain_method == "vectorized" and self.num_chains > 1:
-                    body_fn = vmap(body_fn)
-
-                return lax.map(body_fn, states)
+                body_fn = self._get_postprocess_body_fn(args, kwargs)
+                if self.storage_dtype is None:
+                    return lax.map(body_fn, states)
+                # compute in the default precision, store in `storage_dtype`
+                compute_dtype = jnp.result_type(float)
+                return lax.map(
+                    lambda z: _cast_floating(
+                        body_fn(_cast_floating(z, compute_dtype)), self.storage_dtype
+                    ),
+                    states,
+                )
 
             if self._jit_model_args:
                 sample_fn = partial(_sample_fn_jit_args, sampler=self.sampler)
@@ -338,6 +560,33 @@ class MCMC(object):
                 self._cache[key] = fns
         return fns
 
+    def _get_postprocess_body_fn(self, args, kwargs):
+        if self.postprocess_fn is None:
+            body_fn = self.sampler.postprocess_fn(args, kwargs)
+        else:
+            body_fn = self.postprocess_fn
+        if self._chains_are_vectorized():
+            body_fn = vmap(body_fn)
+        return body_fn
+
+    def _chains_are_vectorized(self):
+        # whether each call of `_single_chain_mcmc` draws a batch of chains
+        return self.num_chains > 1 and self.chain_method in [
+            "vectorized",
+            "parallel_vectorized",
+        ]
+
+    def _get_num_devices(self):
+        # number of devices used by the "parallel" and "parallel_vectorized" methods
+        if self.chain_method == "parallel":
+            return self.num_chains
+        if self.chain_method != "parallel_vectorized":
+            return 1
+        num_devices = min(local_device_count(), self.num_chains)
+        while self.num_chains % num_devices != 0:
+            num_devices -= 1
+        return num_devices
+
     def _get_cached_init_state(self, rng_key, args, kwargs):
         rng_key = (_hashable(rng_key),)
         args = tree_map(lambda x: _hashable(x), args)
@@ -360,12 +609,21 @@ class MCMC(object):
                 model_kwargs=kwargs,
             )
         sample_fn, postprocess_fn = self._get_cached_fns()
-        diagnostics = (
-            lambda x: self.sampler.get_diagnostics_str(x[0])
-            if rng_key.ndim == 1
-            else ""
-        )  # noqa: E731
+
+        def diagnostics(x):
+            if rng_key.ndim == 1:
+                return self.sampler.get_diagnostics_str(x[0])
+            # the diagnostics of each vectorized chain
+            return " | ".join(
+                self.sampler.get_diagnostics_str(tree_map(lambda v: v[i], x[0]))
+                for i in range(rng_key.shape[0])
+            )
+
         init_val = (init_state, args, kwargs) if self._jit_model_args else (init_state,)
+        if self._collect_online_stats:
+            return self._single_chain_online_stats(
+                init_val, args, kwargs, sample_fn, diagnostics
+            )
         lower_idx = self._collection_params["lower"]
         upper_idx = self._collection_params["upper"]
         phase = self._collection_params["phase"]
@@ -380,14 +638,15 @@ class MCMC(object):
             upper_idx,
             sample_fn,
             init_val,
-            transform=_collect_fn(collect_fields),
+            transform=self._get_collect_transform(collect_fields, args, kwargs),
             progbar=self.progress_bar,
             return_last_val=True,
             thinning=self.thinning,
             collection_size=collection_size,
             progbar_desc=partial(_get_progbar_desc_str, lower_idx, phase),
             diagnostics_fn=diagnostics,
-            num_chains=self.num_chains if self.chain_method == "parallel" else 1,
+            progbar_interval=self.progress_bar_interval,
+            num_chains=self._get_num_devices(),
         )
         states, last_val = collect_vals
         # Get first argument of type `HMCState`
@@ -400,7 +659,12 @@ class MCMC(object):
         # XXX: lax.map still works if some arrays have 0 size
         # so we only need to filter out the case site_value.shape[0] == 0
         # (which happens when lower_idx==upper_idx)
-        if len(site_values) > 0 and jnp.shape(site_values[0])[0] > 0:
+        if (
+            self._collect_sites is None
+            and not self._defer_postprocess
+            and len(site_values) > 0
+            and jnp.shape(site_values[0])[0] > 0
+        ):
             if self._jit_model_args:
                 states[self._sample_field] = postprocess_fn(
                     states[self._sample_field], args, kwargs
@@ -409,6 +673,100 @@ class MCMC(object):
                 states[self._sample_field] = postprocess_fn(states[self._sample_field])
         return states, last_state
 
+    def _get_collect_transform(self, collect_fields, args, kwargs):
+        if self._collect_sites is None:
+            return _collect_fn(collect_fields, self.storage_dtype)
+
+        # evaluates the requested sites of each draw inside the sampling loop, so that
+        # the computations of the other sites are dropped by the compiler
+        collect = _collect_fn(collect_fields)
+        sample_idx = collect_fields.index(self._sample_field)
+        collect_sites = self._collect_sites
+
+        def transform(x):
+            fields = collect(x)
+            fields = list(fields) if len(collect_fields) > 1 else [fields]
+            postprocess_args = x[1:] if self._jit_model_args else (args, kwargs)
+            sites = self._get_postprocess_body_fn(*postprocess_args)(fields[sample_idx])
+            fields[sample_idx] = {name: sites[name] for name in collect_sites}
+            if self.storage_dtype is not None:
+                fields = _cast_floating(fields, self.storage_dtype)
+            return tuple(fields) if len(collect_fields) > 1 else fields[0]
+
+        return transform
+
+    def _single_chain_online_stats(
+        self, init_val, args, kwargs, sample_fn, diagnostics
+    ):
+        lower_idx = self._collection_params["lower"]
+        upper_idx = self._collection_params["upper"]
+        phase = self._collection_params["phase"]
+        # same draws as the ones collected by `fori_collect`
+        start_idx = lower_idx + (upper_idx - lower_idx) % self.thinning
+        stats_init, stats_update = online_stats(
+            (upper_idx - lower_idx) // self.thinning, **self._online_stats_options
+        )
+        vectorized = self._chains_are_vectorized()
+        if vectorized:
+            stats_update = vmap(stats_update)
+
+        def postprocess_fn(sampler_val):
+            postprocess_args = (
+                sampler_val[1:] if self._jit_model_args else (args, kwargs)
+            )
+            body_fn = self._get_postprocess_body_fn(*postprocess_args)
+            z = attrgetter(self._sample_field)(sampler_val[0])
+            return _to_site_dict(body_fn(z))
+
+        def update_fn(val):
+            sampler_val, stats = val
+            stats = stats.copy()
+            stats[self._sample_field] = stats_update(
+                postprocess_fn(sampler_val), stats[self._sample_field]
+            )
+            if "diverging" in stats:
+                stats["diverging"] = stats["diverging"] + sampler_val[0].diverging
+            return stats
+
+        def sample_and_update_fn(val):
+            stats, i = val[-1]
+            sampler_val = sample_fn(val[:-1])
+            collect = (i >= start_idx) & ((i - start_idx + 1) % self.thinning == 0)
+            stats = cond(collect, (sampler_val, stats), update_fn, stats, identity)
+            return sampler_val + ((stats, i + 1),)
+
+        prototype = eval_shape(postprocess_fn, init_val)
+        batch_shape = (
+            (self.num_chains // self._get_num_devices(),) if vectorized else ()
+        )
+        stats = {
+            self._sample_field: tree_map(
+                lambda x: jnp.broadcast_to(x, batch_shape + jnp.shape(x)),
+                stats_init(
+                    tree_map(
+                        lambda x: jnp.zeros(x.shape[len(batch_shape) :]), prototype
+                    )
+                ),
+            )
+        }
+        if "diverging" in self._default_fields:
+            stats["diverging"] = jnp.zeros(batch_shape, dtype=jnp.int32)
+        _, last_val = fori_collect(
+            lower_idx,
+            upper_idx,
+            sample_and_update_fn,
+            init_val + ((stats, 0),),
+            transform=lambda x: (),
+            progbar=self.progress_bar,
+            return_last_val=True,
+            thinning=self.thinning,
+            progbar_desc=partial(_get_progbar_desc_str, lower_idx, phase),
+            diagnostics_fn=diagnostics,
+            progbar_interval=self.progress_bar_interval,
+            num_chains=self._get_num_devices(),
+        )
+        return last_val[-1][0], last_val[0]
+
     def _set_collection_params(
         self, lower=None, upper=None, collection_size=None, phase=None
     ):
@@ -505,7 +863,22 @@ class MCMC(object):
         )
         self._warmup_state = self._last_state
 
-    def run(self, rng_key, *args, extra_fields=(), init_params=None, **kwargs):
+    def run(
+        self,
+        rng_key,
+        *args,
+        extra_fields=(),
+        init_params=None,
+        sink=None,
+        segment_size=None,
+        checkpoint_path=None,
+        checkpoint_every=None,
+        online_stats=False,
+        collect_sites=None,
+        lazy_postprocess=False,
+        profile=False,
+        **kwargs,
+    ):
         """
         Run the MCMC samplers and collect samples.
 
@@ -520,6 +893,55 @@ class MCMC(object):
         :type extra_fields: tuple or list of str
         :param init_params: Initial parameters to begin sampling. The type must be consistent
             with the input type to `potential_fn`.
+        :param ~numpyro.infer.sink.SampleSink sink: If provided, the sampling phase is run
+            in blocks of `sink.block_size` draws per chain and each block is written to the
+            sink, so that device memory is bounded by the block size rather than by
+            `num_samples`. After the run, :meth:`get_samples` returns the arrays given by
+            the sink, e.g. memory-mapped arrays for :class:`~numpyro.infer.sink.NpySink`.
+        :param int segment_size: If provided, the sampling phase is run in segments of
+            `segment_size` iterations and each segment is moved to host memory while the
+            next one is sampled. The collected samples are returned as numpy arrays. This
+            is a shorthand for ``sink=HostSink(block_size=segment_size // thinning)``.
+        :param str checkpoint_path: If provided, the run (including warmup) is split into
+            blocks of `checkpoint_every` iterations and a checkpoint is saved to this file
+            after each block (see :meth:`save_checkpoint`). An interrupted run can be
+            continued with :meth:`resume`. If `sink` is not provided, the samples are
+            collected into a :class:`~numpyro.infer.sink.HostSink`.
+        :param int checkpoint_every: Number of iterations between two checkpoints.
+            During the sampling phase, this is rounded down to a multiple of `thinning`.
+            This is required if `checkpoint_path` is provided.
+        :param online_stats: If True, the draws are not stored. Instead, streaming
+            statistics of each site (see :func:`~numpyro.infer.online_stats.online_stats`)
+            are updated inside the sampling loop, so that memory does not grow with
+            `num_samples`. The statistics can be displayed with :meth:`print_summary`
+            and retrieved with :meth:`get_online_stats`. This can also be a dict with
+            the `relative_accuracy`, `min_value` and `max_value` options of the
+            quantile sketch, which stores about
+            `2 * log(max_value / min_value) / log((1 + relative_accuracy) /
+            (1 - relative_accuracy))` int32 counts per scalar element of each site and
+            chain, i.e. about 11 KB per element with the default options. A coarser
+            sketch, e.g. ``{"relative_accuracy": 0.05, "min_value": 1e-3,
+            "max_value": 1e3}``, reduces this to about 1.1 KB. Defaults to False.
+        :type online_stats: bool or dict
+        :param list collect_sites: If provided, only the values of these sample and
+            deterministic sites are collected. They are constrained and evaluated
+            inside the sampling loop, so that neither the unconstrained values of the
+            other latent sites nor the other deterministic sites are stored or
+            computed. By default, all sites are postprocessed at the end of the
+            sampling loop.
+        :param bool lazy_postprocess: If True (and `collect_sites` is not provided),
+            the unconstrained values of the latent sites are collected and
+            :meth:`get_samples` postprocesses them on demand, only for the requested
+            sites. This is also the case when `postprocess_chunk_size` is provided.
+            The 'processes' chain method always postprocesses at the end of the
+            sampling loop. Defaults to False.
+        :param bool profile: If True, the warmup and sampling phases are compiled ahead
+            of time and run as separate programs, and the wall times of compilation,
+            warmup, sampling and postprocessing are recorded together with the number
+            of potential gradient evaluations and the effective sample size of each
+            site. The report can be retrieved with :meth:`get_profile`. This cannot be
+            used together with `sink`, `segment_size`, `checkpoint_path`,
+            `online_stats` or the 'processes' chain method. Defaults to False.
         :param kwargs: Keyword arguments to be provided to the :meth:`numpyro.infer.mcmc.MCMCKernel.init`
             method. These are typically the keyword arguments needed by the `model`.
 
@@ -528,11 +950,256 @@ class MCMC(object):
             See https://jax.readthedocs.io/en/latest/async_dispatch.html and
             https://jax.readthedocs.io/en/latest/profiling.html for pointers on profiling jax programs.
         """
+        if (checkpoint_path is None) != (checkpoint_every is None):
+            raise ValueError(
+                "`checkpoint_path` and `checkpoint_every` must be provided together."
+            )
+        if checkpoint_every is not None and (
+            not isinstance(checkpoint_every, int) or checkpoint_every < 1
+        ):
+            raise ValueError("checkpoint_every must be a positive integer")
+        if segment_size is not None:
+            if not isinstance(segment_size, int) or segment_size < 1:
+                raise ValueError("segment_size must be a positive integer")
+            if sink is not None:
+                raise ValueError(
+                    "`sink` and `segment_size` cannot be provided together."
+                    " Please use the `block_size` of the sink instead."
+                )
+            sink = HostSink(block_size=max(segment_size // self.thinning, 1))
+        if online_stats and (sink is not None or checkpoint_path is not None):
+            raise ValueError(
+                "`online_stats` cannot be used together with `sink`, `segment_size`"
+                " or `checkpoint_path`."
+            )
+        if online_stats and collect_sites is not None:
+            raise ValueError(
+                "`online_stats` cannot be used together with `collect_sites`."
+            )
+        if isinstance(online_stats, dict):
+            invalid_options = set(online_stats) - {
+                "relative_accuracy",
+                "min_value",
+                "max_value",
+            }
+            if invalid_options:
+                raise ValueError(
+                    "Invalid `online_stats` options: {}.".format(
+                        ", ".join(sorted(invalid_options))
+                    )
+                )
+        if profile and (
+            sink is not None or checkpoint_path is not None or online_stats
+        ):
+            raise ValueError(
+                "`profile` cannot be used together with `sink`, `segment_size`,"
+                " `checkpoint_path` or `online_stats`."
+            )
+        if profile and self.num_chains > 1 and self.chain_method == "processes":
+            raise ValueError("`profile` does not support the 'processes' chain method.")
+        self._collect_sites = None if collect_sites is None else tuple(collect_sites)
+        self._args = args
+        self._kwargs = kwargs
+        rng_key, init_state, init_params = self._get_init(
+            rng_key, init_params, args, kwargs
+        )
+        collect_fields = self._get_collect_fields(extra_fields)
+        self._online_stats = None
+        self._profile = None
+        pending_postprocess = None
+        if profile:
+            self._progress = None
+            states, states_flat, last_state, timings, num_grads = self._run_profiled(
+                (rng_key, init_state, init_params), args, kwargs, collect_fields
+            )
+            site_values = tree_flatten(states[self._sample_field])[0]
+            if (
+                self._collect_sites is None
+                and len(site_values) > 0
+                and jnp.shape(site_values[0])[1] > 0
+            ):
+                pending_postprocess = (args, kwargs)
+        elif online_stats:
+            self._progress = None
+            self._online_stats_options = (
+                dict(online_stats) if isinstance(online_stats, dict) else {}
+            )
+            self._collect_online_stats = True
+            try:
+                self._online_stats, _, last_state = self._run_chains(
+                    (rng_key, init_state, init_params), args, kwargs, collect_fields
+                )
+            finally:
+                self._collect_online_stats = False
+            states, states_flat = None, None
+        elif sink is None and checkpoint_path is None:
+            self._progress = None
+            # the sampler of this process is not initialized by the "processes" method
+            self._defer_postprocess = (
+                self._collect_sites is None
+                and (lazy_postprocess or self.postprocess_chunk_size is not None)
+                and (self.num_chains == 1 or self.chain_method != "processes")
+            )
+            try:
+                states, states_flat, last_state = self._run_chains(
+                    (rng_key, init_state, init_params), args, kwargs, collect_fields
+                )
+            finally:
+                deferred, self._defer_postprocess = self._defer_postprocess, False
+            site_values = tree_flatten(states[self._sample_field])[0]
+            if deferred and len(site_values) > 0 and jnp.shape(site_values[0])[1] > 0:
+                pending_postprocess = (args, kwargs)
+        else:
+            if sink is None:
+                sink = HostSink()
+            if checkpoint_every is None:
+                schedule = self._get_block_schedule(sink.block_size)
+            else:
+                schedule = self._get_block_schedule(
+                    max(checkpoint_every // self.thinning, 1), checkpoint_every
+                )
+            sink.initialize(self.num_chains, self.num_samples // self.thinning)
+            self._progress = {
+                "schedule": schedule,
+                "block_idx": 0,
+                "num_draws": 0,
+                "sink": sink,
+                "state": init_state,
+                "rng_key": rng_key,
+                "init_params": init_params,
+                "args": args,
+                "kwargs": kwargs,
+                "collect_fields": collect_fields,
+                "collect_sites": self._collect_sites,
+                "checkpoint_path": checkpoint_path,
+            }
+            states, states_flat, last_state = self._run_blocks(self._progress)
+        self._last_state = last_state
+        self._states = states
+        self._states_flat = states_flat
+        self._pending_postprocess = pending_postprocess
+        self._postprocessed_sites = {}
+        self._set_collection_params()
+        if profile:
+            start = time.perf_counter()
+            samples = _block_until_ready(self._get_states()[self._sample_field])
+            timings["postprocess"] = time.perf_counter() - start
+            samples = _to_site_dict(device_get(samples))
+            ess = {}
+            if self.num_samples // self.thinning >= 2:
+                ess = {
+                    k: effective_sample_size(np.asarray(v, dtype=np.float64))
+                    for k, v in samples.items()
+                }
+            self._profile = MCMCProfile(
+                timings["compile"],
+                timings["warmup"],
+                timings["sample"],
+                timings["postprocess"],
+                num_grads,
+                ess,
+            )
+
+    def _run_chains(self, map_args, args, kwargs, collect_fields):
+        partial_map_fn = partial(
+            self._single_chain_mcmc,
+            args=args,
+            kwargs=kwargs,
+            collect_fields=collect_fields,
+        )
+        if self.num_chains == 1:
+            states_flat, last_state = partial_map_fn(map_args)
+            states = tree_map(lambda x: x[jnp.newaxis, ...], states_flat)
+        else:
+            if self.chain_method == "sequential":
+                states, last_state = _laxmap(partial_map_fn, map_args)
+            elif self.chain_method == "processes":
+                states, last_state = self._run_chains_in_processes(
+                    map_args, args, kwargs, collect_fields
+                )
+            elif self.chain_method == "parallel":
+                states, last_state = pmap(partial_map_fn)(map_args)
+            elif self.chain_method == "parallel_vectorized":
+                # split num_chains into num_devices x chains_per_device
+                num_devices = self._get_num_devices()
+                map_args = tree_map(
+                    lambda x: jnp.reshape(x, (num_devices, -1) + jnp.shape(x)[1:]),
+                    map_args,
+                )
+                states, last_state = pmap(partial_map_fn)(map_args)
+                # reassemble num_devices x num_samples x chains_per_device in chain order
+                if not self._collect_online_stats:
+                    states = tree_map(lambda x: jnp.swapaxes(x, 1, 2), states)
+                states, last_state = tree_map(
+                    lambda x: jnp.reshape(x, (-1,) + jnp.shape(x)[2:]),
+                    (states, last_state),
+                )
+            else:
+                assert self.chain_method == "vectorized"
+                states, last_state = partial_map_fn(map_args)
+                # swap num_samples x num_chains to num_chains x num_samples
+                if not self._collect_online_stats:
+                    states = tree_map(lambda x: jnp.swapaxes(x, 0, 1), states)
+            states_flat = tree_map(
+                lambda x: jnp.reshape(x, (-1,) + x.shape[2:]), states
+            )
+        return states, states_flat, last_state
+
+    def _run_chains_in_processes(self, map_args, args, kwargs, collect_fields):
+        # a copy of this instance which runs a single chain, without previous results
+        worker_state = self.__getstate__()
+        worker_state.update(
+            num_chains=1,
+            chain_method="sequential",
+            progress_bar=False,
+            _states=None,
+            _states_flat=None,
+            _online_stats=None,
+            _pending_postprocess=None,
+            _postprocessed_sites={},
+            _last_state=None,
+            _warmup_state=None,
+            _init_state_cache={},
+            _progress=None,
+            _stop_fn=None,
+        )
+        worker = MCMC.__new__(MCMC)
+        worker.__dict__.update(worker_state)
+        config = {
+            "x64": jax.config.jax_enable_x64,
+            "platform": jax.default_backend(),
+            "compilation_cache_dir": numpyro.util._COMPILATION_CACHE_DIR,
+        }
+        map_args, args, kwargs = device_get((map_args, args, kwargs))
+        with ProcessPoolExecutor(
+            max_workers=min(self.num_chains, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_chain_in_process,
+                    worker,
+                    _get_value_from_index(map_args, i),
+                    args,
+                    kwargs,
+                    collect_fields,
+                    config,
+                )
+                for i in range(self.num_chains)
+            ]
+            results = [future.result() for future in futures]
+            states = [_from_shared_memory(*chain_states) for chain_states, _ in results]
+        states = tree_multimap(lambda *xs: jnp.concatenate(xs), *states)
+        last_state = tree_multimap(
+            lambda *xs: jnp.stack(xs), *[chain_last for _, chain_last in results]
+        )
+        return states, last_state
+
+    def _get_init(self, rng_key, init_params, args, kwargs):
+        # returns the (rng_key, init_state, init_params) inputs of `_run_chains`
         init_params = tree_map(
             lambda x: lax.convert_element_type(x, jnp.result_type(x)), init_params
         )
-        self._args = args
-        self._kwargs = kwargs
         init_state = self._get_cached_init_state(rng_key, args, kwargs)
         if self.num_chains > 1 and rng_key.ndim == 1:
             rng_key = random.split(rng_key, self.num_chains)
@@ -548,48 +1215,525 @@ class MCMC(object):
                     "`init_params` must have the same leading dimension"
                     " as `num_chains`."
                 )
+        return rng_key, init_state, init_params
+
+    def _get_collect_fields(self, extra_fields):
         assert isinstance(extra_fields, (tuple, list))
-        collect_fields = tuple(
+        return tuple(
             set(
                 (self._sample_field,)
                 + tuple(self._default_fields)
                 + tuple(extra_fields)
             )
         )
-        partial_map_fn = partial(
-            self._single_chain_mcmc,
-            args=args,
-            kwargs=kwargs,
-            collect_fields=collect_fields,
-        )
-        map_args = (rng_key, init_state, init_params)
-        if self.num_chains == 1:
-            states_flat, last_state = partial_map_fn(map_args)
-            states = tree_map(lambda x: x[jnp.newaxis, ...], states_flat)
-        else:
-            if self.chain_method == "sequential":
-                states, last_state = _laxmap(partial_map_fn, map_args)
-            elif self.chain_method == "parallel":
-                states, last_state = pmap(partial_map_fn)(map_args)
+
+    def compile(
+        self,
+        rng_key,
+        *args,
+        extra_fields=(),
+        init_params=None,
+        collect_sites=None,
+        **kwargs,
+    ):
+        """
+        Lowers and compiles the initialization and the sampling loop of :meth:`run`
+        ahead of time, without running them. The returned handle reports the
+        compile time and the FLOP and memory estimates of the XLA compiler, e.g. to
+        check that a run fits in device memory before starting it, and its
+        :meth:`~numpyro.infer.util.CompiledRun.run` method runs the compiled program
+        without tracing it again::
+
+            compiled = mcmc.compile(random.PRNGKey(0), data)
+            print(compiled.compile_time, compiled.flops, compiled.memory_bytes)
+            compiled.run(random.PRNGKey(1), data)
+            samples = mcmc.get_samples()
+
+        `compiled.run(rng_key, *args, init_params=None, **kwargs)` stores its results
+        in this MCMC instance as :meth:`run` does. The arguments must have the same
+        shapes and dtypes as the ones given to :meth:`compile`. If `jit_model_args`
+        is False, the model arguments are constants of the compiled program and must
+        be omitted. The sampling phase follows :meth:`warmup` if it has been called
+        before :meth:`compile`.
+
+        .. note:: The progress bar is only displayed if `progress_bar_interval` is
+            provided, because other progress bars cannot be compiled into the
+            program. The `"processes"` chain method is not supported.
+
+        :param random.PRNGKey rng_key: Random number generator key to be used for the
+            sampling.
+        :param args: Arguments to be provided to the :meth:`numpyro.infer.mcmc.MCMCKernel.init`
+            method. These are typically the arguments needed by the `model`.
+        :param extra_fields: Extra fields (aside from `"z"`, `"diverging"`) to be collected
+            during the MCMC run.
+        :type extra_fields: tuple or list of str
+        :param init_params: Initial parameters to begin sampling.
+        :param list collect_sites: If provided, only the values of these sample and
+            deterministic sites are collected (see :meth:`run`).
+        :param kwargs: Keyword arguments to be provided to the :meth:`numpyro.infer.mcmc.MCMCKernel.init`
+            method. These are typically the keyword arguments needed by the `model`.
+        :return: the compiled program.
+        :rtype: ~numpyro.infer.util.CompiledRun
+        """
+        if self.num_chains > 1 and self.chain_method == "processes":
+            raise ValueError("`compile` does not support the 'processes' chain method.")
+        self._collect_sites = None if collect_sites is None else tuple(collect_sites)
+        self._args = args
+        self._kwargs = kwargs
+        map_args = self._get_init(rng_key, init_params, args, kwargs)
+        collect_fields = self._get_collect_fields(extra_fields)
+        jit_model_args = self._jit_model_args
+        try:
+            compiled, lower_time, compile_time = self._aot_compile_chains(
+                map_args, args, kwargs, collect_fields
+            )
+        finally:
+            self._set_collection_params()
+
+        def run_compiled(compiled, rng_key, *run_args, init_params=None, **run_kwargs):
+            if jit_model_args:
+                self._args, self._kwargs = run_args, run_kwargs
+            elif run_args or run_kwargs:
+                raise ValueError(
+                    "The model arguments are constants of the compiled program"
+                    " when `jit_model_args=False`."
+                )
+            map_args = self._get_init(rng_key, init_params, self._args, self._kwargs)
+            self._set_collection_params()
+            states, last_state = self._run_compiled_chains(
+                compiled, map_args, self._args, self._kwargs
+            )
+            self._progress = None
+            self._online_stats = None
+            self._last_state = last_state
+            self._states = states
+            self._states_flat = tree_map(
+                lambda x: jnp.reshape(x, (-1,) + x.shape[2:]), states
+            )
+            self._pending_postprocess = None
+            self._postprocessed_sites = {}
+
+        return CompiledRun(compiled, lower_time, compile_time, run_compiled)
+
+    def _aot_compile_chains(self, map_args, args, kwargs, collect_fields):
+        # lowers and compiles `_run_chains` for the current collection params
+        def run_fn(map_args, args, kwargs):
+            states, _, last_state = self._run_chains(
+                map_args, args, kwargs, collect_fields
+            )
+            return states, last_state
+
+        progress_bar = self.progress_bar
+        self.progress_bar = progress_bar and self.progress_bar_interval is not None
+        try:
+            if self._jit_model_args:
+                return _aot_compile(run_fn, map_args, args, kwargs)
+            return _aot_compile(partial(run_fn, args=args, kwargs=kwargs), map_args)
+        finally:
+            self.progress_bar = progress_bar
+
+    def _run_compiled_chains(self, compiled, map_args, args, kwargs):
+        if self._jit_model_args:
+            return compiled(map_args, args, kwargs)
+        return compiled(map_args)
+
+    def _run_profiled(self, map_args, args, kwargs, collect_fields):
+        # runs the warmup and the sampling phases as separate programs, which are
+        # compiled ahead of time, so that compilation and execution can be timed
+        warmup_state = self._warmup_state
+        progress_bar = self.progress_bar
+        # like `compile`, the progress bar requires `progress_bar_interval`
+        self.progress_bar = progress_bar and self.progress_bar_interval is not None
+        timings = {"compile": 0.0, "warmup": 0.0, "sample": 0.0}
+        try:
+            if warmup_state is None and self.num_warmup > 0:
+                self._set_collection_params(
+                    self.num_warmup, self.num_warmup, self.num_samples, "warmup"
+                )
+                compiled, lower_time, compile_time = self._aot_compile_chains(
+                    map_args, args, kwargs, collect_fields
+                )
+                timings["compile"] += lower_time + compile_time
+                start = time.perf_counter()
+                _, last_state = _block_until_ready(
+                    self._run_compiled_chains(compiled, map_args, args, kwargs)
+                )
+                timings["warmup"] = time.perf_counter() - start
+                self._warmup_state = last_state
+                map_args = self._get_init(last_state.rng_key, None, args, kwargs)
+
+            # the number of gradient evaluations is computed from `num_steps`
+            start = time.perf_counter()
+            if self._warmup_state is not None:
+                state = self._warmup_state
             else:
-                assert self.chain_method == "vectorized"
-                states, last_state = partial_map_fn(map_args)
-                # swap num_samples x num_chains to num_chains x num_samples
-                states = tree_map(lambda x: jnp.swapaxes(x, 0, 1), states)
+                state = eval_shape(
+                    lambda map_args: self._run_chains(
+                        map_args, args, kwargs, collect_fields
+                    )[2],
+                    map_args,
+                )
+            has_num_steps = hasattr(state, "num_steps")
+            timings["compile"] += time.perf_counter() - start
+            drop_num_steps = has_num_steps and "num_steps" not in collect_fields
+            if drop_num_steps:
+                collect_fields = collect_fields + ("num_steps",)
+
+            self._defer_postprocess = self._collect_sites is None
+            compiled, lower_time, compile_time = self._aot_compile_chains(
+                map_args, args, kwargs, collect_fields
+            )
+            timings["compile"] += lower_time + compile_time
+            start = time.perf_counter()
+            states, last_state = _block_until_ready(
+                self._run_compiled_chains(compiled, map_args, args, kwargs)
+            )
+            timings["sample"] = time.perf_counter() - start
+        finally:
+            self.progress_bar = progress_bar
+            self._warmup_state = warmup_state
+            self._defer_postprocess = False
+            self._set_collection_params()
+
+        states = dict(states)
+        num_grads = None
+        if has_num_steps:
+            # `num_steps` counts the integrator steps of all the trajectories of an
+            # iteration (e.g. also the ghost and the retried trajectories of DRHMC)
+            grads_per_step = _num_grads_per_step(
+                getattr(self.sampler, "_integrator", None)
+            )
+            if grads_per_step is not None:
+                num_grads = grads_per_step * int(
+                    np.sum(device_get(states["num_steps"]))
+                )
+            if drop_num_steps:
+                del states["num_steps"]
+        states_flat = tree_map(lambda x: jnp.reshape(x, (-1,) + x.shape[2:]), states)
+        return states, states_flat, last_state, timings, num_grads
+
+    def _get_block_schedule(self, block_size, warmup_block_size=None):
+        # returns the collection params (lower, upper, num_draws, phase) of each block;
+        # the remainder iterations which are dropped by thinning are run at the start of
+        # the first sampling block, so that the blocks collect the same draws as a
+        # single run does
+        num_warmup = 0 if self._warmup_state is not None else self.num_warmup
+        num_draws = self.num_samples // self.thinning
+        remainder = self.num_samples % self.thinning
+        schedule = []
+        if warmup_block_size is not None:
+            for start in range(0, num_warmup, warmup_block_size):
+                block_iters = min(warmup_block_size, num_warmup - start)
+                schedule.append((block_iters, block_iters, 0, "warmup"))
+            num_warmup = 0
+        for i, start in enumerate(range(0, max(num_draws, 1), block_size)):
+            block_draws = min(block_size, num_draws - start)
+            block_iters = block_draws * self.thinning + (remainder if i == 0 else 0)
+            if i == 0 and num_warmup > 0:
+                schedule.append(
+                    (num_warmup, num_warmup + block_iters, block_draws, None)
+                )
+            else:
+                schedule.append((0, block_iters, block_draws, "sample"))
+        return schedule
+
+    def _run_blocks(self, progress):
+        args, kwargs = progress["args"], progress["kwargs"]
+        rng_key, init_state = progress["rng_key"], progress["state"]
+        init_params = progress["init_params"] if init_state is None else None
+        schedule = progress["schedule"]
+        pending, states, last_state = None, None, init_state
+        for block_idx in range(progress["block_idx"], len(schedule)):
+            lower, upper, num_draws, phase = schedule[block_idx]
+            # like `warmup`, warmup-only blocks use a non-empty (unused) collection
+            # because `fori_collect` cannot trace updates of an empty collection
+            collection_size = max(num_draws, 1) * self.thinning
+            self._set_collection_params(lower, upper, collection_size, phase)
+            states, _, last_state = self._run_chains(
+                (rng_key, init_state, init_params),
+                args,
+                kwargs,
+                progress["collect_fields"],
+            )
+            if num_draws > 0:
+                tree_map(_copy_to_host_async, states)
+            # JAX dispatches the current block asynchronously, so committing the
+            # previous block to the sink overlaps with sampling of the current block
+            if pending is not None:
+                self._commit_block(progress, *pending)
+            pending = (states, last_state)
+            init_state, init_params = last_state, None
+            if self._stop_fn is not None:
+                # the criterion needs the current block, so there is no overlap
+                self._commit_block(progress, *pending)
+                pending = None
+                if self._stop_fn(progress):
+                    break
+        if pending is not None:
+            self._commit_block(progress, *pending)
+
+        sampled_states = self._read_sink(progress)
+        if sampled_states is not None:
+            states = sampled_states
+            states_flat = tree_map(lambda x: np.reshape(x, (-1,) + x.shape[2:]), states)
+        else:
             states_flat = tree_map(
                 lambda x: jnp.reshape(x, (-1,) + x.shape[2:]), states
             )
+        return states, states_flat, last_state
+
+    def _read_sink(self, progress):
+        states = progress["sink"].read()
+        num_draws = progress["num_draws"]
+        if states is not None and num_draws < self.num_samples // self.thinning:
+            # the run has been stopped early by `run_until`
+            states = tree_map(lambda x: x[:, :num_draws], states)
+        return states
+
+    def _commit_block(self, progress, states, last_state):
+        num_draws = progress["schedule"][progress["block_idx"]][2]
+        if num_draws > 0:
+            progress["sink"].write(states, progress["num_draws"])
+        progress["num_draws"] += num_draws
+        progress["block_idx"] += 1
+        progress["state"] = last_state
+        if progress["checkpoint_path"] is not None:
+            self._last_state = last_state
+            self.save_checkpoint(progress["checkpoint_path"])
+
+    def run_until(
+        self,
+        rng_key,
+        *args,
+        target_ess=None,
+        max_rhat=None,
+        check_every=1000,
+        extra_fields=(),
+        init_params=None,
+        **kwargs,
+    ):
+        """
+        Run the MCMC samplers until the collected samples meet convergence targets.
+        The sampling phase is run in blocks of `check_every` iterations. After each
+        block, :func:`~numpyro.diagnostics.split_gelman_rubin` and
+        :func:`~numpyro.diagnostics.effective_sample_size` (across chains) are
+        computed for every latent site from all draws collected so far, and the run
+        stops once every site meets the targets. At most `num_samples` iterations
+        are run after warmup.
+
+        **Example:**
+
+        .. code-block:: python
+
+            mcmc = MCMC(NUTS(model), num_warmup=500, num_samples=20000, num_chains=4)
+            mcmc.run_until(random.PRNGKey(0), data, target_ess=1000, max_rhat=1.01)
+            samples = mcmc.get_samples()
+
+        :param random.PRNGKey rng_key: Random number generator key to be used for the sampling.
+        :param args: Arguments to be provided to the :meth:`numpyro.infer.mcmc.MCMCKernel.init` method.
+            These are typically the arguments needed by the `model`.
+        :param float target_ess: Minimal effective sample size of each latent site.
+        :param float max_rhat: Maximal split R-hat of each latent site.
+        :param int check_every: Number of iterations between two convergence checks.
+            This is rounded down to a multiple of `thinning`. Defaults to 1000.
+        :param extra_fields: Extra fields (aside from `"z"`, `"diverging"`) to be collected
+            during the MCMC run.
+        :type extra_fields: tuple or list of str
+        :param init_params: Initial parameters to begin sampling. The type must be consistent
+            with the input type to `potential_fn`.
+        :param kwargs: Keyword arguments to be provided to the :meth:`numpyro.infer.mcmc.MCMCKernel.init`
+            method. These are typically the keyword arguments needed by the `model`.
+        :return: whether the targets have been met within the budget of `num_samples`.
+        :rtype: bool
+        """
+        if target_ess is None and max_rhat is None:
+            raise ValueError("At least one of `target_ess` or `max_rhat` is required.")
+        if not isinstance(check_every, int) or check_every < 1:
+            raise ValueError("check_every must be a positive integer")
+        converged = False
+
+        def stop_fn(progress):
+            nonlocal converged
+            converged = self._has_converged(progress, target_ess, max_rhat)
+            return converged
+
+        sink = HostSink(block_size=max(check_every // self.thinning, 1))
+        self._stop_fn = stop_fn
+        try:
+            self.run(
+                rng_key,
+                *args,
+                extra_fields=extra_fields,
+                init_params=init_params,
+                sink=sink,
+                **kwargs,
+            )
+        finally:
+            self._stop_fn = None
+        if not converged:
+            warnings.warn(
+                "The convergence targets have not been met after {} samples.".format(
+                    self.num_samples
+                )
+            )
+        return converged
+
+    def _has_converged(self, progress, target_ess, max_rhat):
+        if progress["num_draws"] < 4:
+            return False
+        sites = self._read_sink(progress)[self._sample_field]
+        state_sample_field = attrgetter(self._sample_field)(progress["state"])
+        if isinstance(sites, dict) and isinstance(state_sample_field, dict):
+            # deterministic sites are excluded, as in `print_summary`
+            sites = {k: v for k, v in sites.items() if k in state_sample_field}
+        for value in tree_flatten(sites)[0]:
+            value = np.asarray(value)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                if target_ess is not None:
+                    if np.nanmin(effective_sample_size(value)) < target_ess:
+                        return False
+                if max_rhat is not None:
+                    if np.nanmax(split_gelman_rubin(value)) > max_rhat:
+                        return False
+        return True
+
+    def _init_sampler(self, state, rng_key, args, kwargs):
+        # `sampler.init` sets up the internal functions of the sampler, which are not
+        # available when we resume from a state produced by another process
+        init_params = attrgetter(self._sample_field)(state)
+        if self.chain_method == "parallel_vectorized":
+            # the chains of the first device
+            chains_per_device = self.num_chains // self._get_num_devices()
+            rng_key, init_params = tree_map(
+                lambda x: x[:chains_per_device], (rng_key, init_params)
+            )
+        elif self.num_chains > 1 and self.chain_method != "vectorized":
+            rng_key, init_params = tree_map(lambda x: x[0], (rng_key, init_params))
+        # e.g. the blocks of the mass matrix detected by `HMC(dense_mass="auto")`
+        if hasattr(self.sampler, "_restore_structure"):
+            self.sampler._restore_structure(state)
+        self.sampler.init(
+            rng_key,
+            self.num_warmup,
+            init_params,
+            model_args=args,
+            model_kwargs=kwargs,
+        )
+
+    def save_checkpoint(self, path):
+        """
+        Saves the current progress of this MCMC instance to `path`. The checkpoint
+        contains the last state of each chain (including adaptation state and random
+        keys), the state right after warmup, and the samples collected so far. When
+        it is called during a run with `checkpoint_path` (see :meth:`run`), the
+        checkpoint also records the remaining blocks to run, so that :meth:`resume`
+        can continue the run where it stopped.
+
+        :param str path: The file to store the checkpoint. The file is replaced
+            atomically, so an interrupted save does not corrupt an older checkpoint.
+        """
+        progress = self._progress
+        if progress is not None:
+            progress = progress.copy()
+            progress.update(
+                device_get(
+                    {
+                        "state": progress["state"],
+                        "rng_key": progress["rng_key"],
+                        "init_params": progress["init_params"],
+                        "args": progress["args"],
+                        "kwargs": progress["kwargs"],
+                    }
+                )
+            )
+        checkpoint = {
+            "config": self._checkpoint_config(),
+            "last_state": device_get(self._last_state),
+            "warmup_state": device_get(self._warmup_state),
+            "states": device_get(self._get_states()) if progress is None else None,
+            "progress": progress,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    def _checkpoint_config(self):
+        return {
+            "num_warmup": self.num_warmup,
+            "num_samples": self.num_samples,
+            "num_chains": self.num_chains,
+            "thinning": self.thinning,
+            "chain_method": self.chain_method,
+        }
+
+    def resume(self, path):
+        """
+        Restores the progress saved by :meth:`save_checkpoint` and, if the checkpointed
+        run has not finished yet, continues it from the last saved block. Provided that
+        this MCMC instance is constructed with the same sampler and settings as the
+        checkpointed one, the resumed run produces the same samples as an
+        uninterrupted run.
+
+        **Example:**
+
+        .. code-block:: python
+
+            mcmc = MCMC(NUTS(model), num_warmup=1000, num_samples=10000)
+            if os.path.exists("mcmc.ckpt"):
+                mcmc.resume("mcmc.ckpt")
+            else:
+                mcmc.run(random.PRNGKey(0), data, checkpoint_path="mcmc.ckpt",
+                         checkpoint_every=500)
+            samples = mcmc.get_samples()
+
+        :param str path: The checkpoint file.
+        """
+        with open(path, "rb") as f:
+            checkpoint = pickle.load(f)
+        if checkpoint["config"] != self._checkpoint_config():
+            raise ValueError(
+                "The checkpoint was created with MCMC settings {} which do not match"
+                " the settings {} of this instance.".format(
+                    checkpoint["config"], self._checkpoint_config()
+                )
+            )
+        self._warmup_state = checkpoint["warmup_state"]
+        self._last_state = checkpoint["last_state"]
+        progress = self._progress = checkpoint["progress"]
+        self._pending_postprocess = None
+        self._postprocessed_sites = {}
+        if progress is None:
+            self._states = checkpoint["states"]
+            self._states_flat = tree_map(
+                lambda x: np.reshape(x, (-1,) + x.shape[2:]), self._states
+            )
+            return
+
+        self._args, self._kwargs = progress["args"], progress["kwargs"]
+        self._collect_sites = progress["collect_sites"]
+        if progress["state"] is not None and progress["block_idx"] < len(
+            progress["schedule"]
+        ):
+            self._init_sampler(
+                progress["state"], progress["rng_key"], self._args, self._kwargs
+            )
+        states, states_flat, last_state = self._run_blocks(progress)
         self._last_state = last_state
         self._states = states
         self._states_flat = states_flat
         self._set_collection_params()
 
-    def get_samples(self, group_by_chain=False):
+    def get_samples(self, group_by_chain=False, sites=None):
         """
         Get samples from the MCMC run.
 
         :param bool group_by_chain: Whether to preserve the chain dimension. If True,
             all samples will have num_chains as the size of their leading dimension.
+        :param list sites: If provided, only the samples of these sites are returned.
+            The constrained values and the deterministic sites are computed on demand
+            (in chunks of draws), so that only the requested sites are evaluated.
         :return: Samples having the same data type as `init_params`. The data type is a
             `dict` keyed on site names if a model containing Pyro primitives is used,
             but can be any :func:`jaxlib.pytree`, more generally (e.g. when defining a
@@ -604,11 +1748,112 @@ class MCMC(object):
             samples = predictive(rng_key1, *model_args, **model_kwargs)
 
         """
-        return (
-            self._states[self._sample_field]
-            if group_by_chain
-            else self._states_flat[self._sample_field]
+        self._check_samples_stored()
+        if self._pending_postprocess is None:
+            samples = (
+                self._states[self._sample_field]
+                if group_by_chain
+                else self._states_flat[self._sample_field]
+            )
+            if sites is not None:
+                samples = {name: samples[name] for name in sites}
+            return samples
+
+        samples = self._get_postprocessed_sites(sites)
+        if group_by_chain:
+            return samples
+        return tree_map(lambda x: jnp.reshape(x, (-1,) + jnp.shape(x)[2:]), samples)
+
+    def _get_postprocessed_sites(self, sites=None):
+        # postprocesses the unconstrained values collected by the last run, grouped by
+        # chain; the values of the requested sites (or of all sites, keyed by None) are
+        # cached in `_postprocessed_sites`
+        z = self._states[self._sample_field]
+        if sites is None and None in self._postprocessed_sites:
+            return self._postprocessed_sites[None]
+        if sites is not None:
+            missing = tuple(
+                name for name in sites if name not in self._postprocessed_sites
+            )
+            if not missing:
+                return {name: self._postprocessed_sites[name] for name in sites}
+
+        sites_fn, vmap_fn = self._get_cached_postprocess_fns(
+            None if sites is None else missing
         )
+        if self.postprocess_chunk_size is not None:
+            values = _chunked_postprocess(vmap_fn, z, self.postprocess_chunk_size)
+        else:
+            try:
+                values = sites_fn(z)
+            except RuntimeError as e:
+                if not _is_oom_error(e):
+                    raise
+                num_draws = int(np.prod(np.shape(tree_flatten(z)[0][0])[:2]))
+                chunk_size = max(num_draws // 2, 1)
+                warnings.warn(
+                    "Postprocessing ran out of memory, retrying with chunks of {}"
+                    " draws.".format(chunk_size)
+                )
+                values = _chunked_postprocess(vmap_fn, z, chunk_size)
+        if sites is None:
+            self._postprocessed_sites[None] = values
+            return values
+        self._postprocessed_sites.update(values)
+        return {name: self._postprocessed_sites[name] for name in sites}
+
+    def _get_cached_postprocess_fns(self, sites):
+        # the compiled functions which postprocess the requested `sites` (or all sites
+        # if None) of all draws grouped by chain, and of a batch of draws; they are
+        # cached for the arguments of the last run, the same way as `_get_cached_fns`
+        args, kwargs = self._pending_postprocess
+        key = ("postprocess", sites, self.storage_dtype)
+        try:
+            key = (
+                key
+                + tree_map(lambda x: _hashable(x), args)
+                + tree_map(lambda x: _hashable(x), tuple(sorted(kwargs.items())))
+            )
+            fns = self._cache.get(key, None)
+        # If unhashable arguments are provided, proceed normally
+        # without caching
+        except TypeError:
+            fns, key = None, None
+        if fns is not None:
+            return fns
+
+        if self.postprocess_fn is None:
+            body_fn = self.sampler.postprocess_fn(args, kwargs)
+        else:
+            body_fn = self.postprocess_fn
+        storage_dtype = self.storage_dtype
+
+        def postprocess_fn(z):
+            if storage_dtype is not None:
+                # compute in the default precision, store in `storage_dtype`
+                z = _cast_floating(z, jnp.result_type(float))
+            values = body_fn(z)
+            if sites is not None:
+                values = {name: values[name] for name in sites}
+            if storage_dtype is not None:
+                values = _cast_floating(values, storage_dtype)
+            return values
+
+        fns = (
+            jit(partial(soft_vmap, postprocess_fn, batch_ndims=2, chunk_size=100)),
+            jit(vmap(postprocess_fn)),
+        )
+        if key is not None:
+            self._cache[key] = fns
+        return fns
+
+    def _get_states(self):
+        # the states of the last run, with the postprocessed values of the sample field
+        if self._pending_postprocess is None:
+            return self._states
+        states = self._states.copy()
+        states[self._sample_field] = self._get_postprocessed_sites()
+        return states
 
     def get_extra_fields(self, group_by_chain=False):
         """
@@ -619,9 +1864,43 @@ class MCMC(object):
         :return: Extra fields keyed by field names which are specified in the
             `extra_fields` keyword of :meth:`run`.
         """
+        self._check_samples_stored()
         states = self._states if group_by_chain else self._states_flat
         return {k: v for k, v in states.items() if k != self._sample_field}
 
+    def get_online_stats(self):
+        """
+        Get the streaming statistics accumulated by the last run with
+        `online_stats=True`.
+
+        :return: a dict which maps the sample field to a dict of
+            :data:`~numpyro.infer.online_stats.OnlineStatsState` keyed on site names
+            and, if the sampler reports divergences, `"diverging"` to the number of
+            divergent transitions. All values have num_chains as the size of their
+            leading dimension.
+        """
+        if self._online_stats is None:
+            raise RuntimeError("The last run did not use `online_stats=True`.")
+        return self._online_stats
+
+    def get_profile(self):
+        """
+        Get the timings and sampling efficiency of the last run with `profile=True`.
+
+        :return: the profile of the last run.
+        :rtype: ~numpyro.infer.util.MCMCProfile
+        """
+        if self._profile is None:
+            raise RuntimeError("The last run did not use `profile=True`.")
+        return self._profile
+
+    def _check_samples_stored(self):
+        if self._online_stats is not None:
+            raise RuntimeError(
+                "Samples are not stored when running with `online_stats=True`."
+                " Please use `get_online_stats` or `print_summary` instead."
+            )
+
     def print_summary(self, prob=0.9, exclude_deterministic=True):
         """
         Print the statistics of posterior samples collected during running this MCMC instance.
@@ -631,7 +1910,10 @@ class MCMC(object):
             at deterministic sites.
         """
         # Exclude deterministic sites by default
-        sites = self._states[self._sample_field]
+        if self._online_stats is not None:
+            sites = self._online_stats[self._sample_field]
+        else:
+            sites = self._get_states()[self._sample_field]
         if isinstance(sites, dict) and exclude_deterministic:
             state_sample_field = attrgetter(self._sample_field)(self._last_state)
             # XXX: there might be the case that state.z is not a dictionary but
@@ -640,13 +1922,15 @@ class MCMC(object):
             # they can have different key names, not necessary due to deterministic
             # behavior. We might revise this logic if needed in the future.
             if isinstance(state_sample_field, dict):
-                sites = {
-                    k: v
-                    for k, v in self._states[self._sample_field].items()
-                    if k in state_sample_field
-                }
-        print_summary(sites, prob=prob)
-        extra_fields = self.get_extra_fields()
+                sites = {k: v for k, v in sites.items() if k in state_sample_field}
+        if self._online_stats is not None:
+            _print_summary_dict(
+                online_summary(sites, prob=prob, **self._online_stats_options)
+            )
+            extra_fields = self._online_stats
+        else:
+            print_summary(sites, prob=prob)
+            extra_fields = self.get_extra_fields()
         if "diverging" in extra_fields:
             print(
                 "Number of divergences: {}".format(jnp.sum(extra_fields["diverging"]))
@@ -0,0 +1,284 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This provides streaming accumulators of posterior statistics which can be updated
+inside the sampling loop, so that summaries of very long chains can be computed
+without storing the draws.
+"""
+
+from collections import OrderedDict, namedtuple
+import math
+
+import numpy as np
+
+from jax import device_get
+import jax.numpy as jnp
+from jax.ops import index_add
+from jax.tree_util import tree_map, tree_multimap
+
+from numpyro.infer.hmc_util import welford_covariance
+
+__all__ = [
+    "OnlineStatsState",
+    "online_stats",
+    "online_summary",
+    "quantile_sketch",
+]
+
+OnlineStatsState = namedtuple(
+    "OnlineStatsState",
+    [
+        "moments",
+        "first_half",
+        "second_half",
+        "batch_sum",
+        "batch_moments",
+        "sketch",
+    ],
+)
+"""
+A :func:`~collections.namedtuple` consisting of the following fields:
+
+ - **moments** - Welford state `(mean, m2, n)` of all draws.
+ - **first_half** - Welford state of the first half of the draws.
+ - **second_half** - Welford state of the second half of the draws.
+ - **batch_sum** - sum of the draws in the current (incomplete) batch.
+ - **batch_moments** - Welford state of the means of completed batches.
+ - **sketch** - bucket counts of the quantile sketch, with shape
+   `sample_shape + (num_buckets,)`.
+"""
+
+
+def _masked_update(pred, update_fn, x, state):
+    new_state = update_fn(x, state)
+    return tree_multimap(lambda new, old: jnp.where(pred, new, old), new_state, state)
+
+
+def quantile_sketch(relative_accuracy=0.01, min_value=1e-6, max_value=1e6):
+    """
+    Implements a fixed-size quantile sketch with relative accuracy guarantees in the
+    spirit of DDSketch: each value is counted in a logarithmically spaced bucket, so
+    that a quantile estimate `q` of a value `x` satisfies
+    `|q - x| <= relative_accuracy * |x|` as long as `min_value <= |x| <= max_value`.
+    Values of magnitude smaller than `min_value` are counted as zeros and values of
+    magnitude larger than `max_value` are counted in the outermost buckets. Sketches
+    can be merged by adding their counts.
+
+    .. note:: The sketch of each scalar element stores about
+        `2 * log(max_value / min_value) / log((1 + relative_accuracy) /
+        (1 - relative_accuracy))` int32 counts, i.e. 2765 counts (about 11 KB) with
+        the default arguments, and each update touches one count per element. For
+        models with many latent elements, a coarser sketch (e.g. a relative accuracy
+        of 0.05 on the range from 1e-3 to 1e3, with 281 counts) reduces the memory
+        accordingly.
+
+    **References:**
+
+    1. *DDSketch: A Fast and Fully-Mergeable Quantile Sketch with Relative-Error
+       Guarantees*, Charles Masson, Jee E. Rim, Homin K. Lee
+
+    :param float relative_accuracy: Relative accuracy of the quantile estimates.
+    :param float min_value: Smallest magnitude which is distinguished from zero.
+    :param float max_value: Largest magnitude with relative accuracy guarantees.
+    :return: a (`init_fn`, `update_fn`, `values`) triple, where `values` is a
+        numpy array of the representative value of each bucket in increasing order.
+    """
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    log_gamma = math.log(gamma)
+    min_key = math.ceil(math.log(min_value) / log_gamma)
+    max_key = math.ceil(math.log(max_value) / log_gamma)
+    num_keys = max_key - min_key + 1
+    positive_values = 2 * gamma ** np.arange(min_key, max_key + 1) / (gamma + 1)
+    values = np.concatenate([-positive_values[::-1], [0.0], positive_values])
+
+    def init_fn(shape):
+        """
+        :param tuple shape: shape of each sample.
+        :return: initial bucket counts.
+        """
+        return jnp.zeros(tuple(shape) + (2 * num_keys + 1,), dtype=jnp.int32)
+
+    def update_fn(sample, counts):
+        """
+        :param sample: A new sample.
+        :param counts: Current bucket counts.
+        :return: new bucket counts.
+        """
+        x = jnp.reshape(sample, -1)
+        abs_x = jnp.abs(x)
+        key = jnp.ceil(jnp.log(jnp.maximum(abs_x, min_value)) / log_gamma)
+        key = jnp.clip(key.astype(jnp.int32) - min_key, 0, num_keys - 1)
+        bucket = jnp.where(x > 0, num_keys + 1 + key, num_keys - 1 - key)
+        bucket = jnp.where(abs_x < min_value, num_keys, bucket)
+        flat_counts = jnp.reshape(counts, (x.shape[0], -1))
+        flat_counts = index_add(flat_counts, (jnp.arange(x.shape[0]), bucket), 1)
+        return jnp.reshape(flat_counts, counts.shape)
+
+    return init_fn, update_fn, values
+
+
+def online_stats(num_draws, relative_accuracy=0.01, min_value=1e-6, max_value=1e6):
+    """
+    Implements streaming accumulators of the statistics reported by
+    :func:`~numpyro.diagnostics.summary` for a single chain: Welford moments of all
+    draws and of both halves of the chain (for split R-hat), Welford moments of batch
+    means (for the batch-means estimate of the effective sample size) and a
+    :func:`quantile_sketch` (for median and HPDI). The memory used is independent of
+    `num_draws`.
+
+    :param int num_draws: Total number of draws, which determines the halves of the
+        chain and the batch size `floor(sqrt(num_draws))` of the batch means.
+    :param float relative_accuracy: Relative accuracy of the quantile sketch.
+    :param float min_value: Smallest magnitude which is distinguished from zero by
+        the quantile sketch.
+    :param float max_value: Largest magnitude with relative accuracy guarantees
+        in the quantile sketch.
+    :return: a pair of (`init_fn`, `update_fn`).
+    """
+    wc_init, wc_update, _ = welford_covariance(diagonal=True)
+    sketch_init, sketch_update, _ = quantile_sketch(
+        relative_accuracy, min_value, max_value
+    )
+    half_size = num_draws // 2
+    batch_size = max(int(math.sqrt(num_draws)), 1)
+
+    def init_fn(sample):
+        """
+        :param sample: A prototype sample, a pytree of arrays.
+        :return: initial state for the scheme, a pytree with the same structure as
+            `sample` whose leaves are :data:`OnlineStatsState`.
+        """
+
+        def init_leaf(x):
+            size = int(np.prod(jnp.shape(x)))
+            return OnlineStatsState(
+                wc_init(size),
+                wc_init(size),
+                wc_init(size),
+                jnp.zeros(size),
+                wc_init(size),
+                sketch_init(jnp.shape(x)),
+            )
+
+        return tree_map(init_leaf, sample)
+
+    def update_fn(sample, state):
+        """
+        :param sample: A new sample.
+        :param state: Current state of the scheme.
+        :return: new state for the scheme.
+        """
+
+        def update_leaf(x, leaf_state):
+            x = jnp.reshape(x, -1)
+            n = leaf_state.moments[2]
+            batch_sum = leaf_state.batch_sum + x
+            batch_end = (n + 1) % batch_size == 0
+            batch_moments = _masked_update(
+                batch_end, wc_update, batch_sum / batch_size, leaf_state.batch_moments
+            )
+            return OnlineStatsState(
+                wc_update(x, leaf_state.moments),
+                _masked_update(n < half_size, wc_update, x, leaf_state.first_half),
+                _masked_update(
+                    n >= num_draws - half_size, wc_update, x, leaf_state.second_half
+                ),
+                jnp.where(batch_end, 0.0, batch_sum),
+                batch_moments,
+                sketch_update(x, leaf_state.sketch),
+            )
+
+        # `state` has the structure of `sample` up to its OnlineStatsState leaves
+        return tree_multimap(update_leaf, sample, state)
+
+    return init_fn, update_fn
+
+
+def _sketch_hpdi(values, counts, prob):
+    # the narrowest range of buckets which contains at least `prob` of the mass
+    cumsum = np.cumsum(counts)
+    num_in_interval = int(prob * cumsum[-1]) + 1
+    ends = np.searchsorted(cumsum, cumsum - counts + num_in_interval)
+    starts = np.arange(counts.shape[0])[ends < counts.shape[0]]
+    ends = ends[ends < counts.shape[0]]
+    idx = np.argmin(values[ends] - values[starts])
+    return values[starts[idx]], values[ends[idx]]
+
+
+def _online_site_summary(state, values, prob):
+    # `state` is an OnlineStatsState of numpy arrays with a leading chain dimension
+    shape = state.sketch.shape[1:-1]
+    mean_c, m2_c, n_c = state.moments
+    n_c = n_c.reshape(-1, 1)
+    n = n_c.sum()
+    mean = (n_c * mean_c).sum(axis=0) / n
+    m2 = m2_c.sum(axis=0) + (n_c * (mean_c - mean) ** 2).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(m2 / (n - 1))
+
+    counts = state.sketch.sum(axis=0).reshape(-1, state.sketch.shape[-1])
+    median = np.empty(counts.shape[0])
+    hpd = np.empty((2, counts.shape[0]))
+    for i, row in enumerate(counts):
+        median[i] = values[np.searchsorted(np.cumsum(row), 0.5 * row.sum())]
+        hpd[:, i] = _sketch_hpdi(values, row, prob)
+
+    # batch-means estimate of the effective sample size of each chain
+    batch_mean_c, batch_m2_c, num_batches_c = state.batch_moments
+    num_batches_c = num_batches_c.reshape(-1, 1)
+    batch_size = n_c // np.maximum(num_batches_c, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        chain_var = m2_c / (n_c - 1)
+        batch_var = batch_size * batch_m2_c / (num_batches_c - 1)
+        n_eff = (n_c * chain_var / batch_var).sum(axis=0)
+
+    # split R-hat from the moments of the halves of each chain
+    half_means = np.concatenate([state.first_half[0], state.second_half[0]])
+    half_m2 = np.concatenate([state.first_half[1], state.second_half[1]])
+    half_n = np.concatenate([state.first_half[2], state.second_half[2]])
+    half_n = half_n.reshape(-1, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var_within = (half_m2 / (half_n - 1)).mean(axis=0)
+        var_estimator = var_within * (half_n[0] - 1) / half_n[0]
+        var_estimator = var_estimator + half_means.var(axis=0, ddof=1)
+        r_hat = np.sqrt(var_estimator / var_within)
+
+    hpd_lower = "{:.1f}%".format(50 * (1 - prob))
+    hpd_upper = "{:.1f}%".format(50 * (1 + prob))
+    return OrderedDict(
+        [
+            ("mean", mean.reshape(shape)),
+            ("std", std.reshape(shape)),
+            ("median", median.reshape(shape)),
+            (hpd_lower, hpd[0].reshape(shape)),
+            (hpd_upper, hpd[1].reshape(shape)),
+            ("n_eff", n_eff.reshape(shape)),
+            ("r_hat", r_hat.reshape(shape)),
+        ]
+    )
+
+
+def online_summary(
+    states, prob=0.90, relative_accuracy=0.01, min_value=1e-6, max_value=1e6
+):
+    """
+    Returns a summary table, in the format of :func:`~numpyro.diagnostics.summary`,
+    from the states of :func:`online_stats` accumulated by several chains. The
+    median and the HPDI are estimated from the quantile sketch, the effective
+    sample size is the sum over chains of the batch-means estimates and R-hat is
+    the split R-hat computed from the moments of the halves of each chain.
+
+    :param dict states: A dict mapping site names to :data:`OnlineStatsState`
+        whose leaves have a leading chain dimension.
+    :param float prob: the probability mass of samples within the HPDI interval.
+    :param float relative_accuracy: Relative accuracy of the quantile sketch.
+    :param float min_value: `min_value` of the quantile sketch.
+    :param float max_value: `max_value` of the quantile sketch.
+    """
+    _, _, values = quantile_sketch(relative_accuracy, min_value, max_value)
+    states = device_get(states)
+    return OrderedDict(
+        (name, _online_site_summary(state, values, prob))
+        for name, state in states.items()
+    )
@@ -0,0 +1,288 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import namedtuple
+from functools import partial
+
+from jax import lax, random, value_and_grad, vmap
+from jax.flatten_util import ravel_pytree
+from jax.nn import softmax
+import jax.numpy as jnp
+from jax.ops import index_update
+from jax.scipy.linalg import solve_triangular
+from jax.tree_util import tree_map
+
+from numpyro.infer.initialization import init_to_uniform
+from numpyro.infer.util import initialize_model
+from numpyro.util import cond, identity, while_loop
+
+PathfinderResult = namedtuple(
+    "PathfinderResult", ["samples", "elbo", "inverse_mass_matrix"]
+)
+"""
+A :func:`~collections.namedtuple` consisting of the following fields:
+
+ - **samples** - Python dictionary of (constrained) approximate posterior draws,
+   keyed by site name, where each value has a leading dimension ``num_draws``.
+   This can be passed to :func:`~numpyro.infer.initialization.init_to_pathfinder`.
+ - **elbo** - The ELBO of the best normal approximation found along each of the
+   optimization paths.
+ - **inverse_mass_matrix** - A dictionary which maps the tuple of (sorted) latent
+   site names to the importance weighted variance of the draws in unconstrained
+   space. This can be used as the ``inverse_mass_matrix`` of
+   :class:`~numpyro.infer.hmc.HMC` or :class:`~numpyro.infer.hmc.NUTS`.
+"""
+
+
+def _two_loop_recursion(g, s, y):
+    # approximates the product of the inverse Hessian and `g` using the history of
+    # position differences `s` and gradient differences `y`, ordered from the oldest
+    # to the most recent pair; unfilled pairs are zeros and are ignored
+    sy = jnp.sum(s * y, -1)
+    rho = jnp.where(sy > 0, 1 / jnp.where(sy > 0, sy, 1.0), 0.0)
+
+    def backward_fn(q, args):
+        s_i, y_i, rho_i = args
+        a_i = rho_i * jnp.dot(s_i, q)
+        return q - a_i * y_i, a_i
+
+    q, a = lax.scan(backward_fn, g, (s[::-1], y[::-1], rho[::-1]))
+    yy = jnp.dot(y[-1], y[-1])
+    gamma = jnp.where(sy[-1] > 0, sy[-1] / jnp.where(yy > 0, yy, 1.0), 1.0)
+
+    def forward_fn(r, args):
+        s_i, y_i, rho_i, a_i = args
+        b_i = rho_i * jnp.dot(y_i, r)
+        return r + (a_i - b_i) * s_i, None
+
+    r, _ = lax.scan(forward_fn, gamma * q, (s, y, rho, a[::-1]))
+    return r
+
+
+def _update_diagonal(alpha, s, y):
+    # diagonal update of the inverse Hessian approximation, see reference [2]
+    a = jnp.dot(y, alpha * y)
+    b = jnp.dot(y, s)
+    c = jnp.dot(s, s / alpha)
+    inv_alpha = a / (b * alpha) + y ** 2 / b - a * (s / alpha) ** 2 / (b * c)
+    is_valid = jnp.all(jnp.isfinite(inv_alpha) & (inv_alpha > 0))
+    return jnp.where(is_valid, 1 / jnp.where(is_valid, inv_alpha, 1.0), alpha)
+
+
+def _inverse_hessian_factors(alpha, s, y):
+    # the compact representation `diag(alpha) + beta @ gamma @ beta.T` of the
+    # L-BFGS inverse Hessian, see reference [3]
+    history_size = s.shape[0]
+    sy = jnp.matmul(s, y.T)
+    sy_diag = jnp.diagonal(sy)
+    is_filled = sy_diag > 0
+    # unfilled pairs have zero columns in `beta`, so they do not contribute
+    r = jnp.triu(sy) + jnp.diag(jnp.where(is_filled, 0.0, 1.0))
+    eye = jnp.identity(history_size)
+    r_inv = solve_triangular(r, eye, lower=False)
+    beta = jnp.concatenate([alpha[:, None] * y.T, s.T], axis=-1)
+    d = jnp.diag(jnp.where(is_filled, sy_diag, 0.0))
+    block = r_inv.T @ (d + (y * alpha) @ y.T) @ r_inv
+    gamma = jnp.concatenate(
+        [
+            jnp.concatenate([jnp.zeros_like(eye), -r_inv], axis=-1),
+            jnp.concatenate([-r_inv.T, block], axis=-1),
+        ]
+    )
+    return beta, gamma
+
+
+def _normal_approximation(rng_key, x, x_grad, alpha, s, y, num_draws):
+    # draws from the local normal approximation at `x` (where `x_grad` is the
+    # gradient of the potential energy) together with their log densities
+    beta, gamma = _inverse_hessian_factors(alpha, s, y)
+    q, r = jnp.linalg.qr(beta / jnp.sqrt(alpha)[:, None])
+    eye = jnp.identity(r.shape[0])
+    chol = jnp.linalg.cholesky(eye + r @ gamma @ r.T)
+    log_det = jnp.sum(jnp.log(alpha)) + 2 * jnp.sum(jnp.log(jnp.diagonal(chol)))
+    loc = x - alpha * x_grad - beta @ (gamma @ (beta.T @ x_grad))
+    eps = random.normal(rng_key, (num_draws,) + jnp.shape(x))
+    draws = loc + jnp.sqrt(alpha) * (eps + ((eps @ q) @ (chol - eye).T) @ q.T)
+    log_prob = -0.5 * (
+        log_det + jnp.sum(eps ** 2, -1) + jnp.size(x) * jnp.log(2 * jnp.pi)
+    )
+    return draws, log_prob
+
+
+def _elbo(potential_fn, draws, log_prob):
+    elbo = jnp.mean(-vmap(potential_fn)(draws) - log_prob)
+    return jnp.where(jnp.isnan(elbo), -jnp.inf, elbo)
+
+
+def _single_path(
+    potential_fn, rng_key, x, max_iters, history_size, num_elbo_draws, max_linesearch
+):
+    # runs L-BFGS from `x` and returns the parameters of the normal approximation
+    # which has the highest ELBO along the optimization path
+    f, g = value_and_grad(potential_fn)(x)
+    s = y = jnp.zeros((history_size,) + jnp.shape(x))
+    alpha = jnp.ones(jnp.shape(x))
+    best = (jnp.array(-jnp.inf), x, g, alpha, s, y)
+
+    def step_fn(args):
+        (x, f, g, alpha, s, y, done, best), rng_key = args
+        p = _two_loop_recursion(g, s, y)
+        gp = jnp.dot(g, p)
+        # fall back to the steepest descent direction if `p` is not a descent one
+        p, gp = jnp.where(gp > 0, p, g), jnp.where(gp > 0, gp, jnp.dot(g, g))
+
+        def try_step(step_size):
+            x_new = x - step_size * p
+            f_new, g_new = value_and_grad(potential_fn)(x_new)
+            is_valid = (
+                jnp.isfinite(f_new)
+                & jnp.all(jnp.isfinite(g_new))
+                & (f_new <= f - 1e-4 * step_size * gp)
+            )
+            return step_size, x_new, f_new, g_new, is_valid
+
+        # backtracking line search which satisfies the Armijo condition
+        _, x_new, f_new, g_new, is_valid = while_loop(
+            lambda val: ~val[-1] & (val[0] > 0.5 ** max_linesearch),
+            lambda val: try_step(0.5 * val[0]),
+            try_step(jnp.array(1.0, dtype=jnp.result_type(float))),
+        )
+        s_new, y_new = x_new - x, g_new - g
+        is_curved = is_valid & (jnp.dot(s_new, y_new) > 1e-12 * jnp.dot(y_new, y_new))
+        alpha = jnp.where(is_curved, _update_diagonal(alpha, s_new, y_new), alpha)
+        s = jnp.where(is_curved, index_update(jnp.roll(s, -1, 0), -1, s_new), s)
+        y = jnp.where(is_curved, index_update(jnp.roll(y, -1, 0), -1, y_new), y)
+        is_converged = jnp.abs(f - f_new) <= 1e-8 * jnp.maximum(
+            jnp.maximum(jnp.abs(f), jnp.abs(f_new)), 1.0
+        )
+        x, f, g = (
+            jnp.where(is_valid, x_new, x),
+            jnp.where(is_valid, f_new, f),
+            jnp.where(is_valid, g_new, g),
+        )
+
+        draws, log_prob = _normal_approximation(
+            rng_key, x, g, alpha, s, y, num_elbo_draws
+        )
+        elbo = _elbo(potential_fn, draws, log_prob)
+        best = cond(
+            elbo > best[0],
+            (elbo, x, g, alpha, s, y),
+            identity,
+            best,
+            identity,
+        )
+        done = ~is_valid | is_converged
+        return x, f, g, alpha, s, y, done, best
+
+    def scan_fn(carry, rng_key):
+        carry = cond(carry[-2], carry, identity, (carry, rng_key), step_fn)
+        return carry, None
+
+    init = (x, f, g, alpha, s, y, jnp.array(False), best)
+    (*_, best), _ = lax.scan(scan_fn, init, random.split(rng_key, max_iters))
+    return best
+
+
+def pathfinder(
+    rng_key,
+    model,
+    model_args=(),
+    model_kwargs=None,
+    *,
+    num_paths=4,
+    num_draws=1000,
+    max_iters=1000,
+    history_size=6,
+    num_elbo_draws=10,
+    max_linesearch=20,
+    init_strategy=init_to_uniform,
+):
+    """
+    Pathfinder variational inference. Each of the ``num_paths`` paths runs L-BFGS
+    in the unconstrained space of the model, starting from a point given by
+    ``init_strategy``. A normal approximation, whose covariance is the L-BFGS
+    estimate of the inverse Hessian, is formed at each iterate, and the one with
+    the highest ELBO is kept. Draws from the best approximation of each path are
+    pooled and importance resampled with respect to the posterior.
+
+    The result can be used to start MCMC chains close to the typical set and to
+    seed their mass matrix::
+
+        result = pathfinder(random.PRNGKey(0), model, model_args=(data,))
+        kernel = NUTS(
+            model,
+            init_strategy=init_to_pathfinder(samples=result.samples),
+            inverse_mass_matrix=result.inverse_mass_matrix,
+        )
+
+    or to initialize the locations of an autoguide through its ``init_loc_fn``.
+
+    **References:**
+
+    1. *Pathfinder: Parallel quasi-Newton variational inference*,
+       Lu Zhang, Bob Carpenter, Andrew Gelman, Aki Vehtari
+    2. *A globally convergent BFGS method with nonmonotone line search for
+       non-convex minimization*, Jean Charles Gilbert, Claude Lemaréchal
+    3. *Representations of quasi-Newton matrices and their use in limited memory
+       methods*, Richard H. Byrd, Jorge Nocedal, Robert B. Schnabel
+
+    :param jax.random.PRNGKey rng_key: random number generator seed.
+    :param model: Python callable containing Pyro :mod:`~numpyro.primitives`.
+    :param tuple model_args: args provided to the model.
+    :param dict model_kwargs: kwargs provided to the model.
+    :param int num_paths: number of independent optimization paths.
+    :param int num_draws: number of returned approximate posterior draws. The same
+        number of draws is taken from the approximation of each path before
+        resampling.
+    :param int max_iters: maximum number of L-BFGS iterations of each path.
+    :param int history_size: number of the most recent position and gradient
+        differences used to approximate the inverse Hessian.
+    :param int num_elbo_draws: number of draws used to estimate the ELBO of the
+        normal approximations along the paths.
+    :param int max_linesearch: maximum number of step size halvings in the
+        backtracking line search.
+    :param callable init_strategy: a per-site initialization function for the
+        starting points of the paths.
+        See :ref:`init_strategy` section for available functions.
+    :return: a :data:`PathfinderResult` namedtuple.
+    """
+    model_kwargs = {} if model_kwargs is None else model_kwargs
+    key_init, key_paths, key_draws, key_resample = random.split(rng_key, 4)
+    (init_params, *_), potential_fn, postprocess_fn, _ = initialize_model(
+        random.split(key_init, num_paths),
+        model,
+        init_strategy=init_strategy,
+        model_args=model_args,
+        model_kwargs=model_kwargs,
+    )
+    _, unravel_fn = ravel_pytree(tree_map(lambda x: x[0], init_params))
+    x = vmap(lambda z: ravel_pytree(z)[0])(init_params)
+
+    def flat_potential_fn(x):
+        return potential_fn(unravel_fn(x))
+
+    elbo, x, g, alpha, s, y = vmap(
+        partial(
+            _single_path,
+            flat_potential_fn,
+            max_iters=max_iters,
+            history_size=history_size,
+            num_elbo_draws=num_elbo_draws,
+            max_linesearch=max_linesearch,
+        )
+    )(random.split(key_paths, num_paths), x)
+    draws, log_prob = vmap(partial(_normal_approximation, num_draws=num_draws))(
+        random.split(key_draws, num_paths), x, g, alpha, s, y
+    )
+    draws = jnp.reshape(draws, (-1, jnp.shape(x)[-1]))
+    log_weights = -vmap(flat_potential_fn)(draws) - jnp.reshape(log_prob, -1)
+    log_weights = jnp.where(jnp.isnan(log_weights), -jnp.inf, log_weights)
+
+    idx = random.categorical(key_resample, log_weights, shape=(num_draws,))
+    samples = vmap(lambda x: postprocess_fn(unravel_fn(x)))(draws[idx])
+    weights = softmax(log_weights)
+    mean = jnp.dot(weights, draws)
+    variance = jnp.dot(weights, (draws - mean) ** 2)
+    inverse_mass_matrix = {tuple(sorted(init_params)): variance}
+    return PathfinderResult(samples, elbo, inverse_mass_matrix)
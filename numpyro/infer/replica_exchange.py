@@ -0,0 +1,379 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import namedtuple
+from contextlib import contextmanager
+import copy
+from functools import partial
+
+from jax import device_put, random, value_and_grad, vmap
+from jax.nn import softmax
+import jax.numpy as jnp
+from jax.tree_util import tree_map, tree_multimap
+
+from numpyro.infer.mcmc import MCMCKernel
+from numpyro.infer.sa import SA
+from numpyro.infer.util import potential_energy
+from numpyro.primitives import Messenger
+from numpyro.util import cond, identity
+
+ReplicaExchangeState = namedtuple(
+    "ReplicaExchangeState",
+    [
+        "i",
+        "z",
+        "replica_states",
+        "inverse_temperatures",
+        "ladder",
+        "swap_accept_prob",
+        "mean_swap_accept_prob",
+        "rng_key",
+    ],
+)
+"""
+A :func:`~collections.namedtuple` consisting of the following fields:
+
+ - **i** - iteration.
+ - **z** - Python collection representing values (unconstrained samples from
+   the posterior) at latent sites, i.e. the state of the untempered replica.
+ - **replica_states** - The states of the inner kernel, with a leading dimension
+   for the replicas, ordered from the coldest (untempered) to the hottest one.
+ - **inverse_temperatures** - The inverse temperatures of the replicas, starting
+   from 1.
+ - **ladder** - The unnormalized log spacings of the log temperatures, which
+   are adapted during warmup.
+ - **swap_accept_prob** - Acceptance probabilities of the swaps between each pair
+   of adjacent replicas. Only half of the pairs propose a swap at each iteration.
+ - **mean_swap_accept_prob** - Mean of ``swap_accept_prob`` until current iteration
+   during warmup adaptation or sampling (for diagnostics).
+ - **rng_key** - random number generator seed used for the iteration.
+"""
+
+# rate and lag of the decaying adaptation of the temperature ladder
+_LADDER_ADAPT_RATE = 0.01
+_LADDER_ADAPT_LAG = 1000.0
+
+
+class _temper(Messenger):
+    # scales the log density of the observed sites by `inverse_temperature`
+    def __init__(self, fn=None, inverse_temperature=1.0):
+        self.inverse_temperature = inverse_temperature
+        super().__init__(fn)
+
+    def process_message(self, msg):
+        if msg["type"] == "sample" and msg["is_observed"]:
+            msg["scale"] = (
+                self.inverse_temperature
+                if msg.get("scale") is None
+                else self.inverse_temperature * msg["scale"]
+            )
+
+
+class _TemperedModel(object):
+    # A model whose likelihood is tempered by the inverse temperature which is set
+    # while the inner kernel is traced for a replica. The inverse temperature is read
+    # each time the model is run, so the potential energy functions which are built
+    # once by the inner kernel evaluate the tempered model of the current replica.
+    def __init__(self, model):
+        self.model = model
+        self.inverse_temperature = 1.0
+
+    def __call__(self, *args, **kwargs):
+        with _temper(inverse_temperature=self.inverse_temperature):
+            return self.model(*args, **kwargs)
+
+    @contextmanager
+    def temper(self, inverse_temperature):
+        stored_inverse_temperature = self.inverse_temperature
+        self.inverse_temperature = inverse_temperature
+        try:
+            yield
+        finally:
+            self.inverse_temperature = stored_inverse_temperature
+
+
+class ReplicaExchange(MCMCKernel):
+    """
+    Replica exchange (parallel tempering) MCMC. The inner kernel is run on a ladder
+    of replicas whose likelihoods are tempered by inverse temperatures in
+    :math:`(0, 1]`, where the hotter replicas can move between the modes of a
+    multimodal posterior. After each step of the inner kernel, the states of
+    adjacent replicas are swapped with a Metropolis-Hastings test, alternating
+    between the even and the odd pairs at each iteration. The replicas are
+    vectorized with :func:`jax.vmap` on one device.
+
+    During warmup, the temperature ladder (with fixed highest temperature
+    `max_temperature`) is adapted so that the swap acceptance probabilities of all
+    adjacent pairs become equal. The inner kernel adapts its own parameters (e.g.
+    the step size and the mass matrix) separately for each replica.
+
+    .. note:: The samples are drawn from the untempered replica, so the returned
+        samples follow the posterior. The prior needs to be proper, and the inner
+        kernel needs to be constructed with a `model`, which it runs as its
+        `_model` attribute. The swaps update the ``potential_energy`` (and
+        ``z_grad`` if any) fields of the inner kernel states, so the states must
+        have a ``potential_energy`` field. Hence :class:`~numpyro.infer.sa.SA`,
+        whose state holds an ensemble of potential energies, and the Gibbs kernels
+        such as :class:`~numpyro.infer.hmc_gibbs.HMCGibbs`, which run the model of
+        their own inner kernel, are not supported.
+
+    **References:**
+
+    1. *Parallel tempering: Theory, applications, and new perspectives*,
+       David J. Earl, Michael W. Deem
+    2. *Dynamic temperature selection for parallel tempering in Markov chain
+       Monte Carlo simulations*, W. D. Vousden, W. M. Farr, I. Mandel
+    3. *Non-reversible parallel tempering: a scalable highly parallel MCMC scheme*,
+       Saifuddin Syed, Alexandre Bouchard-Côté, George Deligiannidis, Arnaud Doucet
+
+    :param inner_kernel: an :class:`~numpyro.infer.mcmc.MCMCKernel` constructed with
+        a `model`, e.g. :class:`~numpyro.infer.hmc.NUTS`.
+    :param int num_temperatures: number of replicas. Defaults to 8.
+    :param float max_temperature: temperature of the hottest replica. Defaults to
+        100.
+    :param bool adapt_temperatures: whether to adapt the temperature ladder during
+        warmup. Defaults to True.
+
+    **Example**
+
+    .. doctest::
+
+        >>> from jax import random
+        >>> import jax.numpy as jnp
+        >>> import numpyro
+        >>> import numpyro.distributions as dist
+        >>> from numpyro.infer import MCMC, NUTS, ReplicaExchange
+        ...
+        >>> def model():
+        ...     x = numpyro.sample("x", dist.Normal(0.0, 10.0))
+        ...     mixture = dist.Normal(jnp.array([-5.0, 5.0]), 0.5).log_prob(x)
+        ...     numpyro.factor("obs", jnp.logaddexp(mixture[0], mixture[1]))
+        ...
+        >>> kernel = ReplicaExchange(NUTS(model))
+        >>> mcmc = MCMC(kernel, num_warmup=1000, num_samples=1000, progress_bar=False)
+        >>> mcmc.run(random.PRNGKey(0))
+        >>> samples = mcmc.get_samples()
+        >>> print(jnp.mean(samples["x"] > 0))  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        inner_kernel,
+        num_temperatures=8,
+        max_temperature=100.0,
+        adapt_temperatures=True,
+    ):
+        if isinstance(inner_kernel, SA):
+            raise ValueError("ReplicaExchange does not support the SA kernel.")
+        if inner_kernel.model is None:
+            raise ValueError(
+                "ReplicaExchange does not support models specified via a potential"
+                " function."
+            )
+        if num_temperatures < 2:
+            raise ValueError("`num_temperatures` must be at least 2.")
+        if max_temperature <= 1:
+            raise ValueError("`max_temperature` must be larger than 1.")
+        self.inner_kernel = copy.copy(inner_kernel)
+        self._tempered_model = _TemperedModel(inner_kernel.model)
+        self.inner_kernel._model = self._tempered_model
+        if self.inner_kernel.model is not self._tempered_model:
+            raise ValueError(
+                "ReplicaExchange tempers the `_model` attribute of the inner kernel,"
+                " which {} does not run.".format(type(inner_kernel).__name__)
+            )
+        self._num_temperatures = num_temperatures
+        self._max_temperature = max_temperature
+        self._adapt_temperatures = adapt_temperatures
+        self._num_warmup = 0
+        self._sample_fn = None
+
+    @property
+    def model(self):
+        return self.inner_kernel._model
+
+    @property
+    def sample_field(self):
+        return "z"
+
+    def get_diagnostics_str(self, state):
+        return "min. swap acc. prob={:.2f}".format(jnp.min(state.mean_swap_accept_prob))
+
+    def postprocess_fn(self, args, kwargs):
+        return self.inner_kernel.postprocess_fn(args, kwargs)
+
+    def _inverse_temperatures(self, ladder):
+        log_spacings = jnp.log(self._max_temperature) * softmax(ladder)
+        log_temperatures = jnp.concatenate(
+            [jnp.zeros(1), jnp.cumsum(log_spacings)], axis=0
+        )
+        return jnp.exp(-log_temperatures)
+
+    def _potential_energy(self, inverse_temperature, model_args, model_kwargs, z):
+        with self._tempered_model.temper(inverse_temperature):
+            return potential_energy(self._tempered_model, model_args, model_kwargs, z)
+
+    def _init_one(self, rng_key, num_warmup, init_params, model_args, model_kwargs):
+        rng_key, rng_key_replicas = random.split(rng_key)
+        ladder = jnp.zeros(self._num_temperatures - 1)
+        inverse_temperatures = self._inverse_temperatures(ladder)
+
+        def init_replica(rng_key, inverse_temperature):
+            with self._tempered_model.temper(inverse_temperature):
+                return self.inner_kernel.init(
+                    rng_key, num_warmup, init_params, model_args, model_kwargs
+                )
+
+        replica_states = vmap(init_replica)(
+            random.split(rng_key_replicas, self._num_temperatures),
+            inverse_temperatures,
+        )
+        if "potential_energy" not in getattr(replica_states, "_fields", ()):
+            raise ValueError(
+                "ReplicaExchange requires the states of the inner kernel to have"
+                " a `potential_energy` field, which the states of {} do not"
+                " have.".format(type(self.inner_kernel).__name__)
+            )
+        z = getattr(replica_states, self.inner_kernel.sample_field)
+        swap_accept_prob = jnp.zeros(self._num_temperatures - 1)
+        return ReplicaExchangeState(
+            jnp.array(0),
+            tree_map(lambda x: x[0], z),
+            replica_states,
+            inverse_temperatures,
+            ladder,
+            swap_accept_prob,
+            swap_accept_prob,
+            rng_key,
+        )
+
+    def init(self, rng_key, num_warmup, init_params, model_args, model_kwargs):
+        self._num_warmup = num_warmup
+        model_kwargs = {} if model_kwargs is None else model_kwargs
+        init_fn = partial(
+            self._init_one,
+            num_warmup=num_warmup,
+            model_args=model_args,
+            model_kwargs=model_kwargs,
+        )
+        if rng_key.ndim == 1:
+            init_state = init_fn(rng_key, init_params=init_params)
+            self._sample_fn = self._sample_one
+        else:
+            init_state = vmap(
+                lambda rng_key, init_params: init_fn(rng_key, init_params=init_params)
+            )(rng_key, init_params)
+            self._sample_fn = vmap(self._sample_one, in_axes=(0, None, None))
+        return device_put(init_state)
+
+    def _sample_one(self, state, model_args, model_kwargs):
+        rng_key, rng_key_replicas, rng_key_swap = random.split(state.rng_key, 3)
+
+        def sample_replica(replica_state, inverse_temperature):
+            with self._tempered_model.temper(inverse_temperature):
+                return self.inner_kernel.sample(replica_state, model_args, model_kwargs)
+
+        replica_states = vmap(sample_replica)(
+            state.replica_states, state.inverse_temperatures
+        )
+
+        # the tempered potential energy is linear in the inverse temperature:
+        # prior_pe - inverse_temperature * log_likelihood
+        z = getattr(replica_states, self.inner_kernel.sample_field)
+        prior_pe, prior_pe_grad = vmap(
+            value_and_grad(
+                partial(self._potential_energy, 0.0, model_args, model_kwargs)
+            )
+        )(z)
+        pe, pe_grad = vmap(
+            value_and_grad(
+                partial(self._potential_energy, 1.0, model_args, model_kwargs)
+            )
+        )(z)
+        log_lik = prior_pe - pe
+        log_lik_grad = tree_multimap(lambda x, y: x - y, prior_pe_grad, pe_grad)
+
+        # swap the states of the even or odd pairs of adjacent replicas
+        beta = state.inverse_temperatures
+        log_accept_ratio = (beta[:-1] - beta[1:]) * (log_lik[1:] - log_lik[:-1])
+        log_accept_ratio = jnp.where(
+            jnp.isnan(log_accept_ratio), -jnp.inf, log_accept_ratio
+        )
+        swap_accept_prob = jnp.exp(jnp.minimum(log_accept_ratio, 0.0))
+        pair_idx = jnp.arange(self._num_temperatures - 1)
+        is_swapped = (pair_idx % 2 == state.i % 2) & random.bernoulli(
+            rng_key_swap, swap_accept_prob
+        )
+        idx = jnp.arange(self._num_temperatures)
+        idx = jnp.where(
+            jnp.concatenate([is_swapped, jnp.array([False])]),
+            idx + 1,
+            jnp.where(jnp.concatenate([jnp.array([False]), is_swapped]), idx - 1, idx),
+        )
+        z, prior_pe, prior_pe_grad, log_lik, log_lik_grad = tree_map(
+            lambda x: x[idx], (z, prior_pe, prior_pe_grad, log_lik, log_lik_grad)
+        )
+
+        # adapt the temperature ladder to equalize the swap acceptance probabilities
+        ladder = state.ladder
+        if self._adapt_temperatures:
+            rate = (
+                _LADDER_ADAPT_RATE
+                * _LADDER_ADAPT_LAG
+                / (state.i + 1 + _LADDER_ADAPT_LAG)
+            )
+            ladder = cond(
+                state.i < self._num_warmup,
+                ladder,
+                lambda x: x + rate * (swap_accept_prob - jnp.mean(swap_accept_prob)),
+                ladder,
+                identity,
+            )
+        beta = self._inverse_temperatures(ladder)
+
+        # update the cached potential energies (and their gradients) of the inner
+        # kernel states after the swaps and the change of the temperature ladder
+        fields = {
+            self.inner_kernel.sample_field: z,
+            "potential_energy": prior_pe - beta * log_lik,
+        }
+        if "z_grad" in replica_states._fields:
+            fields["z_grad"] = vmap(
+                lambda g, h, b: tree_multimap(lambda x, y: x - b * y, g, h)
+            )(prior_pe_grad, log_lik_grad, beta)
+        replica_states = replica_states._replace(**fields)
+
+        itr = state.i + 1
+        n = jnp.where(state.i < self._num_warmup, itr, itr - self._num_warmup)
+        mean_swap_accept_prob = (
+            state.mean_swap_accept_prob
+            + (swap_accept_prob - state.mean_swap_accept_prob) / n
+        )
+        return ReplicaExchangeState(
+            itr,
+            tree_map(lambda x: x[0], z),
+            replica_states,
+            beta,
+            ladder,
+            swap_accept_prob,
+            mean_swap_accept_prob,
+            rng_key,
+        )
+
+    def sample(self, state, model_args, model_kwargs):
+        """
+        Run the inner kernel on each replica followed by the swap moves, starting
+        from the given :data:`ReplicaExchangeState`.
+
+        :param ReplicaExchangeState state: Represents the current state.
+        :param model_args: Arguments provided to the model.
+        :param model_kwargs: Keyword arguments provided to the model.
+        :return: Next `state`.
+        """
+        model_kwargs = {} if model_kwargs is None else model_kwargs
+        return self._sample_fn(state, model_args, model_kwargs)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_sample_fn"] = None
+        return state
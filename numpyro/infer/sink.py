@@ -0,0 +1,190 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+from abc import ABC, abstractmethod
+import os
+
+import numpy as np
+
+from jax import device_get
+from jax.tree_util import tree_flatten, tree_unflatten
+
+__all__ = [
+    "SampleSink",
+    "HostSink",
+    "NpySink",
+]
+
+
+def _leaf_names(x):
+    # use site names for the common case of a flat dict of arrays,
+    # otherwise fall back to the position of each leaf in the flattened pytree
+    leaves, _ = tree_flatten(x)
+    if isinstance(x, dict) and len(leaves) == len(x):
+        return [str(k) for k in sorted(x)]
+    return [str(i) for i in range(len(leaves))]
+
+
+class SampleSink(ABC):
+    """
+    Defines the interface of a destination for the draws collected by
+    :meth:`MCMC.run() <numpyro.infer.mcmc.MCMC.run>`. When a sink is provided,
+    MCMC runs the sampling phase in blocks of `block_size` draws per chain and
+    hands each (post-processed) block to the sink, so that only one block of
+    draws needs to be held on device at any time.
+
+    Subclasses need to implement :meth:`_allocate`, which returns a writable
+    array-like buffer for a single leaf of the collected states.
+
+    :param int block_size: Number of draws (after thinning) per chain in each
+        block. Defaults to 1000.
+    """
+
+    def __init__(self, block_size=1000):
+        if not isinstance(block_size, int) or block_size < 1:
+            raise ValueError("block_size must be a positive integer")
+        self.block_size = block_size
+        self._num_chains = None
+        self._num_draws = None
+        self._buffers = None
+        self._treedef = None
+
+    def initialize(self, num_chains, num_draws):
+        """
+        Prepares the sink to receive `num_draws` draws for each of `num_chains`
+        chains. Any content from a previous run is discarded.
+
+        :param int num_chains: Number of chains.
+        :param int num_draws: Number of draws per chain.
+        """
+        self._num_chains = num_chains
+        self._num_draws = num_draws
+        self._buffers = None
+        self._treedef = None
+
+    @abstractmethod
+    def _allocate(self, field, name, shape, dtype):
+        """
+        Allocates a buffer to store the draws of a leaf of the collected states.
+
+        :param str field: Name of the collected field, e.g. `"z"` or `"diverging"`.
+        :param str name: Name of the leaf within `field`.
+        :param tuple shape: Shape of the buffer, which is
+            `(num_chains, num_draws) + leaf_shape`.
+        :param dtype: Data type of the buffer.
+        :return: a writable array-like buffer.
+        """
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def write(self, states, start):
+        """
+        Writes a block of draws to the sink.
+
+        :param dict states: A dict mapping collected fields to pytrees of arrays,
+            each having shape `(num_chains, block_size) + leaf_shape`.
+        :param int start: Index of the first draw of the block.
+        """
+        if self._num_chains is None:
+            raise RuntimeError("`initialize` must be called before `write`.")
+        leaves, treedef = tree_flatten(states)
+        if self._buffers is None:
+            self._treedef = treedef
+            self._buffers = []
+            for field in sorted(states):
+                value = states[field]
+                for name, leaf in zip(_leaf_names(value), tree_flatten(value)[0]):
+                    shape = (self._num_chains, self._num_draws) + np.shape(leaf)[2:]
+                    self._buffers.append(
+                        self._allocate(field, name, shape, np.result_type(leaf))
+                    )
+        assert treedef == self._treedef
+        for buffer, leaf in zip(self._buffers, device_get(leaves)):
+            buffer[:, start : start + np.shape(leaf)[1]] = leaf
+        self._flush()
+
+    def read(self):
+        """
+        Returns the collected draws grouped by chain.
+
+        :return: a dict mapping collected fields to pytrees of arrays, each having
+            shape `(num_chains, num_draws) + leaf_shape`.
+        """
+        if self._buffers is None:
+            return None
+        return tree_unflatten(self._treedef, self._buffers)
+
+
+class HostSink(SampleSink):
+    """
+    Collects the draws into preallocated :class:`numpy.ndarray` buffers in host
+    memory.
+
+    :param int block_size: Number of draws (after thinning) per chain in each
+        block. Defaults to 1000.
+    """
+
+    def _allocate(self, field, name, shape, dtype):
+        return np.empty(shape, dtype=dtype)
+
+
+class NpySink(SampleSink):
+    """
+    Spills the collected draws to memory-mapped ``.npy`` files in a directory.
+    Each leaf of a collected field is stored at ``<path>/<field>/<name>.npy``,
+    where ``name`` is the site name if the field is a dict of arrays (e.g. the
+    latent samples of a model) and the position of the leaf otherwise.
+
+    After the run, :meth:`MCMC.get_samples() <numpyro.infer.mcmc.MCMC.get_samples>`
+    returns read-only :class:`numpy.memmap` arrays which are lazily loaded from disk.
+
+    **Example:**
+
+    .. code-block:: python
+
+        mcmc = MCMC(NUTS(model), num_warmup=1000, num_samples=10000, num_chains=8)
+        mcmc.run(random.PRNGKey(0), data, sink=NpySink("/tmp/draws", block_size=500))
+        samples = mcmc.get_samples(group_by_chain=True)  # memory-mapped arrays
+
+    :param str path: The directory to store the draws. It will be created if it
+        does not exist; existing files of the same name will be overwritten.
+    :param int block_size: Number of draws (after thinning) per chain in each
+        block. Defaults to 1000.
+    """
+
+    def __init__(self, path, block_size=1000):
+        super().__init__(block_size=block_size)
+        self.path = path
+
+    def _allocate(self, field, name, shape, dtype):
+        field_dir = os.path.join(self.path, field)
+        os.makedirs(field_dir, exist_ok=True)
+        return np.lib.format.open_memmap(
+            os.path.join(field_dir, name + ".npy"), mode="w+", dtype=dtype, shape=shape
+        )
+
+    def _flush(self):
+        for buffer in self._buffers:
+            buffer.flush()
+
+    def read(self):
+        if self._buffers is None:
+            return None
+        buffers = [np.load(buffer.filename, mmap_mode="r") for buffer in self._buffers]
+        return tree_unflatten(self._treedef, buffers)
+
+    def __getstate__(self):
+        # do not pickle the content of the memory-mapped files
+        state = self.__dict__.copy()
+        if self._buffers is not None:
+            state["_buffers"] = [buffer.filename for buffer in self._buffers]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._buffers is not None:
+            self._buffers = [
+                np.load(filename, mmap_mode="r+") for filename in self._buffers
+            ]
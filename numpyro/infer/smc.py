@@ -0,0 +1,448 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import namedtuple
+import math
+
+from jax import device_get, jit, random, vmap
+from jax.flatten_util import ravel_pytree
+from jax.nn import softmax
+import jax.numpy as jnp
+from jax.scipy.special import logsumexp
+from jax.tree_util import tree_map
+
+from numpyro.handlers import block
+from numpyro.infer.hmc import hmc
+from numpyro.infer.initialization import init_to_sample
+from numpyro.infer.util import initialize_model
+from numpyro.util import fori_loop, tqdm_auto
+
+SMCState = namedtuple(
+    "SMCState",
+    [
+        "i",
+        "z",
+        "log_likelihood",
+        "inverse_temperature",
+        "log_marginal_likelihood",
+        "step_size",
+        "accept_prob",
+        "rng_key",
+    ],
+)
+"""
+A :func:`~collections.namedtuple` consisting of the following fields:
+
+ - **i** - number of tempering stages.
+ - **z** - Python collection representing values (unconstrained samples from
+   the tempered posterior) at latent sites, with a leading dimension for the
+   particles.
+ - **log_likelihood** - Log likelihood of the particles.
+ - **inverse_temperature** - Current inverse temperature, which increases from 0
+   (the prior) to 1 (the posterior).
+ - **log_marginal_likelihood** - Estimate of the log normalizing constant of the
+   tempered posterior, which is the log marginal likelihood of the model when the
+   inverse temperature reaches 1.
+ - **step_size** - Step size of the move kernel for the next stage.
+ - **accept_prob** - Mean acceptance probability of the moves of the last stage.
+ - **rng_key** - random number generator seed used for the next stage.
+"""
+
+
+def _is_observed(msg):
+    return msg["type"] == "sample" and msg["is_observed"]
+
+
+def _effective_sample_size(log_weights):
+    return jnp.exp(2 * logsumexp(log_weights) - logsumexp(2 * log_weights))
+
+
+def _next_inverse_temperature(inverse_temperature, log_likelihood, target_ess):
+    # bisection search for the largest increment of the inverse temperature whose
+    # incremental weights have an effective sample size of at least `target_ess`
+    def body_fn(i, val):
+        low, high = val
+        mid = 0.5 * (low + high)
+        is_valid = _effective_sample_size(mid * log_likelihood) >= target_ess
+        return jnp.where(is_valid, mid, low), jnp.where(is_valid, high, mid)
+
+    max_delta = 1.0 - inverse_temperature
+    _, delta = fori_loop(0, 50, body_fn, (jnp.zeros(()), max_delta))
+    delta = jnp.where(
+        _effective_sample_size(max_delta * log_likelihood) >= target_ess,
+        max_delta,
+        delta,
+    )
+    return inverse_temperature + delta
+
+
+def _systematic_resample(rng_key, log_weights):
+    num_particles = log_weights.shape[0]
+    cdf = jnp.cumsum(softmax(log_weights))
+    u = (random.uniform(rng_key) + jnp.arange(num_particles)) / num_particles
+    return jnp.minimum(jnp.searchsorted(cdf, u), num_particles - 1)
+
+
+class SMC(object):
+    """
+    Sequential Monte Carlo sampler with adaptive likelihood tempering. A population
+    of particles drawn from the prior is moved to the posterior through a sequence
+    of tempered posteriors :math:`p(z) p(y | z)^\\beta`, where the next inverse
+    temperature :math:`\\beta` is chosen so that the effective sample size of the
+    incremental importance weights equals `target_ess`. At each stage, the particles
+    are reweighted, resampled with systematic resampling and moved with
+    `num_mcmc_steps` steps of an MCMC kernel which targets the current tempered
+    posterior. The moves are vectorized over the particles with :func:`jax.vmap`,
+    so thousands of particles can be run in parallel on the cores of a device.
+
+    The mass matrix of the move kernel is the diagonal of the variance of the
+    particles, and its step size is adapted between the stages towards
+    `target_accept_prob`. The product of the mean incremental weights gives an
+    unbiased estimate of the marginal likelihood of the model.
+
+    .. note:: The particles are initialized by sampling from the prior, so all
+        latent sites need proper priors. Observed sites and factors are treated
+        as the likelihood.
+
+    **References:**
+
+    1. *Sequential Monte Carlo samplers*,
+       Pierre Del Moral, Arnaud Doucet, Ajay Jasra
+    2. *On adaptive resampling strategies for sequential Monte Carlo methods*,
+       Pierre Del Moral, Arnaud Doucet, Ajay Jasra
+    3. *An Introduction to Sequential Monte Carlo*,
+       Nicolas Chopin, Omiros Papaspiliopoulos
+
+    :param model: Python callable containing Pyro :mod:`~numpyro.primitives`.
+    :param int num_particles: Number of particles. Defaults to 1000.
+    :param str kernel: The MCMC kernel used to move the particles, either ``"hmc"``
+        (Hamiltonian Monte Carlo, see :func:`~numpyro.infer.hmc.hmc`) or ``"rwm"``
+        (Gaussian random walk Metropolis). Defaults to ``"hmc"``.
+    :param int num_mcmc_steps: Number of MCMC steps at each stage. Defaults to 5.
+    :param int num_steps: Number of leapfrog steps of each HMC trajectory. Defaults
+        to 10. This argument is ignored by the ``"rwm"`` kernel.
+    :param float step_size: Initial step size of the HMC integrator or initial
+        scale of the random walk proposal, relative to the standard deviation of the
+        particles. Defaults to 0.5 for ``"hmc"`` and :math:`2.38 / \\sqrt{d}` for
+        ``"rwm"``, where :math:`d` is the dimension of the latent space.
+    :param float target_ess: Target effective sample size of the incremental
+        weights, as a fraction of `num_particles`. Defaults to 0.5.
+    :param float target_accept_prob: Target acceptance probability for the step size
+        adaptation. Defaults to 0.65 for ``"hmc"`` and 0.234 for ``"rwm"``.
+
+    **Example**
+
+    .. doctest::
+
+        >>> from jax import random
+        >>> import jax.numpy as jnp
+        >>> import numpyro
+        >>> import numpyro.distributions as dist
+        >>> from numpyro.infer import SMC
+        ...
+        >>> def model(data):
+        ...     loc = numpyro.sample("loc", dist.Normal(0.0, 10.0))
+        ...     with numpyro.plate("N", data.shape[0]):
+        ...         numpyro.sample("obs", dist.Normal(loc, 1.0), obs=data)
+        ...
+        >>> data = 3.0 + random.normal(random.PRNGKey(0), (100,))
+        >>> smc = SMC(model, num_particles=2000)
+        >>> smc.run(random.PRNGKey(1), data, progress_bar=False)
+        >>> samples = smc.get_samples()
+        >>> log_evidence = smc.log_marginal_likelihood
+    """
+
+    def __init__(
+        self,
+        model,
+        num_particles=1000,
+        *,
+        kernel="hmc",
+        num_mcmc_steps=5,
+        num_steps=10,
+        step_size=None,
+        target_ess=0.5,
+        target_accept_prob=None,
+    ):
+        if kernel not in ("hmc", "rwm"):
+            raise ValueError("`kernel` must be one of 'hmc' or 'rwm'.")
+        if not 0 < target_ess < 1:
+            raise ValueError("`target_ess` must be in the interval (0, 1).")
+        self.model = model
+        self.num_particles = num_particles
+        self.kernel = kernel
+        self.num_mcmc_steps = num_mcmc_steps
+        self.num_steps = num_steps
+        self.step_size = step_size
+        self.target_ess = target_ess
+        if target_accept_prob is None:
+            target_accept_prob = 0.65 if kernel == "hmc" else 0.234
+        self.target_accept_prob = target_accept_prob
+        self._prior_potential_fn_gen = None
+        self._potential_fn_gen = None
+        self._postprocess_fn = None
+        self._inverse_temperatures = None
+        self._last_state = None
+
+    def _tempered_potential_fn_gen(self, prior_potential_fn, potential_fn):
+        # the tempered potential energy is linear in the inverse temperature
+        def potential_fn_gen(inverse_temperature):
+            def tempered_potential_fn(z):
+                return (1 - inverse_temperature) * prior_potential_fn(
+                    z
+                ) + inverse_temperature * potential_fn(z)
+
+            return tempered_potential_fn
+
+        return potential_fn_gen
+
+    def _log_likelihood(self, prior_potential_fn, potential_fn, z):
+        log_likelihood = vmap(prior_potential_fn)(z) - vmap(potential_fn)(z)
+        return jnp.where(jnp.isnan(log_likelihood), -jnp.inf, log_likelihood)
+
+    def _hmc_move(
+        self, potential_fn_gen, inverse_temperature, step_size, scale, rng_key, z
+    ):
+        init_kernel, sample_kernel = hmc(potential_fn_gen=potential_fn_gen, algo="HMC")
+        model_args = (inverse_temperature,)
+
+        def move_fn(rng_key, z):
+            hmc_state = init_kernel(
+                z,
+                0,
+                step_size=step_size,
+                inverse_mass_matrix=scale ** 2,
+                adapt_step_size=False,
+                adapt_mass_matrix=False,
+                trajectory_length=step_size * self.num_steps,
+                model_args=model_args,
+                rng_key=rng_key,
+            )
+            hmc_state = fori_loop(
+                0,
+                self.num_mcmc_steps,
+                lambda i, val: sample_kernel(val, model_args=model_args),
+                hmc_state,
+            )
+            return hmc_state.z, hmc_state.mean_accept_prob
+
+        return vmap(move_fn)(random.split(rng_key, self.num_particles), z)
+
+    def _rwm_move(
+        self, potential_fn_gen, inverse_temperature, step_size, scale, rng_key, z
+    ):
+        potential_fn = potential_fn_gen(inverse_temperature)
+
+        def move_fn(rng_key, z):
+            z_flat, unravel_fn = ravel_pytree(z)
+
+            def body_fn(i, val):
+                z_flat, pe, accept_prob_sum, rng_key = val
+                rng_key, key_proposal, key_accept = random.split(rng_key, 3)
+                z_flat_new = z_flat + step_size * scale * random.normal(
+                    key_proposal, z_flat.shape
+                )
+                pe_new = potential_fn(unravel_fn(z_flat_new))
+                pe_new = jnp.where(jnp.isnan(pe_new), jnp.inf, pe_new)
+                accept_prob = jnp.clip(jnp.exp(pe - pe_new), a_max=1.0)
+                is_accepted = random.bernoulli(key_accept, accept_prob)
+                z_flat, pe = tree_map(
+                    lambda x, y: jnp.where(is_accepted, x, y),
+                    (z_flat_new, pe_new),
+                    (z_flat, pe),
+                )
+                return z_flat, pe, accept_prob_sum + accept_prob, rng_key
+
+            z_flat, _, accept_prob_sum, _ = fori_loop(
+                0,
+                self.num_mcmc_steps,
+                body_fn,
+                (z_flat, potential_fn(z), jnp.zeros(()), rng_key),
+            )
+            return unravel_fn(z_flat), accept_prob_sum / self.num_mcmc_steps
+
+        return vmap(move_fn)(random.split(rng_key, self.num_particles), z)
+
+    def init(self, rng_key, *args, **kwargs):
+        """
+        Draws the particles from the prior.
+
+        :param jax.random.PRNGKey rng_key: random number generator seed.
+        :param args: arguments to the model.
+        :param kwargs: keyword arguments to the model.
+        :return: the initial :data:`SMCState`.
+        """
+        rng_key, rng_key_init, rng_key_particles = random.split(rng_key, 3)
+        (z, _, _), prior_potential_fn_gen, _, _ = initialize_model(
+            random.split(rng_key_particles, self.num_particles),
+            block(self.model, hide_fn=_is_observed),
+            init_strategy=init_to_sample,
+            dynamic_args=True,
+            model_args=args,
+            model_kwargs=kwargs,
+        )
+        _, potential_fn_gen, postprocess_fn_gen, _ = initialize_model(
+            rng_key_init,
+            self.model,
+            init_strategy=init_to_sample,
+            dynamic_args=True,
+            model_args=args,
+            model_kwargs=kwargs,
+        )
+        self._prior_potential_fn_gen = prior_potential_fn_gen
+        self._potential_fn_gen = potential_fn_gen
+        self._postprocess_fn = postprocess_fn_gen(*args, **kwargs)
+
+        log_likelihood = self._log_likelihood(
+            prior_potential_fn_gen(*args, **kwargs),
+            potential_fn_gen(*args, **kwargs),
+            z,
+        )
+        step_size = self.step_size
+        if step_size is None:
+            dim = jnp.size(ravel_pytree(tree_map(lambda x: x[0], z))[0])
+            step_size = 0.5 if self.kernel == "hmc" else 2.38 / max(dim, 1) ** 0.5
+        return SMCState(
+            jnp.array(0),
+            z,
+            log_likelihood,
+            jnp.zeros(()),
+            jnp.zeros(()),
+            jnp.array(step_size, dtype=jnp.result_type(float)),
+            jnp.zeros(()),
+            rng_key,
+        )
+
+    def update(self, state, *args, **kwargs):
+        """
+        Runs a tempering stage: increases the inverse temperature, then reweights,
+        resamples and moves the particles.
+
+        :param SMCState state: current state.
+        :param args: arguments to the model.
+        :param kwargs: keyword arguments to the model.
+        :return: the next :data:`SMCState`.
+        """
+        rng_key, rng_key_resample, rng_key_move = random.split(state.rng_key, 3)
+        prior_potential_fn = self._prior_potential_fn_gen(*args, **kwargs)
+        potential_fn = self._potential_fn_gen(*args, **kwargs)
+
+        inverse_temperature = _next_inverse_temperature(
+            state.inverse_temperature,
+            state.log_likelihood,
+            self.target_ess * self.num_particles,
+        )
+        log_weights = (inverse_temperature - state.inverse_temperature) * (
+            state.log_likelihood
+        )
+        log_marginal_likelihood = (
+            state.log_marginal_likelihood
+            + logsumexp(log_weights)
+            - jnp.log(self.num_particles)
+        )
+        idx = _systematic_resample(rng_key_resample, log_weights)
+        z = tree_map(lambda x: x[idx], state.z)
+
+        scale = jnp.std(vmap(lambda z: ravel_pytree(z)[0])(z), axis=0)
+        move = self._hmc_move if self.kernel == "hmc" else self._rwm_move
+        z, accept_prob = move(
+            self._tempered_potential_fn_gen(prior_potential_fn, potential_fn),
+            inverse_temperature,
+            state.step_size,
+            scale,
+            rng_key_move,
+            z,
+        )
+        accept_prob = jnp.mean(accept_prob)
+        step_size = state.step_size * jnp.exp(accept_prob - self.target_accept_prob)
+        log_likelihood = self._log_likelihood(prior_potential_fn, potential_fn, z)
+        return SMCState(
+            state.i + 1,
+            z,
+            log_likelihood,
+            inverse_temperature,
+            log_marginal_likelihood,
+            step_size,
+            accept_prob,
+            rng_key,
+        )
+
+    def run(self, rng_key, *args, progress_bar=True, **kwargs):
+        """
+        Runs the tempering stages until the inverse temperature reaches 1. The
+        particles can then be retrieved with :meth:`get_samples`. A `RuntimeError`
+        is raised if a stage cannot increase the inverse temperature, e.g. when the
+        log likelihood of all particles is not finite.
+
+        :param jax.random.PRNGKey rng_key: random number generator seed.
+        :param args: arguments to the model.
+        :param bool progress_bar: Whether to enable progress bar updates. Defaults to
+            ``True``.
+        :param kwargs: keyword arguments to the model.
+        """
+
+        def body_fn(state):
+            return self.update(state, *args, **kwargs)
+
+        update_fn = jit(body_fn)
+        state = self.init(rng_key, *args, **kwargs)
+        # only the temperatures of the previous stages are kept
+        inverse_temperatures = [0.0]
+        with tqdm_auto(disable=not progress_bar) as t:
+            while inverse_temperatures[-1] < 1:
+                state = update_fn(state)
+                inverse_temperature, log_marginal_likelihood = device_get(
+                    (state.inverse_temperature, state.log_marginal_likelihood)
+                )
+                if not (
+                    inverse_temperature > inverse_temperatures[-1]
+                    and math.isfinite(log_marginal_likelihood)
+                ):
+                    raise RuntimeError(
+                        "SMC cannot increase the inverse temperature from {}; check"
+                        " that the log likelihood of the particles is finite.".format(
+                            inverse_temperatures[-1]
+                        )
+                    )
+                inverse_temperatures.append(float(inverse_temperature))
+                t.update()
+                t.set_postfix_str(
+                    "inv. temperature: {:.4f}, acc. prob: {:.2f}".format(
+                        inverse_temperature, state.accept_prob
+                    ),
+                    refresh=False,
+                )
+        self._inverse_temperatures = inverse_temperatures
+        self._last_state = state
+
+    @property
+    def last_state(self):
+        """
+        The final :data:`SMCState` of the last run.
+        """
+        return self._last_state
+
+    @property
+    def inverse_temperatures(self):
+        """
+        The inverse temperatures of the stages of the last run, starting from 0.
+        """
+        return jnp.array(self._inverse_temperatures)
+
+    @property
+    def log_marginal_likelihood(self):
+        """
+        Estimate of the log marginal likelihood of the model from the last run.
+        """
+        return self.last_state.log_marginal_likelihood
+
+    def get_samples(self):
+        """
+        Get the particles of the last run, which are approximately distributed as
+        the posterior, at the latent sites and the deterministic sites of the model.
+
+        :return: a dict keyed on site names, with the particles stacked along the
+            leading dimension.
+        :rtype: dict
+        """
+        return vmap(self._postprocess_fn)(self.last_state.z)
@@ -14,7 +14,12 @@ from jax.tree_util import tree_map
 from numpyro.distributions import constraints
 from numpyro.distributions.transforms import biject_to
 from numpyro.handlers import replay, seed, trace
-from numpyro.infer.util import helpful_support_errors, transform_fn
+from numpyro.infer.util import (
+    CompiledRun,
+    _aot_compile,
+    helpful_support_errors,
+    transform_fn,
+)
 from numpyro.optim import _NumPyroOptim
 
 SVIState = namedtuple("SVIState", ["optim_state", "mutable_state", "rng_key"])
@@ -350,6 +355,51 @@ class SVI(object):
         # optimizer's state and mutable state.
         return SVIRunResult(self.get_params(svi_state), svi_state, losses)
 
+    def compile(self, rng_key, num_steps, *args, stable_update=False, **kwargs):
+        """
+        (EXPERIMENTAL INTERFACE) Lowers and compiles the initialization and the
+        `num_steps` optimization steps of :meth:`run` (with `progress_bar=False`)
+        ahead of time, without running them. The returned handle reports the compile
+        time and the FLOP and memory estimates of the XLA compiler, and its
+        :meth:`~numpyro.infer.util.CompiledRun.run` method runs the compiled program
+        without tracing it again::
+
+            compiled = svi.compile(random.PRNGKey(0), 2000, data)
+            print(compiled.compile_time, compiled.flops, compiled.memory_bytes)
+            svi_result = compiled.run(random.PRNGKey(1), data)
+
+        `compiled.run(rng_key, *args, **kwargs)` returns a :data:`SVIRunResult` as
+        :meth:`run` does. The arguments must have the same shapes and dtypes as the
+        ones given to :meth:`compile`; arguments which determine the structure of the
+        model should be passed as `static_kwargs` of :class:`SVI`.
+
+        :param jax.random.PRNGKey rng_key: random number generator seed.
+        :param int num_steps: the number of optimization steps.
+        :param args: arguments to the model / guide
+        :param bool stable_update: whether to use :meth:`stable_update` to update
+            the state. Defaults to False.
+        :param kwargs: keyword arguments to the model / guide
+        :return: the compiled program.
+        :rtype: ~numpyro.infer.util.CompiledRun
+        """
+
+        def run_fn(rng_key, args, kwargs):
+            def body_fn(svi_state, _):
+                if stable_update:
+                    return self.stable_update(svi_state, *args, **kwargs)
+                return self.update(svi_state, *args, **kwargs)
+
+            svi_state = self.init(rng_key, *args, **kwargs)
+            svi_state, losses = lax.scan(body_fn, svi_state, None, length=num_steps)
+            return SVIRunResult(self.get_params(svi_state), svi_state, losses)
+
+        compiled, lower_time, compile_time = _aot_compile(run_fn, rng_key, args, kwargs)
+
+        def run_compiled(compiled, rng_key, *args, **kwargs):
+            return compiled(rng_key, args, kwargs)
+
+        return CompiledRun(compiled, lower_time, compile_time, run_compiled)
+
     def evaluate(self, svi_state, *args, **kwargs):
         """
         Take a single step of SVI (possibly on a batch / minibatch of data).
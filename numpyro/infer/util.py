@@ -4,11 +4,12 @@
 from collections import namedtuple
 from contextlib import contextmanager
 from functools import partial
+import time
 import warnings
 
 import numpy as np
 
-from jax import device_get, jacfwd, lax, random, value_and_grad
+from jax import device_get, jacfwd, jit, lax, random, value_and_grad
 from jax.flatten_util import ravel_pytree
 import jax.numpy as jnp
 from jax.tree_util import tree_map
@@ -22,10 +23,12 @@ from numpyro.infer.initialization import init_to_uniform, init_to_value
 from numpyro.util import not_jax_tracer, soft_vmap, while_loop
 
 __all__ = [
+    "CompiledRun",
     "find_valid_initial_params",
     "get_potential_fn",
     "log_density",
     "log_likelihood",
+    "MCMCProfile",
     "potential_energy",
     "initialize_model",
     "Predictive",
@@ -996,3 +999,206 @@ def helpful_support_errors(site, raise_warnings=False):
                 f"numpyro.handlers.reparam(config={{'{name}': ProjectedNormalReparam()}})."
             )
         raise e from None
+
+
+class CompiledRun(object):
+    """
+    A handle to an inference program which has been lowered and compiled ahead of
+    time by :meth:`MCMC.compile() <numpyro.infer.mcmc.MCMC.compile>` or
+    :meth:`SVI.compile() <numpyro.infer.svi.SVI.compile>`. Calling :meth:`run`
+    executes the compiled program without tracing or compiling it again, so the
+    inputs must have the same structure, shapes and dtypes as the ones used to
+    compile it.
+
+    The cost and memory estimates are the ones reported by the XLA compiler; their
+    availability depends on the backend.
+
+    :param compiled: The compiled program, a :class:`jax.stages.Compiled`.
+    :param float lower_time: Wall time (in seconds) spent tracing and lowering the
+        program.
+    :param float compile_time: Wall time (in seconds) spent compiling the program.
+    :param callable run_fn: A callable which executes `compiled` given the
+        arguments of :meth:`run`.
+    """
+
+    def __init__(self, compiled, lower_time, compile_time, run_fn):
+        self.compiled = compiled
+        self.lower_time = lower_time
+        self.compile_time = compile_time
+        self._run_fn = run_fn
+
+    @property
+    def cost_analysis(self):
+        """
+        A dict of the cost estimates of the compiled program, e.g. `"flops"` and
+        `"bytes accessed"`. Empty if they are not available.
+        """
+        cost_analysis = getattr(self.compiled, "cost_analysis", None)
+        if cost_analysis is None:
+            return {}
+        cost = cost_analysis()
+        # some versions of JAX return one dict per XLA module
+        if isinstance(cost, (list, tuple)):
+            cost = cost[0] if len(cost) > 0 else None
+        return dict(cost) if cost is not None else {}
+
+    @property
+    def flops(self):
+        """
+        Estimated number of floating point operations of the compiled program, or
+        `None` if it is not available.
+        """
+        return self.cost_analysis.get("flops", None)
+
+    @property
+    def memory_analysis(self):
+        """
+        A dict of the memory sizes (in bytes) of the arguments, outputs, temporary
+        buffers and generated code of the compiled program. Empty if they are not
+        available.
+        """
+        memory_analysis = getattr(self.compiled, "memory_analysis", None)
+        if memory_analysis is None:
+            return {}
+        stats = memory_analysis()
+        if stats is None:
+            return {}
+        return {
+            name: getattr(stats, name)
+            for name in dir(stats)
+            if name.endswith("_size_in_bytes")
+        }
+
+    @property
+    def memory_bytes(self):
+        """
+        Estimated peak device memory (in bytes) needed to run the compiled
+        program, or `None` if it is not available.
+        """
+        stats = self.memory_analysis
+        if not stats:
+            return None
+        return (
+            stats["argument_size_in_bytes"]
+            + stats["output_size_in_bytes"]
+            + stats["temp_size_in_bytes"]
+            - stats["alias_size_in_bytes"]
+        )
+
+    def run(self, *args, **kwargs):
+        """
+        Runs the compiled program. See :meth:`MCMC.compile()
+        <numpyro.infer.mcmc.MCMC.compile>` and :meth:`SVI.compile()
+        <numpyro.infer.svi.SVI.compile>` for the arguments.
+        """
+        return self._run_fn(self.compiled, *args, **kwargs)
+
+
+class MCMCProfile(object):
+    """
+    Timings and sampling efficiency of a run of
+    :meth:`MCMC.run(..., profile=True) <numpyro.infer.mcmc.MCMC.run>`, which is
+    returned by :meth:`MCMC.get_profile() <numpyro.infer.mcmc.MCMC.get_profile>`.
+    Each phase is compiled ahead of time and waited for, so that the wall times of
+    compilation, warmup, sampling and postprocessing do not overlap.
+
+    :param float compile_time: Wall time (in seconds) spent tracing, lowering and
+        compiling the warmup and sampling programs.
+    :param float warmup_time: Wall time (in seconds) of the warmup phase.
+    :param float sample_time: Wall time (in seconds) of the sampling phase.
+    :param float postprocess_time: Wall time (in seconds) spent computing the
+        constrained values and deterministic sites of the draws.
+    :param int num_grads: Total number of potential gradient evaluations of the
+        collected draws of all chains, i.e. the sum of their `num_steps` times the
+        number of gradient evaluations per step of the integrator (e.g. 2 for
+        :func:`~numpyro.infer.hmc_util.two_stage_bcss`), or `None` if the sampler
+        does not report `num_steps` or uses a custom integrator.
+    :param dict ess: Effective sample size of each site, keyed on site names.
+    """
+
+    def __init__(
+        self, compile_time, warmup_time, sample_time, postprocess_time, num_grads, ess
+    ):
+        self.compile_time = compile_time
+        self.warmup_time = warmup_time
+        self.sample_time = sample_time
+        self.postprocess_time = postprocess_time
+        self.num_grads = num_grads
+        self.ess = ess
+
+    @property
+    def total_time(self):
+        """
+        Total wall time (in seconds) of all phases.
+        """
+        return (
+            self.compile_time
+            + self.warmup_time
+            + self.sample_time
+            + self.postprocess_time
+        )
+
+    @property
+    def ess_per_second(self):
+        """
+        Effective sample size per second of sampling of each site.
+        """
+        return {k: v / self.sample_time for k, v in self.ess.items()}
+
+    @property
+    def ess_per_grad(self):
+        """
+        Effective sample size per potential gradient evaluation of each site, or
+        `None` if the number of gradient evaluations is not available.
+        """
+        if not self.num_grads:
+            return None
+        return {k: v / self.num_grads for k, v in self.ess.items()}
+
+    def __str__(self):
+        lines = [
+            "compile: {:.3f}s, warmup: {:.3f}s, sample: {:.3f}s,"
+            " postprocess: {:.3f}s".format(
+                self.compile_time,
+                self.warmup_time,
+                self.sample_time,
+                self.postprocess_time,
+            ),
+            "gradient evaluations: {}".format(self.num_grads),
+        ]
+        ess_per_second = self.ess_per_second
+        ess_per_grad = self.ess_per_grad
+        name_width = max([len(k) for k in self.ess] + [4])
+        lines.append(
+            "{:>{w}} {:>10} {:>10} {:>10}".format(
+                "site", "min_ess", "ess/s", "ess/grad", w=name_width
+            )
+        )
+        for name, ess in self.ess.items():
+            ess = np.min(ess)
+            per_grad = (
+                "{:>10.4f}".format(np.min(ess_per_grad[name]))
+                if ess_per_grad is not None
+                else "{:>10}".format("-")
+            )
+            lines.append(
+                "{:>{w}} {:>10.2f} {:>10.2f} {}".format(
+                    name, ess, np.min(ess_per_second[name]), per_grad, w=name_width
+                )
+            )
+        return "\n".join(lines)
+
+
+def _aot_compile(fn, *args):
+    # lowers and compiles `jit(fn)` for the given inputs, timing both stages
+    jit_fn = jit(fn)
+    if not hasattr(jit_fn, "lower"):
+        raise NotImplementedError(
+            "Ahead-of-time compilation requires a newer version of JAX."
+        )
+    start = time.perf_counter()
+    lowered = jit_fn.lower(*args)
+    lower_end = time.perf_counter()
+    compiled = lowered.compile()
+    compile_end = time.perf_counter()
+    return compiled, lower_end - start, compile_end - lower_end
@@ -16,12 +16,12 @@ import jax
 from jax import device_put, jit, lax, ops, vmap
 from jax.core import Tracer
 from jax.experimental import host_callback
-from jax.flatten_util import ravel_pytree
 import jax.numpy as jnp
-from jax.tree_util import tree_flatten, tree_map
+from jax.tree_util import tree_flatten, tree_map, tree_multimap
 
 _DISABLE_CONTROL_FLOW_PRIM = False
 _CHAIN_RE = re.compile(r"\d+$")  # e.g. get '3' from 'TFRT_CPU_3'
+_COMPILATION_CACHE_DIR = None
 
 
 def set_rng_seed(rng_seed):
@@ -58,6 +58,69 @@ def set_platform(platform=None):
     jax.config.update("jax_platform_name", platform)
 
 
+def enable_compilation_cache(cache_dir=None, min_compile_time_secs=1.0):
+    """
+    Enables the persistent compilation cache of JAX, so that the programs compiled by
+    XLA, e.g. the sampling loop and the initialization of MCMC, are stored on disk and
+    reused by later runs and other processes (including the workers of
+    `chain_method="processes"` in :class:`~numpyro.infer.mcmc.MCMC`). Programs are
+    keyed by a fingerprint of their XLA computation, which covers the traced model,
+    the shapes and dtypes of the arguments and the configuration of the kernel,
+    together with the compile options, the backend and the version of JAX. This
+    utility only takes effect at the beginning of your program.
+
+    .. note:: The backends supported by the persistent compilation cache depend on
+        the installed version of JAX. Older versions of JAX can only enable the
+        cache once per process, so `cache_dir` cannot be changed afterwards.
+
+    :param str cache_dir: the directory to store the compiled programs. Defaults
+        to the environment variable `NUMPYRO_COMPILATION_CACHE_DIR` or to
+        `~/.cache/numpyro/jax`.
+    :param float min_compile_time_secs: only programs which take longer than this
+        to compile are stored in the cache.
+    """
+    global _COMPILATION_CACHE_DIR
+    try:
+        from jax.experimental.compilation_cache import compilation_cache
+    except ImportError as e:
+        raise RuntimeError(
+            "The persistent compilation cache is not available in the installed"
+            " version of JAX."
+        ) from e
+
+    if cache_dir is None:
+        cache_dir = os.getenv(
+            "NUMPYRO_COMPILATION_CACHE_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "numpyro", "jax"),
+        )
+    try:
+        jax.config.update(
+            "jax_persistent_cache_min_compile_time_secs", min_compile_time_secs
+        )
+    except AttributeError:
+        warnings.warn(
+            "The installed version of JAX does not support `min_compile_time_secs`,"
+            " so all compiled programs are stored in the cache.",
+            stacklevel=2,
+        )
+    if hasattr(compilation_cache, "is_initialized"):
+        if compilation_cache.is_initialized() and cache_dir != _COMPILATION_CACHE_DIR:
+            compilation_cache.reset_cache()
+        if not compilation_cache.is_initialized():
+            compilation_cache.initialize_cache(cache_dir)
+    # older versions of JAX can only initialize the cache once per process
+    elif _COMPILATION_CACHE_DIR is None:
+        compilation_cache.initialize_cache(cache_dir)
+    elif cache_dir != _COMPILATION_CACHE_DIR:
+        raise RuntimeError(
+            "The compilation cache is already enabled at {}, and the installed version"
+            " of JAX does not support moving it to another directory.".format(
+                _COMPILATION_CACHE_DIR
+            )
+        )
+    _COMPILATION_CACHE_DIR = cache_dir
+
+
 def set_host_device_count(n):
     """
     By default, XLA considers all CPU cores as one device. This utility tells XLA
@@ -171,15 +234,20 @@ def cached_by(outer_fn, *keys):
     return _wrapped
 
 
-def progress_bar_factory(num_samples, num_chains):
+def progress_bar_factory(
+    num_samples, num_chains, print_rate=None, progbar_desc=None, diagnostics_fn=None
+):
     """Factory that builds a progress bar decorator along
-    with the `set_tqdm_description` and `close_tqdm` functions
+    with the `set_tqdm_description` and `close_tqdm` functions.
+    The progress bars are updated through host callbacks every `print_rate`
+    iterations (by default, 20 times per loop). If `diagnostics_fn` is provided,
+    it is called on the host with the current value of the loop to update the
+    progress bar postfix.
     """
 
-    if num_samples > 20:
-        print_rate = int(num_samples / 20)
-    else:
-        print_rate = 1
+    if print_rate is None:
+        print_rate = int(num_samples / 20) if num_samples > 20 else 1
+    print_rate = min(max(print_rate, 1), max(num_samples, 1))
 
     remainder = num_samples % print_rate
 
@@ -189,32 +257,44 @@ def progress_bar_factory(num_samples, num_chains):
         tqdm_bars[chain] = tqdm_auto(range(num_samples), position=chain)
         tqdm_bars[chain].set_description("Compiling.. ", refresh=True)
 
-    def _update_tqdm(arg, transform, device):
+    def _get_chain(device):
+        if num_chains == 1:
+            return 0
         chain_match = _CHAIN_RE.search(str(device))
         assert chain_match
-        chain = int(chain_match.group())
-        tqdm_bars[chain].set_description(f"Running chain {chain}", refresh=False)
-        tqdm_bars[chain].update(arg)
+        return int(chain_match.group())
+
+    def _update_tqdm(arg, transform, device):
+        chain = _get_chain(device)
+        num_updates, iter_num, val = arg
+        if progbar_desc is None or num_chains > 1:
+            desc = f"Running chain {chain}"
+        else:
+            desc = progbar_desc(int(iter_num) - 1)
+        tqdm_bars[chain].set_description(desc, refresh=False)
+        if diagnostics_fn is not None:
+            tqdm_bars[chain].set_postfix_str(diagnostics_fn(val), refresh=False)
+        tqdm_bars[chain].update(int(num_updates))
 
     def _close_tqdm(arg, transform, device):
-        chain_match = _CHAIN_RE.search(str(device))
-        assert chain_match
-        chain = int(chain_match.group())
-        tqdm_bars[chain].update(arg)
+        chain = _get_chain(device)
+        tqdm_bars[chain].update(int(arg[0]))
         finished_chains.append(chain)
         if len(finished_chains) == num_chains:
             for chain in range(num_chains):
                 tqdm_bars[chain].close()
 
-    def _update_progress_bar(iter_num):
+    def _update_progress_bar(iter_num, val):
         """Updates tqdm progress bar of a JAX loop only if the iteration number is a multiple of the print_rate
         Usage: carry = progress_bar((iter_num, print_rate), carry)
         """
+        # the current value is only sent to the host if it is needed for diagnostics
+        val = val if diagnostics_fn is not None else None
 
         _ = lax.cond(
             iter_num == 1,
             lambda _: host_callback.id_tap(
-                _update_tqdm, 0, result=iter_num, tap_with_device=True
+                _update_tqdm, (0, iter_num, val), result=iter_num, tap_with_device=True
             ),
             lambda _: iter_num,
             operand=None,
@@ -222,7 +302,10 @@ def progress_bar_factory(num_samples, num_chains):
         _ = lax.cond(
             iter_num % print_rate == 0,
             lambda _: host_callback.id_tap(
-                _update_tqdm, print_rate, result=iter_num, tap_with_device=True
+                _update_tqdm,
+                (print_rate, iter_num, val),
+                result=iter_num,
+                tap_with_device=True,
             ),
             lambda _: iter_num,
             operand=None,
@@ -230,7 +313,7 @@ def progress_bar_factory(num_samples, num_chains):
         _ = lax.cond(
             iter_num == num_samples,
             lambda _: host_callback.id_tap(
-                _close_tqdm, remainder, result=iter_num, tap_with_device=True
+                _close_tqdm, (remainder,), result=iter_num, tap_with_device=True
             ),
             lambda _: iter_num,
             operand=None,
@@ -239,12 +322,13 @@ def progress_bar_factory(num_samples, num_chains):
     def progress_bar_fori_loop(func):
         """Decorator that adds a progress bar to `body_fun` used in `lax.fori_loop`.
         Note that `body_fun` must be looping over a tuple who's first element is `np.arange(num_samples)`.
-        This means that `iter_num` is the current iteration number
+        This means that `iter_num` is the current iteration number. If `diagnostics_fn` is provided,
+        it is called with the first element of the tuple returned by `body_fun`.
         """
 
         def wrapper_progress_bar(i, vals):
             result = func(i, vals)
-            _update_progress_bar(i + 1)
+            _update_progress_bar(i + 1, result[0])
             return result
 
         return wrapper_progress_bar
@@ -293,7 +377,11 @@ def fori_collect(
         `diagnostics_fn` can be supplied which when passed the current value
         from `body_fun` returns a string that is used to update the progress
         bar postfix. Also a `progbar_desc` keyword argument can be supplied
-        which is used to label the progress bar.
+        which is used to label the progress bar. If a `progbar_interval` is
+        supplied, the whole loop runs inside :func:`~jax.lax.fori_loop` and the
+        progress bar (including the diagnostics postfix) is updated through a
+        host callback every `progbar_interval` iterations, instead of
+        dispatching each iteration from Python.
     :return: collection with the same type as `init_val` with values
         collected along the leading axis of `np.ndarray` objects.
     """
@@ -303,9 +391,10 @@ def fori_collect(
         (upper - lower) // thinning if collection_size is None else collection_size
     )
     assert collection_size >= (upper - lower) // thinning
-    init_val_flat, unravel_fn = ravel_pytree(transform(init_val))
+    init_val_transformed = transform(init_val)
     start_idx = lower + (upper - lower) % thinning
     num_chains = progbar_opts.pop("num_chains", 1)
+    progbar_interval = progbar_opts.pop("progbar_interval", None)
     # host_callback does not work yet with multi-GPU platforms
     # See: https://github.com/google/jax/issues/6447
     if num_chains > 1 and jax.default_backend() == "gpu":
@@ -322,19 +411,39 @@ def fori_collect(
         collection = cond(
             idx >= 0,
             collection,
-            lambda x: ops.index_update(x, idx, ravel_pytree(transform(val))[0]),
+            lambda x: tree_multimap(
+                lambda c, v: ops.index_update(
+                    c, idx, lax.convert_element_type(v, c.dtype)
+                ),
+                x,
+                transform(val),
+            ),
             collection,
             identity,
         )
         return val, collection, start_idx, thinning
 
-    collection = jnp.zeros((collection_size,) + init_val_flat.shape)
+    # each leaf is collected in a buffer of its own dtype, e.g. so that a `transform`
+    # which casts the values to a smaller dtype also reduces the collection size
+    collection = tree_map(
+        lambda x: jnp.zeros((collection_size,) + jnp.shape(x), jnp.result_type(x)),
+        init_val_transformed,
+    )
     if not progbar:
         last_val, collection, _, _ = fori_loop(
             0, upper, _body_fn, (init_val, collection, start_idx, thinning)
         )
-    elif num_chains > 1:
-        progress_bar_fori_loop = progress_bar_factory(upper, num_chains)
+    elif num_chains > 1 or (progbar_interval is not None and upper > 0):
+        if progbar_interval is None:
+            progress_bar_fori_loop = progress_bar_factory(upper, num_chains)
+        else:
+            progress_bar_fori_loop = progress_bar_factory(
+                upper,
+                num_chains,
+                print_rate=progbar_interval,
+                progbar_desc=progbar_opts.pop("progbar_desc", None),
+                diagnostics_fn=progbar_opts.pop("diagnostics_fn", None),
+            )
         _body_fn_pbar = progress_bar_fori_loop(_body_fn)
         last_val, collection, _, _ = fori_loop(
             0, upper, _body_fn_pbar, (init_val, collection, start_idx, thinning)
@@ -357,8 +466,7 @@ def fori_collect(
 
         last_val, collection, _, _ = vals
 
-    unravel_collection = vmap(unravel_fn)(collection)
-    return (unravel_collection, last_val) if return_last_val else unravel_collection
+    return (collection, last_val) if return_last_val else collection
 
 
 def soft_vmap(fn, xs, batch_ndims=1, chunk_size=None):
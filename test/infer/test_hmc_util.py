@@ -9,7 +9,7 @@ import numpy as np
 from numpy.testing import assert_allclose
 import pytest
 
-from jax import device_put, disable_jit, grad, jit, random, tree_map
+from jax import device_put, disable_jit, grad, jit, random, tree_map, vmap
 import jax.numpy as jnp
 
 import numpyro.distributions as dist
@@ -17,12 +17,20 @@ from numpyro.infer.hmc_util import (
     AdaptWindow,
     _is_iterative_turning,
     _leaf_idx_to_ckpt_idxs,
+    _low_rank_sqrt_matvec,
+    _pool_low_rank_state,
+    _pool_welford_state,
     build_adaptation_schedule,
     build_tree,
     consensus,
     dual_averaging,
+    euclidean_kinetic_energy,
+    find_dense_mass_blocks,
     find_reasonable_step_size,
+    low_rank_covariance,
     parametric_draws,
+    three_stage_bcss,
+    two_stage_bcss,
     velocity_verlet,
     warmup_adapter,
     welford_covariance,
@@ -87,6 +95,107 @@ def test_welford_covariance(jitted, diagonal, regularize):
             )
 
 
+@pytest.mark.parametrize("diagonal", [True, False])
+def test_pool_welford_state(diagonal):
+    x = np.random.RandomState(0).randn(4, 50, 3)
+    wc_init, wc_update, wc_final = welford_covariance(diagonal=diagonal)
+
+    def get_state(x):
+        wc_state = wc_init(3)
+        return fori_loop(0, x.shape[0], lambda i, val: wc_update(x[i], val), wc_state)
+
+    pooled_state = vmap(
+        lambda x: _pool_welford_state(get_state(x), "chains"), axis_name="chains"
+    )(x)
+    expected_state = get_state(x.reshape(-1, 3))
+    for pooled, expected in zip(pooled_state, expected_state):
+        for i in range(4):
+            assert_allclose(pooled[i], expected, rtol=1e-5, atol=1e-5)
+
+
+def _low_rank_to_dense(matrix):
+    scale, eigenvectors, eigenvalues = matrix
+    inner = (eigenvectors * (eigenvalues - 1)) @ eigenvectors.T
+    return scale[:, None] * (jnp.identity(scale.shape[0]) + inner) * scale
+
+
+@pytest.mark.parametrize("regularize", [True, False])
+def test_low_rank_covariance(regularize):
+    rng = np.random.RandomState(0)
+    dim = 20
+    a = 3 * rng.randn(dim, 2)
+    target_cov = np.diag(rng.uniform(0.5, 2.0, dim)) + a @ a.T
+    x = rng.multivariate_normal(np.zeros(dim), target_cov, size=(2000,))
+    x_grad = x @ np.linalg.inv(target_cov)
+    lr_init, lr_update, lr_final = low_rank_covariance(rank=2, max_draws=2000)
+
+    @jit
+    def get_cov(x, x_grad):
+        lr_state = lr_init(dim)
+        lr_state = fori_loop(
+            0, 2000, lambda i, val: lr_update(x[i], val, x_grad[i]), lr_state
+        )
+        return lr_final(lr_state, regularize=regularize)
+
+    cov, precision, _ = get_cov(x, x_grad)
+    cov_dense = _low_rank_to_dense(cov)
+    # the correction captures the leading eigenvalues of the rescaled covariance
+    scale_inv = 1 / np.asarray(cov.scale)
+    expected = np.linalg.eigvalsh(scale_inv[:, None] * target_cov * scale_inv)[-2:]
+    actual = np.linalg.eigvalsh(scale_inv[:, None] * cov_dense * scale_inv)[-2:]
+    assert_allclose(actual, expected, rtol=0.1)
+    assert_allclose(
+        _low_rank_to_dense(precision) @ cov_dense, jnp.identity(dim), atol=1e-3
+    )
+
+    r = rng.randn(dim)
+    assert_allclose(
+        euclidean_kinetic_energy(cov, r), 0.5 * r @ cov_dense @ r, rtol=1e-5
+    )
+    cov_sqrt = vmap(lambda e: _low_rank_sqrt_matvec(cov, e), out_axes=1)(
+        jnp.identity(dim)
+    )
+    assert_allclose(cov_sqrt @ cov_sqrt.T, cov_dense, rtol=1e-4, atol=1e-4)
+
+
+def test_pool_low_rank_state():
+    rng = np.random.RandomState(0)
+    x, x_grad = rng.randn(4, 50, 5), rng.randn(4, 50, 5)
+
+    def get_cov(x, x_grad, max_draws, axis_name=None):
+        lr_init, lr_update, lr_final = low_rank_covariance(2, max_draws=max_draws)
+        lr_state = fori_loop(
+            0,
+            x.shape[0],
+            lambda i, val: lr_update(x[i], val, x_grad[i]),
+            lr_init(5),
+        )
+        if axis_name is not None:
+            lr_state = _pool_low_rank_state(lr_state, axis_name)
+        return _low_rank_to_dense(lr_final(lr_state, regularize=True)[0])
+
+    pooled_cov = vmap(
+        lambda x, x_grad: get_cov(x, x_grad, 50, "chains"), axis_name="chains"
+    )(x, x_grad)
+    expected_cov = get_cov(x.reshape(-1, 5), x_grad.reshape(-1, 5), max_draws=200)
+    for i in range(4):
+        assert_allclose(pooled_cov[i], expected_cov, rtol=1e-4, atol=1e-5)
+
+
+def test_find_dense_mass_blocks():
+    rng = np.random.RandomState(0)
+    x = rng.randn(1000, 4)
+    samples = {
+        "a": x[:, 0],
+        "b": x[:, 0] + 0.1 * x[:, 1],
+        "c": x[:, 2:] @ np.array([[1.0, 1.0], [0.0, 0.2]]),
+        "d": rng.randn(1000, 2, 3),
+        "e": rng.randn(1000),
+    }
+    assert find_dense_mass_blocks(samples) == [("a", "b"), ("c",)]
+    assert find_dense_mass_blocks(samples, threshold=0.999) == []
+
+
 ########################################
 # verlocity_verlet Test
 ########################################
@@ -227,6 +336,33 @@ def test_velocity_verlet(jitted, example):
         assert_allclose(q_i[node], args.q_i[node], atol=1e-4)
 
 
+@pytest.mark.parametrize("integrator", [two_stage_bcss, three_stage_bcss])
+def test_multistage_integrator(integrator):
+    def kinetic_fn(m_inv, p):
+        return 0.5 * jnp.sum(m_inv * p ** 2)
+
+    def potential_fn(q):
+        return 0.5 * jnp.sum(q ** 2 / jnp.array([1.0, 4.0, 9.0]))
+
+    def get_final_state(integrator, step_size, num_steps, q_i, p_i):
+        vv_init, vv_update = integrator(potential_fn, kinetic_fn)
+        vv_state = vv_init(q_i, p_i)
+        return fori_loop(
+            0, num_steps, lambda i, val: vv_update(step_size, 1.0, val), vv_state
+        )
+
+    q_i, p_i = jnp.array([1.0, -1.0, 2.0]), jnp.array([0.5, 1.0, -1.0])
+    energy_initial = kinetic_fn(1.0, p_i) + potential_fn(q_i)
+    q_f, p_f, pe_f, grad_f = get_final_state(integrator, 0.8, 10, q_i, p_i)
+    assert_allclose(pe_f, potential_fn(q_f), rtol=1e-6)
+    assert_allclose(grad_f, grad(potential_fn)(q_f), rtol=1e-6)
+    assert_allclose(kinetic_fn(1.0, p_f) + pe_f, energy_initial, rtol=0.02)
+
+    # time reversibility
+    q_r, _, _, _ = get_final_state(integrator, 0.8, 10, q_f, -p_f)
+    assert_allclose(q_r, q_i, atol=1e-5)
+
+
 @pytest.mark.parametrize("jitted", [True, False])
 @pytest.mark.parametrize("init_step_size", [0.1, 10.0])
 def test_find_reasonable_step_size(jitted, init_step_size):
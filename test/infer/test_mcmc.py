@@ -1,26 +1,43 @@
 # Copyright Contributors to the Pyro project.
 # SPDX-License-Identifier: Apache-2.0
 
+from collections import namedtuple
 import os
 
 import numpy as np
 from numpy.testing import assert_allclose
 import pytest
 
-from jax import device_get, jit, lax, pmap, random, vmap
+from jax import device_get, jit, lax, pmap, random, value_and_grad, vmap
 from jax.lib import xla_bridge
 import jax.numpy as jnp
 from jax.scipy.special import logit
 from jax.test_util import check_close
 
 import numpyro
+from numpyro.diagnostics import effective_sample_size
 import numpyro.distributions as dist
 from numpyro.distributions.transforms import AffineTransform
-from numpyro.infer import HMC, MCMC, NUTS, SA, BarkerMH
+from numpyro.infer import (
+    DRHMC,
+    GHMC,
+    HMC,
+    MCMC,
+    MEADS,
+    NUTS,
+    SA,
+    BarkerMH,
+    ChEESHMC,
+    HMCGibbs,
+    NpySink,
+    ReplicaExchange,
+)
 from numpyro.infer.hmc import hmc
+from numpyro.infer.hmc_util import three_stage_bcss, two_stage_bcss
+from numpyro.infer.mcmc import MCMCKernel
 from numpyro.infer.reparam import TransformReparam
 from numpyro.infer.sa import _get_proposal_loc_and_scale, _numpy_delete
-from numpyro.infer.util import initialize_model
+from numpyro.infer.util import initialize_model, potential_energy
 from numpyro.util import fori_collect
 
 
@@ -55,6 +72,28 @@ def test_unnormalized_normal_x64(kernel_cls, dense_mass):
         assert hmc_states.dtype == jnp.float64
 
 
+@pytest.mark.parametrize("kernel_cls", [HMC, NUTS])
+@pytest.mark.parametrize("integrator", [two_stage_bcss, three_stage_bcss])
+def test_multistage_integrator(kernel_cls, integrator):
+    true_mean, true_std = jnp.array([1.0, -1.0]), jnp.array([0.5, 2.0])
+
+    def potential_fn(z):
+        return 0.5 * jnp.sum(((z - true_mean) / true_std) ** 2)
+
+    kernel = kernel_cls(
+        potential_fn=potential_fn,
+        trajectory_length=8,
+        find_heuristic_step_size=True,
+        integrator=integrator,
+    )
+    mcmc = MCMC(kernel, num_warmup=1000, num_samples=4000, progress_bar=False)
+    mcmc.run(random.PRNGKey(0), init_params=jnp.zeros(2), extra_fields=("num_steps",))
+    samples = mcmc.get_samples()
+    assert_allclose(jnp.mean(samples, 0), true_mean, atol=0.1)
+    assert_allclose(jnp.std(samples, 0), true_std, rtol=0.07)
+    assert mcmc.get_extra_fields()["num_steps"].min() >= 1
+
+
 @pytest.mark.parametrize("regularize", [True, False])
 def test_correlated_mvn(regularize):
     # This requires dense mass matrix estimation.
@@ -1049,3 +1088,825 @@ def test_initial_inverse_mass_matrix_ndarray(dense_mass):
     assert set(inverse_mass_matrix.keys()) == {("x", "z")}
     expected_mm = jnp.diag(expected_mm) if dense_mass else expected_mm
     assert_allclose(inverse_mass_matrix[("x", "z")], expected_mm)
+
+
+@pytest.mark.parametrize(
+    "num_chains, chain_method",
+    [(1, "parallel"), (2, "sequential"), (2, "vectorized")],
+)
+@pytest.mark.parametrize("thinning", [1, 3])
+def test_run_with_npy_sink(tmpdir, num_chains, chain_method, thinning):
+    def model():
+        x = numpyro.sample("x", dist.Normal(0, 1).expand([3]))
+        numpyro.deterministic("x_sum", x.sum())
+
+    mcmc_kwargs = dict(
+        num_warmup=20,
+        num_samples=25,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        thinning=thinning,
+        progress_bar=False,
+    )
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",))
+    expected_samples = mcmc.get_samples(group_by_chain=True)
+    expected_num_steps = mcmc.get_extra_fields()["num_steps"]
+
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    sink = NpySink(str(tmpdir), block_size=4)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",), sink=sink)
+    samples = mcmc.get_samples(group_by_chain=True)
+    assert os.path.exists(os.path.join(str(tmpdir), "z", "x.npy"))
+    assert isinstance(samples["x"], np.memmap)
+    assert samples["x"].shape == (num_chains, 25 // thinning, 3)
+    for name in ["x", "x_sum"]:
+        assert_allclose(samples[name], expected_samples[name], rtol=1e-5, atol=1e-6)
+    assert mcmc.get_samples()["x"].shape == (num_chains * (25 // thinning), 3)
+    assert_allclose(mcmc.get_extra_fields()["num_steps"], expected_num_steps)
+
+
+@pytest.mark.parametrize(
+    "num_chains, chain_method",
+    [
+        (1, "parallel"),
+        (2, "sequential"),
+        (2, "vectorized"),
+        (2, "parallel_vectorized"),
+    ],
+)
+def test_checkpoint_resume(tmpdir, num_chains, chain_method):
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1).expand([3]))
+
+    mcmc_kwargs = dict(
+        num_warmup=20,
+        num_samples=30,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        thinning=2,
+        progress_bar=False,
+    )
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0))
+    expected_samples = mcmc.get_samples(group_by_chain=True)["x"]
+
+    # simulate a preemption while drawing the second block of samples
+    checkpoint_path = os.path.join(str(tmpdir), "mcmc.ckpt")
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    run_chains = mcmc._run_chains
+    num_blocks = []
+
+    def preempted_run_chains(*args, **kwargs):
+        num_blocks.append(None)
+        if len(num_blocks) > 5:
+            raise RuntimeError("preempted")
+        return run_chains(*args, **kwargs)
+
+    mcmc._run_chains = preempted_run_chains
+    with pytest.raises(RuntimeError, match="preempted"):
+        mcmc.run(random.PRNGKey(0), checkpoint_path=checkpoint_path, checkpoint_every=8)
+
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.resume(checkpoint_path)
+    assert_allclose(mcmc.get_samples(group_by_chain=True)["x"], expected_samples)
+    assert mcmc.get_samples()["x"].shape == (num_chains * 15, 3)
+
+    # the final checkpoint contains all samples
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.resume(checkpoint_path)
+    assert_allclose(mcmc.get_samples(group_by_chain=True)["x"], expected_samples)
+
+    mcmc = MCMC(NUTS(model), **dict(mcmc_kwargs, num_samples=10))
+    with pytest.raises(ValueError, match="do not match"):
+        mcmc.resume(checkpoint_path)
+
+
+@pytest.mark.parametrize("thinning", [1, 2])
+def test_run_with_segment_size(thinning):
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1).expand([3]))
+
+    mcmc_kwargs = dict(num_warmup=10, num_samples=25, thinning=thinning)
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0))
+    expected_samples = mcmc.get_samples()["x"]
+
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), segment_size=6)
+    samples = mcmc.get_samples()["x"]
+    assert isinstance(samples, np.ndarray)
+    assert_allclose(samples, expected_samples, rtol=1e-5, atol=1e-6)
+
+    with pytest.raises(ValueError, match="cannot be provided together"):
+        mcmc.run(random.PRNGKey(0), sink=NpySink("unused"), segment_size=6)
+
+
+@pytest.mark.parametrize(
+    "num_chains, chain_method",
+    [
+        (1, "parallel"),
+        (2, "sequential"),
+        (2, "vectorized"),
+        (2, "parallel_vectorized"),
+    ],
+)
+def test_run_with_online_stats(num_chains, chain_method):
+    def model():
+        numpyro.sample("x", dist.Normal(1, 2).expand([3]))
+        numpyro.deterministic("x_sum", numpyro.sample("y", dist.LogNormal()) + 1)
+
+    mcmc_kwargs = dict(
+        num_warmup=100,
+        num_samples=400,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        thinning=2,
+        progress_bar=False,
+    )
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0))
+    samples = mcmc.get_samples(group_by_chain=True)
+    num_divergences = mcmc.get_extra_fields()["diverging"].sum()
+
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), online_stats=True)
+    stats = mcmc.get_online_stats()
+    assert set(stats["z"]) == {"x", "x_sum", "y"}
+    assert_allclose(stats["diverging"].sum(), num_divergences)
+    for name, value in samples.items():
+        mean, m2, n = stats["z"][name].moments
+        assert_allclose(n, np.full(num_chains, 200))
+        assert_allclose(
+            mean.reshape(value.shape[:1] + (-1,)),
+            value.mean(1).reshape(num_chains, -1),
+            rtol=1e-5,
+            atol=1e-5,
+        )
+    mcmc.print_summary()
+    with pytest.raises(RuntimeError, match="online_stats"):
+        mcmc.get_samples()
+
+
+def test_run_with_online_stats_options():
+    def model():
+        numpyro.sample("x", dist.Normal(1, 2).expand([3]))
+
+    mcmc = MCMC(NUTS(model), num_warmup=100, num_samples=200, progress_bar=False)
+    options = {"relative_accuracy": 0.05, "min_value": 1e-3, "max_value": 1e3}
+    mcmc.run(random.PRNGKey(0), online_stats=options)
+    sketch = mcmc.get_online_stats()["z"]["x"].sketch
+    assert sketch.shape == (1, 3, 281)
+    assert_allclose(sketch.sum(-1), 200)
+    mcmc.print_summary()
+    with pytest.raises(ValueError, match="relative_error"):
+        mcmc.run(random.PRNGKey(0), online_stats={"relative_error": 0.05})
+
+
+@pytest.mark.parametrize("thinning", [1, 2])
+def test_run_until(thinning):
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1).expand([2]))
+        numpyro.deterministic("c", jnp.zeros(()))
+
+    mcmc = MCMC(
+        NUTS(model),
+        num_warmup=100,
+        num_samples=5000,
+        num_chains=2,
+        chain_method="sequential",
+        thinning=thinning,
+        progress_bar=False,
+    )
+    assert mcmc.run_until(
+        random.PRNGKey(0), target_ess=100, max_rhat=1.1, check_every=100
+    )
+    samples = mcmc.get_samples(group_by_chain=True)["x"]
+    num_draws = samples.shape[1]
+    assert 0 < num_draws < 5000 // thinning
+    assert num_draws % (100 // thinning) == 0
+    assert effective_sample_size(samples).min() >= 100
+    assert mcmc.get_extra_fields()["diverging"].shape == (2 * num_draws,)
+
+    with pytest.warns(UserWarning, match="have not been met"):
+        assert not mcmc.run_until(random.PRNGKey(1), target_ess=1e6, check_every=500)
+    assert mcmc.get_samples()["x"].shape == (2 * 5000 // thinning, 2)
+
+
+def test_parallel_vectorized_chains():
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1).expand([3]))
+
+    mcmc_kwargs = dict(num_warmup=20, num_samples=30, num_chains=4, progress_bar=False)
+    mcmc = MCMC(NUTS(model), chain_method="vectorized", **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",))
+    expected_samples = mcmc.get_samples(group_by_chain=True)["x"]
+    expected_num_steps = mcmc.get_extra_fields(group_by_chain=True)["num_steps"]
+
+    mcmc = MCMC(NUTS(model), chain_method="parallel_vectorized", **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",))
+    samples = mcmc.get_samples(group_by_chain=True)["x"]
+    assert samples.shape == (4, 30, 3)
+    assert_allclose(samples, expected_samples, rtol=1e-5, atol=1e-5)
+    assert_allclose(
+        mcmc.get_extra_fields(group_by_chain=True)["num_steps"], expected_num_steps
+    )
+    assert mcmc.last_state.z["x"].shape == (4, 3)
+
+
+def _normal_model(data):
+    loc = numpyro.sample("loc", dist.Normal(0, 10))
+    numpyro.sample("obs", dist.Normal(loc, 1), obs=data)
+
+
+def test_processes_chains():
+    data = jnp.arange(10.0)
+    mcmc_kwargs = dict(num_warmup=20, num_samples=30, num_chains=2, progress_bar=False)
+    mcmc = MCMC(NUTS(_normal_model), chain_method="sequential", **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data, extra_fields=("num_steps",))
+    expected_samples = mcmc.get_samples(group_by_chain=True)["loc"]
+    expected_num_steps = mcmc.get_extra_fields(group_by_chain=True)["num_steps"]
+
+    mcmc = MCMC(NUTS(_normal_model), chain_method="processes", **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data, extra_fields=("num_steps",))
+    samples = mcmc.get_samples(group_by_chain=True)["loc"]
+    assert samples.shape == (2, 30)
+    assert_allclose(samples, expected_samples, rtol=1e-5, atol=1e-5)
+    assert_allclose(
+        mcmc.get_extra_fields(group_by_chain=True)["num_steps"], expected_num_steps
+    )
+    assert mcmc.get_samples()["loc"].shape == (60,)
+    assert mcmc.last_state.z["loc"].shape == (2,)
+
+
+@pytest.mark.skipif(
+    not hasattr(jit(lambda x: x), "lower"),
+    reason="Ahead-of-time compilation requires a newer version of JAX.",
+)
+@pytest.mark.parametrize("jit_model_args", [True, False])
+@pytest.mark.parametrize(
+    "num_chains, chain_method", [(1, "sequential"), (2, "vectorized")]
+)
+def test_compile(jit_model_args, num_chains, chain_method):
+    data = jnp.arange(10.0)
+    mcmc = MCMC(
+        NUTS(_normal_model),
+        num_warmup=20,
+        num_samples=30,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        jit_model_args=jit_model_args,
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0), data, extra_fields=("num_steps",))
+    expected_samples = mcmc.get_samples(group_by_chain=True)["loc"]
+    expected_num_steps = mcmc.get_extra_fields()["num_steps"]
+
+    mcmc = MCMC(
+        NUTS(_normal_model),
+        num_warmup=20,
+        num_samples=30,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        jit_model_args=jit_model_args,
+        progress_bar=False,
+    )
+    compiled = mcmc.compile(random.PRNGKey(0), data, extra_fields=("num_steps",))
+    assert compiled.compile_time > 0
+    assert compiled.flops is None or compiled.flops > 0
+    assert compiled.memory_bytes is None or compiled.memory_bytes >= 0
+    if jit_model_args:
+        compiled.run(random.PRNGKey(0), data)
+    else:
+        compiled.run(random.PRNGKey(0))
+        with pytest.raises(ValueError, match="constants"):
+            compiled.run(random.PRNGKey(0), data)
+    samples = mcmc.get_samples(group_by_chain=True)["loc"]
+    assert samples.shape == (num_chains, 30)
+    assert_allclose(samples, expected_samples, rtol=1e-5, atol=1e-5)
+    assert_allclose(mcmc.get_extra_fields()["num_steps"], expected_num_steps)
+
+
+@pytest.mark.parametrize("chain_method", ["sequential", "vectorized"])
+def test_storage_dtype(chain_method):
+    def model():
+        x = numpyro.sample("x", dist.LogNormal(0, 1).expand([3]))
+        numpyro.deterministic("y", 2 * x)
+
+    mcmc_kwargs = dict(
+        num_warmup=20,
+        num_samples=30,
+        num_chains=2,
+        chain_method=chain_method,
+        progress_bar=False,
+    )
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",))
+    expected_samples = mcmc.get_samples()
+
+    mcmc = MCMC(NUTS(model), storage_dtype=jnp.bfloat16, **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",))
+    samples = mcmc.get_samples()
+    assert samples["x"].dtype == jnp.bfloat16
+    assert samples["y"].dtype == jnp.bfloat16
+    assert samples["x"].shape == (60, 3)
+    for name in ["x", "y"]:
+        assert_allclose(
+            samples[name].astype(jnp.float32), expected_samples[name], rtol=1e-2
+        )
+    # the state of the sampler and integer fields keep their dtype
+    assert mcmc.last_state.z["x"].dtype == jnp.float32
+    assert mcmc.get_extra_fields()["num_steps"].dtype == jnp.int32
+    assert mcmc.get_extra_fields()["diverging"].dtype == jnp.bool_
+
+
+@pytest.mark.parametrize("jit_model_args", [True, False])
+@pytest.mark.parametrize(
+    "num_chains, chain_method", [(1, "sequential"), (2, "vectorized")]
+)
+def test_collect_sites(jit_model_args, num_chains, chain_method):
+    def model(data):
+        loc = numpyro.sample("loc", dist.Normal(0, 10))
+        scale = numpyro.sample("scale", dist.LogNormal(0, 1))
+        numpyro.deterministic("loc2", 2 * loc)
+        numpyro.deterministic("scale2", 2 * scale)
+        numpyro.sample("obs", dist.Normal(loc, scale), obs=data)
+
+    data = jnp.arange(10.0)
+    mcmc_kwargs = dict(
+        num_warmup=20,
+        num_samples=30,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        jit_model_args=jit_model_args,
+        progress_bar=False,
+    )
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data)
+    # sites are postprocessed at the end of the sampling loop by default
+    assert mcmc._pending_postprocess is None
+    eager_samples = mcmc.get_samples(group_by_chain=True)
+
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data, lazy_postprocess=True)
+    # sites are postprocessed on demand
+    assert mcmc._pending_postprocess is not None
+    samples = mcmc.get_samples(group_by_chain=True, sites=["scale", "loc2"])
+    assert set(samples) == {"scale", "loc2"}
+    assert samples["scale"].shape == (num_chains, 30)
+    assert set(mcmc._postprocessed_sites) == {"scale", "loc2"}
+    num_cached_fns = len(mcmc._cache)
+    expected_samples = mcmc.get_samples(group_by_chain=True)
+    # the compiled postprocessing is reused by later calls
+    mcmc._postprocessed_sites = {}
+    mcmc.get_samples(group_by_chain=True)
+    assert len(mcmc._cache) == num_cached_fns + 1
+    for name, value in eager_samples.items():
+        assert_allclose(expected_samples[name], value, rtol=1e-5, atol=1e-5)
+    assert set(expected_samples) == {"loc", "scale", "loc2", "scale2"}
+    assert (expected_samples["scale"] > 0).all()
+    assert_allclose(expected_samples["loc2"], 2 * expected_samples["loc"])
+    assert_allclose(samples["scale"], expected_samples["scale"])
+    assert mcmc.get_samples(sites=["loc"])["loc"].shape == (num_chains * 30,)
+
+    mcmc = MCMC(NUTS(model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data, collect_sites=["scale", "loc2"])
+    samples = mcmc.get_samples(group_by_chain=True)
+    assert set(samples) == {"scale", "loc2"}
+    for name in ["scale", "loc2"]:
+        assert_allclose(samples[name], expected_samples[name], rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100])
+def test_postprocess_chunk_size(chunk_size):
+    def model():
+        x = numpyro.sample("x", dist.LogNormal(0, 1).expand([3]))
+        numpyro.deterministic("y", 2 * x)
+
+    mcmc_kwargs = dict(num_warmup=20, num_samples=30, num_chains=2, progress_bar=False)
+    mcmc = MCMC(NUTS(model), chain_method="vectorized", **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0))
+    expected_samples = mcmc.get_samples(group_by_chain=True)
+
+    mcmc = MCMC(
+        NUTS(model),
+        chain_method="vectorized",
+        postprocess_chunk_size=chunk_size,
+        **mcmc_kwargs,
+    )
+    mcmc.run(random.PRNGKey(0))
+    samples = mcmc.get_samples(group_by_chain=True)
+    for name in ["x", "y"]:
+        assert isinstance(samples[name], np.ndarray)
+        assert samples[name].shape == (2, 30, 3)
+        assert_allclose(samples[name], expected_samples[name], rtol=1e-6)
+
+
+def test_postprocess_oom_retry(monkeypatch):
+    from numpyro.infer import mcmc as mcmc_module
+
+    def model():
+        numpyro.sample("x", dist.LogNormal(0, 1).expand([3]))
+
+    mcmc = MCMC(NUTS(model), num_warmup=20, num_samples=30, progress_bar=False)
+    mcmc.run(random.PRNGKey(0), lazy_postprocess=True)
+    expected_samples = mcmc._get_postprocessed_sites()
+    mcmc._postprocessed_sites = {}
+
+    device_get = mcmc_module.device_get
+
+    def oom_device_get(x):
+        # simulate a device which can only hold the outputs of 8 draws
+        if any(np.shape(v)[0] > 8 for v in x.values()):
+            raise RuntimeError("RESOURCE_EXHAUSTED: Out of memory")
+        return device_get(x)
+
+    monkeypatch.setattr(mcmc_module, "device_get", oom_device_get)
+    mcmc.postprocess_chunk_size = 30
+    with pytest.warns(UserWarning, match="out of memory"):
+        samples = mcmc.get_samples()
+    assert_allclose(samples["x"], expected_samples["x"][0], rtol=1e-6)
+
+
+@pytest.mark.skipif(
+    not hasattr(jit(lambda x: x), "lower"),
+    reason="Ahead-of-time compilation requires a newer version of JAX.",
+)
+@pytest.mark.parametrize("num_warmup", [0, 20])
+@pytest.mark.parametrize(
+    "num_chains, chain_method", [(1, "sequential"), (2, "vectorized")]
+)
+def test_profile(num_warmup, num_chains, chain_method):
+    data = jnp.arange(10.0)
+    mcmc_kwargs = dict(
+        num_warmup=num_warmup,
+        num_samples=30,
+        num_chains=num_chains,
+        chain_method=chain_method,
+        progress_bar=False,
+    )
+    mcmc = MCMC(NUTS(_normal_model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data)
+    expected_samples = mcmc.get_samples(group_by_chain=True)["loc"]
+    with pytest.raises(RuntimeError, match="profile"):
+        mcmc.get_profile()
+
+    mcmc = MCMC(NUTS(_normal_model), **mcmc_kwargs)
+    mcmc.run(random.PRNGKey(0), data, profile=True)
+    profile = mcmc.get_profile()
+    assert profile.compile_time > 0
+    assert profile.sample_time > 0
+    assert (profile.warmup_time > 0) == (num_warmup > 0)
+    assert profile.num_grads >= num_chains * 30
+    assert set(profile.ess) == {"loc"}
+    assert_allclose(profile.ess_per_grad["loc"], profile.ess["loc"] / profile.num_grads)
+    assert "loc" in str(profile)
+    # `num_steps` is only used to count the gradients
+    assert "num_steps" not in mcmc.get_extra_fields()
+    assert mcmc.post_warmup_state is None
+    if num_warmup == 0:
+        samples = mcmc.get_samples(group_by_chain=True)["loc"]
+        assert_allclose(samples, expected_samples, rtol=1e-5, atol=1e-5)
+    assert mcmc.get_samples()["loc"].shape == (num_chains * 30,)
+
+
+@pytest.mark.skipif(
+    not hasattr(jit(lambda x: x), "lower"),
+    reason="Ahead-of-time compilation requires a newer version of JAX.",
+)
+@pytest.mark.parametrize(
+    "kernel_cls, integrator, grads_per_step",
+    [
+        (NUTS, None, 1),
+        (NUTS, two_stage_bcss, 2),
+        (HMC, three_stage_bcss, 3),
+        (DRHMC, None, 1),
+    ],
+)
+def test_profile_num_grads(kernel_cls, integrator, grads_per_step):
+    data = jnp.arange(10.0)
+    mcmc = MCMC(
+        kernel_cls(_normal_model, integrator=integrator),
+        num_warmup=20,
+        num_samples=30,
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0), data, extra_fields=("num_steps",), profile=True)
+    num_steps = mcmc.get_extra_fields()["num_steps"]
+    assert mcmc.get_profile().num_grads == grads_per_step * int(jnp.sum(num_steps))
+
+
+@pytest.mark.parametrize("dense_mass", [False, True])
+def test_adapt_across_chains(dense_mass):
+    def model():
+        numpyro.sample("x", dist.Normal(jnp.array([0.0, 1.0, 2.0]), jnp.arange(1, 4)))
+
+    kernel = NUTS(model, dense_mass=dense_mass, adapt_across_chains=True)
+    mcmc = MCMC(
+        kernel,
+        num_warmup=200,
+        num_samples=500,
+        num_chains=4,
+        chain_method="vectorized",
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0))
+    adapt_state = mcmc.last_state.adapt_state
+    assert_allclose(adapt_state.step_size, adapt_state.step_size[0], rtol=1e-6)
+    for inverse_mass_matrix in adapt_state.inverse_mass_matrix.values():
+        assert_allclose(
+            inverse_mass_matrix,
+            jnp.broadcast_to(inverse_mass_matrix[0], inverse_mass_matrix.shape),
+            rtol=1e-6,
+        )
+    samples = mcmc.get_samples()["x"]
+    assert_allclose(jnp.mean(samples, 0), jnp.array([0.0, 1.0, 2.0]), atol=0.3)
+    assert_allclose(jnp.std(samples, 0), jnp.arange(1, 4), rtol=0.15)
+
+
+def test_chees_hmc():
+    def model():
+        numpyro.sample("x", dist.Normal(jnp.array([0.0, 1.0, 2.0]), jnp.arange(1, 4)))
+
+    mcmc = MCMC(
+        ChEESHMC(model),
+        num_warmup=500,
+        num_samples=500,
+        num_chains=8,
+        chain_method="vectorized",
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps",))
+    trajectory_length = mcmc.last_state.trajectory_length.trajectory_length
+    assert_allclose(trajectory_length, trajectory_length[0], rtol=1e-6)
+    assert (trajectory_length > 0).all()
+    # all chains run in lockstep
+    num_steps = mcmc.get_extra_fields(group_by_chain=True)["num_steps"]
+    assert (num_steps == num_steps[:1]).all()
+    samples = mcmc.get_samples()["x"]
+    assert_allclose(jnp.mean(samples, 0), jnp.array([0.0, 1.0, 2.0]), atol=0.3)
+    assert_allclose(jnp.std(samples, 0), jnp.arange(1, 4), rtol=0.15)
+
+
+def test_chees_hmc_requires_vectorized_chains():
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1))
+
+    mcmc = MCMC(ChEESHMC(model), num_warmup=10, num_samples=10, progress_bar=False)
+    with pytest.raises(ValueError, match="vectorized"):
+        mcmc.run(random.PRNGKey(0))
+
+
+@pytest.mark.parametrize("adapt_step_size", [True, False])
+def test_drhmc(adapt_step_size):
+    true_mean, true_std = jnp.array([0.0, 1.0]), jnp.array([1.0, 2.0])
+
+    def model():
+        numpyro.sample("x", dist.Normal(true_mean, true_std))
+
+    # a large step size so that the second stage is often used
+    kernel = DRHMC(
+        model,
+        step_size=1.5,
+        adapt_step_size=adapt_step_size,
+        inverse_mass_matrix=jnp.array([1.0, 4.0]),
+        adapt_mass_matrix=False,
+        trajectory_length=3.0,
+    )
+    mcmc = MCMC(kernel, num_warmup=500, num_samples=10000, progress_bar=False)
+    mcmc.run(random.PRNGKey(0), extra_fields=("num_steps", "accept_prob"))
+    samples = mcmc.get_samples()["x"]
+    assert_allclose(jnp.mean(samples, 0), true_mean, atol=0.1)
+    assert_allclose(jnp.std(samples, 0), true_std, rtol=0.07)
+    if not adapt_step_size:
+        # some first-stage proposals are rejected and retried with 4 steps
+        num_steps = mcmc.get_extra_fields()["num_steps"]
+        assert jnp.any(num_steps == 2) and jnp.any(num_steps == 8)
+
+
+def test_drhmc_invalid_step_size_reduction():
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1))
+
+    with pytest.raises(ValueError, match="step_size_reduction"):
+        DRHMC(model, step_size_reduction=1)
+
+
+@pytest.mark.parametrize("num_chains", [1, 2])
+def test_replica_exchange(num_chains):
+    def model():
+        x = numpyro.sample("x", dist.Normal(0.0, 10.0))
+        mixture = dist.Normal(jnp.array([-5.0, 5.0]), 0.5).log_prob(x)
+        numpyro.factor("obs", jnp.logaddexp(mixture[0], mixture[1]))
+
+    kernel = ReplicaExchange(NUTS(model), num_temperatures=4)
+    mcmc = MCMC(
+        kernel,
+        num_warmup=1000,
+        num_samples=4000,
+        num_chains=num_chains,
+        chain_method="vectorized",
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0), extra_fields=("inverse_temperatures",))
+    samples = mcmc.get_samples()["x"]
+    assert samples.shape == (4000 * num_chains,)
+    # the untempered replica visits both modes of the posterior
+    assert_allclose(jnp.mean(samples > 0), 0.5, atol=0.1)
+    assert_allclose(jnp.mean(jnp.abs(samples)), 5.0, atol=0.1)
+    inverse_temperatures = mcmc.get_extra_fields()["inverse_temperatures"]
+    assert inverse_temperatures.shape == (4000 * num_chains, 4)
+    assert_allclose(inverse_temperatures[:, 0], 1.0)
+    assert_allclose(inverse_temperatures[:, -1], 0.01, rtol=1e-5)
+    assert jnp.all(jnp.diff(inverse_temperatures, axis=-1) < 0)
+
+
+def test_replica_exchange_invalid_inner_kernel():
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1))
+
+    with pytest.raises(ValueError, match="SA"):
+        ReplicaExchange(SA(model))
+    with pytest.raises(ValueError, match="potential function"):
+        ReplicaExchange(NUTS(potential_fn=lambda z: 0.5 * z ** 2))
+    with pytest.raises(ValueError, match="num_temperatures"):
+        ReplicaExchange(NUTS(model), num_temperatures=1)
+    # HMCGibbs runs the model of its inner kernel
+    gibbs_kernel = HMCGibbs(NUTS(model), gibbs_fn=lambda **kwargs: {}, gibbs_sites=[])
+    with pytest.raises(ValueError, match="HMCGibbs does not run"):
+        ReplicaExchange(gibbs_kernel)
+
+
+def test_replica_exchange_requires_potential_energy():
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1))
+
+    State = namedtuple("State", ["z", "rng_key"])
+
+    class Identity(MCMCKernel):
+        def __init__(self, model):
+            self._model = model
+
+        @property
+        def model(self):
+            return self._model
+
+        def init(self, rng_key, num_warmup, init_params, model_args, model_kwargs):
+            return State({"x": jnp.zeros(())}, rng_key)
+
+        def sample(self, state, model_args, model_kwargs):
+            return state
+
+    mcmc = MCMC(
+        ReplicaExchange(Identity(model)),
+        num_warmup=10,
+        num_samples=10,
+        progress_bar=False,
+    )
+    with pytest.raises(ValueError, match="potential_energy"):
+        mcmc.run(random.PRNGKey(0))
+
+
+def test_ghmc():
+    def model():
+        numpyro.sample("x", dist.Normal(jnp.array([0.0, 1.0]), jnp.array([1.0, 2.0])))
+
+    kernel = GHMC(model, step_size=0.3, inverse_mass_matrix=jnp.array([1.0, 4.0]))
+    mcmc = MCMC(kernel, num_warmup=500, num_samples=10000, progress_bar=False)
+    mcmc.run(random.PRNGKey(0))
+    samples = mcmc.get_samples()["x"]
+    assert_allclose(jnp.mean(samples, 0), jnp.array([0.0, 1.0]), atol=0.2)
+    assert_allclose(jnp.std(samples, 0), jnp.array([1.0, 2.0]), rtol=0.1)
+
+
+def test_meads():
+    def model():
+        numpyro.sample("x", dist.Normal(jnp.array([0.0, 1.0, 2.0]), jnp.arange(1, 4)))
+
+    mcmc = MCMC(
+        MEADS(model),
+        num_warmup=500,
+        num_samples=500,
+        num_chains=16,
+        chain_method="vectorized",
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0))
+    adapt_state = mcmc.last_state.adapt_state
+    # the chains of a fold share the same parameters
+    assert_allclose(adapt_state.step_size[::4], adapt_state.step_size[0], rtol=1e-5)
+    assert ((adapt_state.damping > 0) & (adapt_state.damping <= 1)).all()
+    samples = mcmc.get_samples()["x"]
+    assert_allclose(jnp.mean(samples, 0), jnp.array([0.0, 1.0, 2.0]), atol=0.3)
+    assert_allclose(jnp.std(samples, 0), jnp.arange(1, 4), rtol=0.15)
+
+
+@pytest.mark.parametrize(
+    "kernel_cls, num_chains", [(GHMC, 1), (MEADS, 8)], ids=["GHMC", "MEADS"]
+)
+def test_ghmc_rerun_with_new_data(kernel_cls, num_chains):
+    def model(data):
+        loc = numpyro.sample("loc", dist.Normal(0, 10))
+        numpyro.sample("obs", dist.Normal(loc, 1), obs=data)
+
+    mcmc = MCMC(
+        kernel_cls(model),
+        num_warmup=500,
+        num_samples=1000,
+        num_chains=num_chains,
+        chain_method="vectorized",
+        progress_bar=False,
+    )
+    data = dist.Normal(0, 1).sample(random.PRNGKey(1), (100,))
+    mcmc.run(random.PRNGKey(0), data)
+    assert_allclose(jnp.mean(mcmc.get_samples()["loc"]), jnp.mean(data), atol=0.1)
+
+    # the state holds the potential energy and its gradient under the old data
+    new_data = data + 1.0
+    pe_and_grad = value_and_grad(lambda z: potential_energy(model, (new_data,), {}, z))
+    if num_chains > 1:
+        pe_and_grad = vmap(pe_and_grad)
+    state = mcmc.last_state
+    pe, z_grad = pe_and_grad(state.z)
+    mcmc.post_warmup_state = state._replace(potential_energy=pe, z_grad=z_grad)
+    mcmc.run(state.rng_key, new_data)
+    last_state = mcmc.last_state
+    assert_allclose(
+        last_state.potential_energy, pe_and_grad(last_state.z)[0], rtol=1e-5
+    )
+    assert_allclose(jnp.mean(mcmc.get_samples()["loc"]), jnp.mean(new_data), atol=0.1)
+
+
+def test_meads_requires_vectorized_chains():
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1))
+
+    mcmc = MCMC(MEADS(model), num_warmup=10, num_samples=10, progress_bar=False)
+    with pytest.raises(ValueError, match="vectorized"):
+        mcmc.run(random.PRNGKey(0))
+
+
+@pytest.mark.parametrize("adapt_across_chains", [False, True])
+def test_low_rank_mass(adapt_across_chains):
+    dim = 10
+    a = 2 * np.random.RandomState(0).randn(dim, 1)
+    true_cov = np.diag(np.linspace(0.5, 2.0, dim)) + a @ a.T
+
+    def model():
+        numpyro.sample(
+            "x", dist.MultivariateNormal(jnp.zeros(dim), covariance_matrix=true_cov)
+        )
+
+    kernel = NUTS(model, low_rank_mass=2, adapt_across_chains=adapt_across_chains)
+    mcmc = MCMC(
+        kernel,
+        num_warmup=500,
+        num_samples=1000,
+        num_chains=2,
+        chain_method="vectorized",
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0))
+    (inverse_mass_matrix,) = mcmc.last_state.adapt_state.inverse_mass_matrix.values()
+    assert inverse_mass_matrix.eigenvectors.shape == (2, dim, 2)
+    samples = mcmc.get_samples()["x"]
+    assert_allclose(jnp.mean(samples, 0), jnp.zeros(dim), atol=0.5)
+    assert_allclose(jnp.cov(samples.T), true_cov, atol=0.6, rtol=0.2)
+
+
+def test_low_rank_mass_requires_diagonal_mass():
+    def model():
+        numpyro.sample("x", dist.Normal(jnp.zeros(3), 1))
+
+    kernel = NUTS(model, dense_mass=True, low_rank_mass=2)
+    mcmc = MCMC(kernel, num_warmup=10, num_samples=10, progress_bar=False)
+    with pytest.raises(ValueError, match="dense_mass=False"):
+        mcmc.run(random.PRNGKey(0))
+
+
+@pytest.mark.parametrize("chain_method", ["sequential", "vectorized"])
+def test_dense_mass_auto(chain_method):
+    def model():
+        a = numpyro.sample("a", dist.Normal(0, 1))
+        numpyro.sample("b", dist.Normal(a, 0.1))
+        numpyro.sample("c", dist.Normal(jnp.zeros(3), 1))
+
+    mcmc = MCMC(
+        NUTS(model, dense_mass="auto"),
+        num_warmup=500,
+        num_samples=1000,
+        num_chains=2,
+        chain_method=chain_method,
+        progress_bar=False,
+    )
+    mcmc.run(random.PRNGKey(0))
+    # the steps of the pilot phase count towards `num_warmup`
+    assert (mcmc.last_state.i == 1500).all()
+    # the mass matrix is block-diagonal over the detected blocks
+    inverse_mass_matrix = mcmc.last_state.adapt_state.inverse_mass_matrix
+    assert set(inverse_mass_matrix) == {("a", "b"), ("c",)}
+    assert inverse_mass_matrix[("a", "b")].shape == (2, 2, 2)
+    assert inverse_mass_matrix[("c",)].shape == (2, 3)
+    samples = mcmc.get_samples()
+    assert_allclose(jnp.std(samples["a"]), 1.0, rtol=0.1)
+    assert_allclose(jnp.std(samples["b"] - samples["a"]), 0.1, rtol=0.1)
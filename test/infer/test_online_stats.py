@@ -0,0 +1,70 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+
+from jax import lax, vmap
+import jax.numpy as jnp
+from jax.tree_util import tree_map
+
+from numpyro.diagnostics import summary
+from numpyro.infer.online_stats import online_stats, online_summary, quantile_sketch
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+def test_quantile_sketch(relative_accuracy):
+    x = np.random.RandomState(0).standard_cauchy((1000, 2))
+    init_fn, update_fn, values = quantile_sketch(relative_accuracy=relative_accuracy)
+    counts = lax.fori_loop(
+        0, 1000, lambda i, c: update_fn(jnp.asarray(x)[i], c), init_fn((2,))
+    )
+    assert counts.shape[0] == 2
+    assert_allclose(counts.sum(-1), 1000)
+
+    for i in range(2):
+        cdf = np.cumsum(counts[i])
+        for q in [0.05, 0.5, 0.95]:
+            actual = values[np.searchsorted(cdf, q * 1000)]
+            expected = np.sort(x[:, i])[int(np.ceil(q * 1000)) - 1]
+            assert abs(actual - expected) <= relative_accuracy * abs(expected) + 1e-6
+
+
+@pytest.mark.parametrize("num_draws", [1000, 1001])
+def test_online_summary(num_draws):
+    rng = np.random.RandomState(1)
+    # autocorrelated chains
+    noise = rng.normal(size=(3, num_draws, 2))
+    x = np.zeros_like(noise)
+    x[:, 0] = noise[:, 0]
+    for t in range(1, num_draws):
+        x[:, t] = 0.7 * x[:, t - 1] + noise[:, t]
+    samples = {"x": x, "y": np.exp(x[..., 0])}
+
+    init_fn, update_fn = online_stats(num_draws)
+
+    def run_chain(chain):
+        state = init_fn(tree_map(lambda v: v[0], chain))
+        return lax.fori_loop(
+            0,
+            num_draws,
+            lambda i, s: update_fn(tree_map(lambda v: v[i], chain), s),
+            state,
+        )
+
+    states = vmap(run_chain)(tree_map(jnp.asarray, samples))
+    expected = summary(samples)
+    actual = online_summary(states)
+    for name in samples:
+        for stat in ["mean", "std", "r_hat"]:
+            assert_allclose(actual[name][stat], expected[name][stat], rtol=1e-4)
+        std = expected[name]["std"]
+        assert np.all(
+            np.abs(actual[name]["median"] - expected[name]["median"]) < 0.05 * std
+        )
+        # the endpoints of HPDI are sensitive to the sparse tails
+        for stat in ["5.0%", "95.0%"]:
+            assert np.all(np.abs(actual[name][stat] - expected[name][stat]) < 0.2 * std)
+        # batch-means estimates are noisy
+        assert_allclose(actual[name]["n_eff"], expected[name]["n_eff"], rtol=0.5)
@@ -0,0 +1,86 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from jax import random
+import jax.numpy as jnp
+
+import numpyro
+import numpyro.distributions as dist
+from numpyro.infer import MCMC, NUTS, init_to_pathfinder, pathfinder
+from numpyro.infer.util import initialize_model
+
+
+def normal_model(data):
+    loc = numpyro.sample("loc", dist.Normal(jnp.zeros(2), 10.0).to_event(1))
+    scale = numpyro.sample("scale", dist.LogNormal(0.0, 1.0))
+    with numpyro.plate("N", data.shape[0]):
+        numpyro.sample("obs", dist.Normal(loc, scale).to_event(1), obs=data)
+
+
+def normal_data():
+    true_loc = jnp.array([3.0, -2.0])
+    return true_loc + 0.5 * random.normal(random.PRNGKey(0), (200, 2))
+
+
+def test_pathfinder_normal():
+    data = normal_data()
+    result = pathfinder(random.PRNGKey(1), normal_model, model_args=(data,))
+
+    assert result.samples["loc"].shape == (1000, 2)
+    assert result.samples["scale"].shape == (1000,)
+    assert result.elbo.shape == (4,)
+    assert np.all(np.isfinite(result.elbo))
+    assert_allclose(jnp.mean(result.samples["loc"], 0), jnp.mean(data, 0), atol=0.02)
+    assert_allclose(jnp.mean(result.samples["scale"]), 0.5, atol=0.05)
+    # the posterior standard deviation of `loc` is about 0.5 / sqrt(200)
+    assert_allclose(jnp.std(result.samples["loc"], 0), 0.035, rtol=0.3)
+
+    (inverse_mass_matrix,) = result.inverse_mass_matrix.values()
+    assert list(result.inverse_mass_matrix) == [("loc", "scale")]
+    assert inverse_mass_matrix.shape == (3,)
+    assert_allclose(inverse_mass_matrix[:2], 0.035 ** 2, rtol=0.5)
+
+
+def test_init_to_pathfinder():
+    samples = {
+        "loc": jnp.arange(10.0)[:, None] * jnp.ones(2),
+        "scale": jnp.exp(jnp.arange(10.0)),
+    }
+    (init_params, *_), *_ = initialize_model(
+        random.split(random.PRNGKey(0), 5),
+        normal_model,
+        init_strategy=init_to_pathfinder(samples=samples, rng_key=random.PRNGKey(1)),
+        model_args=(normal_data(),),
+    )
+    assert init_params["loc"].shape == (5, 2)
+    assert_allclose(init_params["loc"][:, 0], init_params["loc"][:, 1])
+    assert np.all(np.isin(np.round(np.array(init_params["loc"])), np.arange(10)))
+    # all sites take their values from the same draw
+    assert_allclose(init_params["scale"], init_params["loc"][:, 0], atol=1e-5)
+
+    (init_params, *_), *_ = initialize_model(
+        random.PRNGKey(0),
+        normal_model,
+        init_strategy=init_to_pathfinder(samples=samples, draw_idx=3),
+        model_args=(normal_data(),),
+    )
+    assert_allclose(init_params["loc"], 3.0)
+    assert_allclose(init_params["scale"], 3.0, rtol=1e-5)
+
+
+def test_pathfinder_nuts():
+    data = normal_data()
+    result = pathfinder(random.PRNGKey(1), normal_model, model_args=(data,))
+    kernel = NUTS(
+        normal_model,
+        init_strategy=init_to_pathfinder(samples=result.samples),
+        inverse_mass_matrix=result.inverse_mass_matrix,
+    )
+    mcmc = MCMC(kernel, num_warmup=200, num_samples=500, num_chains=2)
+    mcmc.run(random.PRNGKey(2), data)
+    samples = mcmc.get_samples()
+    assert_allclose(jnp.mean(samples["loc"], 0), jnp.mean(data, 0), atol=0.02)
+    assert_allclose(jnp.mean(samples["scale"]), 0.5, atol=0.05)
@@ -0,0 +1,61 @@
+# Copyright Contributors to the Pyro project.
+# SPDX-License-Identifier: Apache-2.0
+
+from numpy.testing import assert_allclose
+import pytest
+
+from jax import random
+import jax.numpy as jnp
+
+import numpyro
+import numpyro.distributions as dist
+from numpyro.infer import SMC
+
+
+def model(data):
+    loc = numpyro.sample("loc", dist.Normal(0.0, 10.0))
+    with numpyro.plate("N", data.shape[0]):
+        numpyro.sample("obs", dist.Normal(loc, 1.0), obs=data)
+
+
+@pytest.mark.parametrize("kernel", ["hmc", "rwm"])
+def test_smc_normal(kernel):
+    num_data = 50
+    data = 3.0 + random.normal(random.PRNGKey(0), (num_data,))
+    smc = SMC(model, num_particles=2000, kernel=kernel)
+    smc.run(random.PRNGKey(1), data, progress_bar=False)
+    samples = smc.get_samples()
+    assert samples["loc"].shape == (2000,)
+
+    posterior_precision = num_data + 0.01
+    posterior_mean = jnp.sum(data) / posterior_precision
+    assert_allclose(jnp.mean(samples["loc"]), posterior_mean, atol=0.03)
+    assert_allclose(jnp.std(samples["loc"]), posterior_precision ** -0.5, rtol=0.1)
+
+    evidence = dist.MultivariateNormal(
+        jnp.zeros(num_data), jnp.eye(num_data) + 100.0 * jnp.ones((num_data, num_data))
+    )
+    assert_allclose(smc.log_marginal_likelihood, evidence.log_prob(data), atol=0.2)
+
+    inverse_temperatures = smc.inverse_temperatures
+    assert inverse_temperatures[0] == 0
+    assert inverse_temperatures[-1] == 1
+    assert jnp.all(jnp.diff(inverse_temperatures) > 0)
+    assert smc.last_state.i == inverse_temperatures.shape[0] - 1
+
+
+def test_smc_non_finite_log_likelihood():
+    def model():
+        numpyro.sample("x", dist.Normal(0.0, 1.0))
+        numpyro.factor("log_likelihood", -jnp.inf)
+
+    smc = SMC(model, num_particles=100)
+    with pytest.raises(RuntimeError, match="log likelihood"):
+        smc.run(random.PRNGKey(0), progress_bar=False)
+
+
+def test_smc_invalid_args():
+    with pytest.raises(ValueError, match="kernel"):
+        SMC(model, kernel="nuts")
+    with pytest.raises(ValueError, match="target_ess"):
+        SMC(model, target_ess=1.5)
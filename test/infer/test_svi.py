@@ -203,6 +203,36 @@ def test_elbo_dynamic_support():
     assert_allclose(actual_loss, expected_loss)
 
 
+@pytest.mark.skipif(
+    not hasattr(jax.jit(lambda x: x), "lower"),
+    reason="Ahead-of-time compilation requires a newer version of JAX.",
+)
+def test_compile():
+    def model(data):
+        f = numpyro.sample("beta", dist.Beta(1.0, 1.0))
+        numpyro.sample("obs", dist.Bernoulli(f), obs=data)
+
+    def guide(data):
+        alpha_q = numpyro.param("alpha_q", 1.0, constraint=constraints.positive)
+        beta_q = numpyro.param("beta_q", 1.0, constraint=constraints.positive)
+        numpyro.sample("beta", dist.Beta(alpha_q, beta_q))
+
+    data = jnp.array([1.0] * 8 + [0.0] * 2)
+    svi = SVI(model, guide, optim.Adam(0.05), Trace_ELBO())
+    compiled = svi.compile(random.PRNGKey(1), 100, data)
+    assert compiled.compile_time > 0
+    assert compiled.flops is None or compiled.flops > 0
+
+    expected = svi.run(random.PRNGKey(1), 100, data, progress_bar=False)
+    svi_result = compiled.run(random.PRNGKey(1), data)
+    assert svi_result.losses.shape == (100,)
+    assert_allclose(svi_result.losses, expected.losses, rtol=1e-5)
+    assert_allclose(svi_result.params["alpha_q"], expected.params["alpha_q"], rtol=1e-5)
+    # same shapes and dtypes, no recompilation
+    svi_result = compiled.run(random.PRNGKey(2), 1.0 - data)
+    assert svi_result.params["alpha_q"] < svi_result.params["beta_q"]
+
+
 @pytest.mark.parametrize("num_steps", [10, 30, 50])
 def test_run_with_small_num_steps(num_steps):
     def model():
@@ -1,9 +1,13 @@
 # Copyright Contributors to the Pyro project.
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+
 from numpy.testing import assert_allclose
 import pytest
 
+import jax
+from jax import jit, random
 from jax.flatten_util import ravel_pytree
 import jax.numpy as jnp
 from jax.test_util import check_eq
@@ -11,6 +15,7 @@ from jax.tree_util import tree_flatten, tree_multimap
 
 import numpyro
 import numpyro.distributions as dist
+from numpyro.infer import MCMC, NUTS
 from numpyro.util import fori_collect, format_shapes, soft_vmap
 
 
@@ -66,6 +71,47 @@ def test_fori_collect_return_last(progbar):
     check_eq(tree, expected_tree)
 
 
+def test_fori_collect_progbar_interval(capsys):
+    def f(x):
+        return x + 1.0
+
+    diagnostics = []
+
+    def diagnostics_fn(x):
+        diagnostics.append(float(x))
+        return "x={}".format(float(x))
+
+    actual = fori_collect(
+        2,
+        10,
+        f,
+        jnp.array(0.0),
+        progbar_interval=3,
+        diagnostics_fn=diagnostics_fn,
+        progbar_desc=lambda i: "warmup" if i < 2 else "sample",
+    )
+    check_eq(actual, jnp.arange(3.0, 11.0))
+    # updates at iterations 1, 3, 6 and 9
+    assert diagnostics == [1.0, 3.0, 6.0, 9.0]
+    assert "x=9.0" in capsys.readouterr().err
+
+    # MCMC shows the diagnostics of each vectorized chain
+    def model():
+        numpyro.sample("x", dist.Normal(0, 1))
+
+    mcmc = MCMC(
+        NUTS(model),
+        num_warmup=10,
+        num_samples=10,
+        num_chains=2,
+        chain_method="vectorized",
+        progress_bar_interval=5,
+    )
+    mcmc.run(random.PRNGKey(0))
+    lines = capsys.readouterr().err.splitlines()
+    assert any(line.count("steps of size") == 2 for line in lines)
+
+
 @pytest.mark.parametrize(
     "pytree",
     [
@@ -166,3 +212,31 @@ def test_format_shapes():
         "        value      | 3\n"
         "   data plate 10   |  "
     )
+
+
+def _is_compilation_cache_used():
+    try:
+        from jax._src.compilation_cache import is_cache_used
+    except ImportError:
+        # older versions of JAX only support the persistent cache on TPU
+        return jax.default_backend() == "tpu"
+    return is_cache_used(jax.devices()[0].client)
+
+
+def test_enable_compilation_cache(tmp_path):
+    compilation_cache = pytest.importorskip(
+        "jax.experimental.compilation_cache.compilation_cache"
+    )
+    cache_dir = str(tmp_path / "cache")
+    try:
+        numpyro.enable_compilation_cache(cache_dir, min_compile_time_secs=0)
+        if not _is_compilation_cache_used():
+            pytest.skip("The compilation cache does not support this backend.")
+        assert numpyro.util._COMPILATION_CACHE_DIR == cache_dir
+        # a new function, which is compiled and stored in the cache
+        assert_allclose(jit(lambda x: 2 * x + 1)(jnp.ones(3)), 3.0)
+        assert len(os.listdir(cache_dir)) > 0
+    finally:
+        if hasattr(compilation_cache, "reset_cache"):
+            compilation_cache.reset_cache()
+        numpyro.util._COMPILATION_CACHE_DIR = None